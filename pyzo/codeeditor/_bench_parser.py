@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+"""This script measures the speed of the Python parser, by tokenizing
+the sources of the standard library line by line, in the same way as the
+highlighter does.
+
+Run it from the root of the repository:
+
+    python -m pyzo.codeeditor._bench_parser [maxFiles]
+"""
+
+import os
+import sys
+import time
+import glob
+import sysconfig
+
+from pyzo.codeeditor.parsers import BlockState
+from pyzo.codeeditor.parsers.python_parser import Python3Parser
+from pyzo.codeeditor.parsers.cython_parser import CythonParser
+
+
+def readSources(maxFiles=None):
+    """Get a list of lists of lines, one list for each stdlib module."""
+    pattern = os.path.join(sysconfig.get_paths()["stdlib"], "**", "*.py")
+    filenames = sorted(glob.glob(pattern, recursive=True))
+    if maxFiles:
+        filenames = filenames[:maxFiles]
+    sources = []
+    for filename in filenames:
+        try:
+            with open(filename, encoding="utf-8") as f:
+                sources.append(f.read().splitlines())
+        except (OSError, UnicodeDecodeError):
+            pass
+    return sources
+
+
+def benchParser(parser, sources):
+    """Tokenize all sources, and return the number of lines per second."""
+    nlines = 0
+    t0 = time.perf_counter()
+    for lines in sources:
+        previousState = 0
+        for line in lines:
+            tokens = parser.parseLine(line, previousState)
+            previousState = 0
+            for token in tokens:
+                if isinstance(token, BlockState):
+                    previousState = token.state
+        nlines += len(lines)
+    return nlines, nlines / (time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    maxFiles = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    sources = readSources(maxFiles)
+    for parserClass in (Python3Parser, CythonParser):
+        nlines, speed = benchParser(parserClass(), sources)
+        print(f"{parserClass.__name__}: {nlines} lines, {speed:.0f} lines/s")
@@ -15,6 +15,7 @@ from ..parsers.tokens import (
     UnterminatedStringToken,
 )
 from ..parsers.python_parser import MultilineStringToken, stringLiteralPrefixes
+from ..highlighter import PENDING
 
 
 class DeflectUpDown:
@@ -398,6 +399,9 @@ class PythonAutoIndent:
                     ppreviousState = (
                         ppreviousBlock.userState() if previousBlock.isValid() else 0
                     )
+                    if ppreviousState == PENDING:
+                        # Not highlighted yet, so its state is not known
+                        ppreviousState = 0
                     tokens = self.parser().parseLine(
                         previousBlock.text(), ppreviousState
                     )
@@ -4,8 +4,16 @@ Defines the highlighter class for the base code editor class. It will do
 the styling when syntax highlighting is enabled. If it is not, will only
 check out indentation.
 
+If the highlightTimeSlice option of the editor is set, the blocks that
+are visible are highlighted immediately, and the other blocks are
+highlighted in slices of that duration from the event loop, so that
+editing a large document does not freeze the GUI. Blocks that still
+need highlighting have the PENDING block state.
+
 """
 
+import time
+
 from .qt import QtGui, QtCore
 
 Qt = QtCore.Qt
@@ -13,6 +21,10 @@ Qt = QtCore.Qt
 from . import parsers
 
 
+# The block state of blocks for which highlighting is postponed
+PENDING = -2
+
+
 class BlockData(QtGui.QTextBlockUserData):
     """Class to represent the data for a block."""
 
@@ -20,7 +32,8 @@ class BlockData(QtGui.QTextBlockUserData):
         super().__init__()
         self.indentation = None
         self.fullUnderlineFormat = None
-        self.tokens = []
+        self.tokens = ()
+        self.revision = -1  # the revision of the block when the tokens were made
 
 
 # The highlighter should be part of the base class, because
@@ -32,6 +45,25 @@ class Highlighter(QtGui.QSyntaxHighlighter):
         # Store reference to editor
         self._codeEditor = codeEditor
 
+        # For highlighting in slices, see _postponeBlock()
+        self._sliceStart = None
+        self._sliceTime = 0
+        self._visibleBlocks = 0, -1
+        self._highlightAll = True
+        self._firstPending = None  # the number of the first block that may be pending
+
+        # Timer to process the pending blocks from the event loop
+        self._pendingTimer = QtCore.QTimer(self)
+        self._pendingTimer.setSingleShot(True)
+        self._pendingTimer.setInterval(0)
+        self._pendingTimer.timeout.connect(self._processPendingBlocks)
+
+        # Highlight blocks when they are scrolled into view
+        codeEditor.verticalScrollBar().valueChanged.connect(
+            self._highlightVisibleBlocks
+        )
+        codeEditor.updateRequest.connect(self._onUpdateRequest)
+
     def getCurrentBlockUserData(self):
         """Gets the BlockData object. Creates one if necessary."""
         bd = self.currentBlockUserData()
@@ -56,6 +88,16 @@ class Highlighter(QtGui.QSyntaxHighlighter):
         if hasattr(self._codeEditor, "parser"):
             parser = self._codeEditor.parser()
 
+        # Postpone highlighting this block?
+        approximate = False
+        if parser and self._postponeBlock(previousState):
+            return
+        elif previousState == PENDING:
+            # A visible block after a pending block; it is highlighted
+            # again when the previous block has been highlighted.
+            previousState = -1
+            approximate = True
+
         # Get function to get format
         nameToFormat = self._codeEditor.getStyleElementFormat
 
@@ -87,8 +129,10 @@ class Highlighter(QtGui.QSyntaxHighlighter):
         # Get user data
         bd = self.getCurrentBlockUserData()
 
-        # Store token list for future use (e.g. brace matching)
-        bd.tokens = tokens
+        # Store tokens for future use (e.g. brace matching). A tuple is
+        # smaller than a list, which matters because we keep one per block.
+        bd.tokens = tuple(tokens)
+        bd.revision = -1 if approximate else self.currentBlock().revision()
 
         # Handle underlines
         bd.fullUnderlineFormat = fullLineFormat
@@ -120,3 +164,113 @@ class Highlighter(QtGui.QSyntaxHighlighter):
             # Store info for indentation guides
             # amount of tabs or spaces
             bd.indentation = len(leadingWhitespace)
+
+    ## Highlighting in slices
+
+    def _postponeBlock(self, previousState):
+        """Postpone highlighting the current block if it is not visible,
+        and the time slice has ended (or the previous block is pending).
+        Returns whether the block is postponed.
+        """
+        if not self._codeEditor.highlightTimeSlice():
+            return False
+        if self._sliceStart is None:
+            self._startSlice()
+        blockNumber = self.currentBlock().blockNumber()
+        first, last = self._visibleBlocks
+        if first <= blockNumber <= last:
+            return False
+        elif previousState == PENDING:
+            # Keep the state of the block, so that Qt does not continue with
+            # the next blocks. It is highlighted when the previous block is.
+            pass
+        elif self._highlightAll and (
+            time.perf_counter() - self._sliceStart < self._sliceTime
+        ):
+            return False
+        else:
+            self.setCurrentBlockState(PENDING)
+            if self._firstPending is None or blockNumber < self._firstPending:
+                self._firstPending = blockNumber
+        # Make sure that the block has user data, because code that uses the
+        # tokens (e.g. to find cells) also looks at blocks that are pending.
+        # This is called for each block of a large edit, hence no method call.
+        bd = self.currentBlockUserData()
+        if not isinstance(bd, BlockData):
+            self.setCurrentBlockUserData(BlockData())
+        else:
+            bd.revision = -1  # the tokens are outdated
+        return True
+
+    def _startSlice(self):
+        """Start a time slice for highlighting. It ends when the event
+        loop is entered again, where the pending blocks are processed.
+        """
+        self._sliceStart = time.perf_counter()
+        self._sliceTime = self._codeEditor.highlightTimeSlice() / 1000
+        self._highlightAll = self._shouldHighlightAll()
+        self._visibleBlocks = self._getVisibleBlocks()
+        self._pendingTimer.start()
+
+    def _shouldHighlightAll(self):
+        """Get whether all blocks should be highlighted, or only the
+        visible blocks, because the document is too large.
+        """
+        maxSize = self._codeEditor.highlightMaxSize()
+        return not maxSize or self.document().characterCount() <= maxSize
+
+    def _getVisibleBlocks(self):
+        """Get the numbers of the first and the last block that are (or
+        may be) visible in the editor.
+        """
+        editor = self._codeEditor
+        first = editor.firstVisibleBlock().blockNumber()
+        lineHeight = max(1, editor.fontMetrics().height())
+        return first, first + editor.viewport().height() // lineHeight + 1
+
+    def _findPendingBlock(self, first):
+        """Find the first pending block from the given block number,
+        or None if there is no pending block.
+        """
+        block = self.document().findBlockByNumber(first)
+        while block.isValid():
+            if block.userState() == PENDING:
+                return block
+            block = block.next()
+        return None
+
+    def _highlightVisibleBlocks(self):
+        """Highlight the visible blocks that are pending, or that follow
+        a pending block.
+        """
+        if self._firstPending is None or self.document() is None:
+            return
+        first, last = self._visibleBlocks = self._getVisibleBlocks()
+        block = self.document().findBlockByNumber(max(first, self._firstPending))
+        while block.isValid() and block.blockNumber() <= last:
+            if block.userState() == PENDING or block.previous().userState() == PENDING:
+                # The following blocks are highlighted too, if needed
+                self.rehighlightBlock(block)
+            block = block.next()
+
+    def _onUpdateRequest(self, rect, dy):
+        if self._firstPending is not None and not self._pendingTimer.isActive():
+            self._pendingTimer.start()
+
+    def _processPendingBlocks(self):
+        """Highlight pending blocks during one time slice. Called from
+        the event loop; starting a slice starts the timer again.
+        """
+        self._sliceStart = None
+        if self._firstPending is None or self.document() is None:
+            return
+        self._highlightVisibleBlocks()
+        if self._sliceStart is not None or not self._shouldHighlightAll():
+            return
+        block = self._findPendingBlock(self._firstPending)
+        if block is None:
+            self._firstPending = None
+        else:
+            self._firstPending = block.blockNumber()
+            # Highlighting continues with the next blocks until the slice ends
+            self.rehighlightBlock(block)
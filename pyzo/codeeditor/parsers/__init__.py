@@ -37,6 +37,8 @@ class BlockState:
     can be present in a line, in which case the last one is considered valid.
     """
 
+    __slots__ = ("_info", "_state")
+
     isToken = False
 
     def __init__(self, state=0, info=None):
@@ -20,12 +20,14 @@ class MultilineCommentToken(CommentToken):
     """Characters representing a multi-line comment."""
 
     defaultStyle = "fore:#007F00"
+    __slots__ = ()
 
 
 class CharToken(Token):
     """Single-quoted char"""
 
     defaultStyle = "fore:#7F007F"
+    __slots__ = ()
 
 
 # This regexp is used to find special stuff, such as comments, numbers and
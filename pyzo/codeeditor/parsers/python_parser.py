@@ -432,35 +432,44 @@ class MultilineStringToken(StringToken):
     """Characters representing a multi-line string."""
 
     defaultStyle = "fore:#7F0000"
+    __slots__ = ()
 
 
 class CellCommentToken(CommentToken):
     """Characters representing a cell separator comment: "##"."""
 
     defaultStyle = "bold:yes, underline:yes"
+    __slots__ = ()
 
 
 stringLiteralPrefixes = frozenset("u|r|b|f|rb|br|rf|fr|t|rt|tr".split("|"))
 
 # This regexp is used to find special stuff, such as comments, numbers and
-# strings.
+# strings. The name of the group that matched (match.lastgroup) tells what
+# was found.
 tokenProg = re.compile(
-    "#|"  # Comment or
-    + "("  # Begin of string group (group 1)
-    + "("
+    "(?P<comment>#)|"  # Comment or
+    + "(?P<string>"  # Begin of string group
+    + "(?:"
     + "|".join(stringLiteralPrefixes)
-    + ")?"  # (group 2)
-    + "(\"\"\"|'''|\"|')"  # String start (triple quotes first, group 3)
-    + ")|"  # End of string group
-    + "([a-z0-9_]+)|"  # Identifiers/numbers (group 4) or
-    + r"(\(|\[|\{)|"  # Opening parenthesis (gr 5)
-    + r"(\)|\]|\})|"  # Closing parenthesis (gr 6)
-    + "("
-    + chr(160)  # non-breaking space (gr 7)
+    + ")?"
+    + "(?P<quote>\"\"\"|'''|\"|'))|"  # String start (triple quotes first)
+    + "(?P<word>[a-z0-9_]+)|"  # Identifiers/numbers or
+    + r"(?P<open>\(|\[|\{)|"  # Opening parenthesis or
+    + r"(?P<close>\)|\]|\})|"  # Closing parenthesis or
+    + "(?P<illegal>"
+    + chr(160)  # non-breaking space
     + ")",
     re.IGNORECASE,
 )
 
+# The token classes for the groups of tokenProg that are a single token
+simpleTokenClasses = {
+    "open": OpenParenToken,
+    "close": CloseParenToken,
+    "illegal": IllegalToken,
+}
+
 
 # For a given type of string ( ', " , ''' , """ ), get the RegExp
 # program that matches the end. (^|[^\\]) means: start of the line
@@ -563,22 +572,94 @@ class PythonParser(Parser):
             pos = token.end
 
         # Enter the main loop that iterates over the tokens and skips strings
+        append = tokensForLine.append
+        search = tokenProg.search
+        identifierState = self._identifierState
+        keywords, builtins, instance = self._keywords, self._builtins, self._instance
+        lineLength = len(line)
         while True:
-            # Get next tokens
-            tokens = self._findNextToken(line, pos)
-            if not tokens:
-                self._promoteMatchCaseSoftKeywords(tokensForLine)
+            # Find the start of the next string or comment (or identifier etc.)
+            match = search(line, pos)
+            matchStart = match.start() if match else lineLength
+
+            # Process the Non-Identifier between pos and the match (or end of line)
+            if matchStart > pos:
+                append(NonIdentifierToken(line, pos, matchStart))
+                strippedNonIdentifier = line[pos:matchStart].strip()
+            else:
+                strippedNonIdentifier = ""
+
+            # Is the last non-whitespace a line-continuation character? If
+            # there are other non-whitespace characters after def or class,
+            # cancel the identifierState
+            lineContinuation = strippedNonIdentifier.endswith("\\")
+            if strippedNonIdentifier and strippedNonIdentifier != "\\":
+                identifierState(None)
+
+            # If no match, or a comment, we are done processing the line
+            kind = match.lastgroup if match else None
+            if kind is None or kind == "comment":
+                if kind == "comment":
+                    if not line[:matchStart].strip() and line.startswith(
+                        ("##", "#%%", "# %%"), matchStart
+                    ):
+                        tokenClass = CellCommentToken
+                    elif self._isTodoItem(line[matchStart + 1 :]):
+                        tokenClass = TodoCommentToken
+                    else:
+                        tokenClass = CommentToken
+                    append(tokenClass(line, matchStart, lineLength))
+                if lineContinuation:
+                    append(BlockState(identifierState()))
+                else:
+                    self._promoteMatchCaseSoftKeywords(tokensForLine)
                 return tokensForLine
-            elif isinstance(tokens[-1], StringToken):
-                moreTokens = self._findEndOfString(line, tokens[-1])
-                tokens = tokens[:-1] + moreTokens
 
-            # Process tokens
-            for token in tokens:
-                tokensForLine.append(token)
-                if isinstance(token, BlockState):
-                    return tokensForLine
-            pos = token.end
+            # If there are non-whitespace characters after def or class,
+            # cancel the identifierState (this time, also if there is just a \
+            # since apparently it was not on the end of a line)
+            if strippedNonIdentifier:
+                identifierState(None)
+
+            pos = match.end()
+            if kind == "word":
+                # Identifier ("a word or number") Find out whether it is a key word
+                identifier = match.group(kind)
+                state = identifierState(identifier)
+                if identifier in keywords:
+                    tokenClass = KeywordToken
+                elif identifier in builtins and (
+                    "." + identifier not in line and "def " + identifier not in line
+                ):
+                    tokenClass = BuiltinsToken
+                elif identifier in instance:
+                    tokenClass = InstanceToken
+                elif identifier[0] in "0123456789":
+                    identifierState(None)
+                    tokenClass = NumberToken
+                elif state == 3 and line[pos:].lstrip().startswith("("):
+                    tokenClass = FunctionNameToken
+                elif state == 4:
+                    tokenClass = ClassNameToken
+                else:
+                    tokenClass = IdentifierToken
+                append(tokenClass(line, matchStart, pos))
+
+            elif kind == "string":
+                # We have matched a string-start, find the end
+                token = StringToken(line, matchStart, pos)
+                token._style = match.group("quote")  # ' or " or ''' or """
+                for t in self._findEndOfString(line, token):
+                    append(t)
+                    if isinstance(t, BlockState):
+                        return tokensForLine
+                pos = t.end
+
+            else:
+                # Parenthesis or illegal character
+                token = simpleTokenClasses[kind](line, matchStart, pos)
+                token._style = match.group(kind)
+                append(token)
 
     @staticmethod
     def _promoteMatchCaseSoftKeywords(tokens):
@@ -716,122 +797,6 @@ class PythonParser(Parser):
                     ]
                 return [UnterminatedStringToken(*tokenArgs)]
 
-    def _findNextToken(self, line, pos):
-        """Returns a token or None if no new tokens can be found."""
-
-        # Init tokens, if pos too large, we are done
-        if pos > len(line):
-            return None
-        tokens = []
-
-        # Find the start of the next string or comment
-        match = tokenProg.search(line, pos)
-
-        # Process the Non-Identifier between pos and match.start()
-        # or end of line
-        nonIdentifierEnd = match.start() if match else len(line)
-
-        # Return the Non-Identifier token if non-null
-        # todo: here it goes wrong (allow returning more than one token?)
-        token = NonIdentifierToken(line, pos, nonIdentifierEnd)
-        strippedNonIdentifier = str(token).strip()
-        if token:
-            tokens.append(token)
-
-        # Do checks for line continuation and identifierState
-        # Is the last non-whitespace a line-continuation character?
-        if strippedNonIdentifier.endswith("\\"):
-            lineContinuation = True
-            # If there are non-whitespace characters after def or class,
-            # cancel the identifierState
-            if strippedNonIdentifier != "\\":
-                self._identifierState(None)
-        else:
-            lineContinuation = False
-            # If there are non-whitespace characters after def or class,
-            # cancel the identifierState
-            if strippedNonIdentifier != "":
-                self._identifierState(None)
-
-        # If no match, we are done processing the line
-        if not match:
-            if lineContinuation:
-                tokens.append(BlockState(self._identifierState()))
-            return tokens
-
-        # The rest is to establish what identifier we are dealing with
-
-        # Comment
-        if match.group() == "#":
-            matchStart = match.start()
-            if not line[:matchStart].strip() and (
-                line[matchStart:].startswith(("##", "#%%", "# %%"))
-            ):
-                tokens.append(CellCommentToken(line, matchStart, len(line)))
-            elif self._isTodoItem(line[matchStart + 1 :]):
-                tokens.append(TodoCommentToken(line, matchStart, len(line)))
-            else:
-                tokens.append(CommentToken(line, matchStart, len(line)))
-            if lineContinuation:
-                tokens.append(BlockState(self._identifierState()))
-            return tokens
-
-        # If there are non-whitespace characters after def or class,
-        # cancel the identifierState (this time, also if there is just a \
-        # since apparently it was not on the end of a line)
-        if strippedNonIdentifier != "":
-            self._identifierState(None)
-
-        # Identifier ("a word or number") Find out whether it is a key word
-        if match.group(4) is not None:
-            identifier = match.group(4)
-            tokenArgs = line, match.start(), match.end()
-
-            # Set identifier state
-            identifierState = self._identifierState(identifier)
-
-            if identifier in self._keywords:
-                tokens.append(KeywordToken(*tokenArgs))
-            elif identifier in self._builtins and (
-                "." + identifier not in line and "def " + identifier not in line
-            ):
-                tokens.append(BuiltinsToken(*tokenArgs))
-            elif identifier in self._instance:
-                tokens.append(InstanceToken(*tokenArgs))
-            elif identifier[0] in "0123456789":
-                self._identifierState(None)
-                tokens.append(NumberToken(*tokenArgs))
-            else:
-                if identifierState == 3 and line[match.end() :].lstrip().startswith(
-                    "("
-                ):
-                    tokens.append(FunctionNameToken(*tokenArgs))
-                elif identifierState == 4:
-                    tokens.append(ClassNameToken(*tokenArgs))
-                else:
-                    tokens.append(IdentifierToken(*tokenArgs))
-
-        elif match.group(3) is not None:
-            # We have matched a string-start
-            # Find the string style ( ' or " or ''' or """)
-            token = StringToken(line, match.start(), match.end())
-            token._style = match.group(3)  # The style is in match group 3
-            tokens.append(token)
-        elif match.group(5) is not None:
-            token = OpenParenToken(line, match.start(), match.end())
-            token._style = match.group(5)
-            tokens.append(token)
-        elif match.group(6) is not None:
-            token = CloseParenToken(line, match.start(), match.end())
-            token._style = match.group(6)
-            tokens.append(token)
-        elif match.group(7) is not None:
-            token = IllegalToken(line, match.start(), match.end())
-            token._style = match.group(7)
-            tokens.append(token)
-        # Done
-        return tokens
-
 
 class PythonParser(PythonParser):  # Ambiguous Python parser
     """Parser for either Python2 or Python3, and we do not know which."""
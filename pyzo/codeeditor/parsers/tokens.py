@@ -13,6 +13,9 @@ ALPHANUM = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
 
 from ..style import StyleFormat, StyleElementDescription
 
+# The names of the token classes, see Token.name
+_tokenNames = {}
+
 
 class Token:
     """Token(line, start, end)
@@ -25,8 +28,15 @@ class Token:
     Each token class should have a docstring describing the meaning
     of the characters it is applied to.
 
+    Tokens are stored for every highlighted line, so they use __slots__
+    to keep them small. Subclasses should define ``__slots__ = ()``.
+    The ``_style`` slot is used by parsers that need to store extra
+    information, e.g. the kind of quote of a string.
+
     """
 
+    __slots__ = ("_style", "end", "line", "start")
+
     defaultStyle = "fore:#000, bold:no, underline:no, italic:no"
     isToken = True  # For the BlockState object, which is also returned by the parsers, this is False
 
@@ -34,7 +44,6 @@ class Token:
         self.line = line
         self.start = start
         self.end = end
-        self._name = self._getName()
 
     def __str__(self):
         return self.line[self.start : self.end]
@@ -75,7 +84,11 @@ class Token:
     @property
     def name(self):
         """The name of this token. Used to identify it and attach a style."""
-        return self._name
+        try:
+            return _tokenNames[self.__class__]
+        except KeyError:
+            name = _tokenNames[self.__class__] = self._getName()
+            return name
 
     @property
     def description(self):
@@ -92,24 +105,28 @@ class CommentToken(Token):
     """Characters representing a comment in the code."""
 
     defaultStyle = "fore:#007F00"
+    __slots__ = ()
 
 
 class TodoCommentToken(CommentToken):
     """Characters representing a comment in the code."""
 
     defaultStyle = "fore:#E00,italic"
+    __slots__ = ()
 
 
 class StringToken(Token):
     """Characters representing a textual string in the code."""
 
     defaultStyle = "fore:#7F007F"
+    __slots__ = ()
 
 
 class UnterminatedStringToken(StringToken):
     """Characters belonging to an unterminated string."""
 
     defaultStyle = "underline:dotted"
+    __slots__ = ()
 
 
 # todo: request from user: whitespace token
@@ -119,75 +136,88 @@ class TextToken(Token):
     """Anything that is not a string or comment."""
 
     defaultStyle = "fore:#000"
+    __slots__ = ()
 
 
 class IdentifierToken(TextToken):
     """Characters representing normal text (i.e. words)."""
 
     defaultStyle = ""
+    __slots__ = ()
 
 
 class NonIdentifierToken(TextToken):
     """Not a word (operators, whitespace, etc.)."""
 
     defaultStyle = ""
+    __slots__ = ()
 
 
 class KeywordToken(IdentifierToken):
     """A keyword is a word with a special meaning to the language."""
 
     defaultStyle = "fore:#00007F, bold:yes"
+    __slots__ = ()
 
 
 class BuiltinsToken(IdentifierToken):
     """Characters representing a builtins in the code."""
 
     defaultStyle = ""
+    __slots__ = ()
 
 
 class InstanceToken(IdentifierToken):
     """Characters representing a instance in the code."""
 
     defaultStyle = ""
+    __slots__ = ()
 
 
 class NumberToken(IdentifierToken):
     """Characters represening a number."""
 
     defaultStyle = "fore:#007F7F"
+    __slots__ = ()
 
 
 class FunctionNameToken(IdentifierToken):
     """Characters represening the name of a function."""
 
     defaultStyle = "fore:#007F7F, bold:yes"
+    __slots__ = ()
 
 
 class ClassNameToken(IdentifierToken):
     """Characters represening the name of a class."""
 
     defaultStyle = "fore:#0000FF, bold:yes"
+    __slots__ = ()
 
 
 class ParenthesisToken(TextToken):
     """Parenthesis (and square and curly brackets)."""
 
     defaultStyle = ""
+    __slots__ = ()
 
 
 class OpenParenToken(ParenthesisToken):
     """Opening parenthesis (and square and curly brackets)."""
 
     defaultStyle = ""
+    __slots__ = ()
 
 
 class CloseParenToken(ParenthesisToken):
     """Closing parenthesis (and square and curly brackets)."""
 
     defaultStyle = ""
+    __slots__ = ()
 
 
 class IllegalToken(Token):
     """Illegal tokens, eg. NBSP  ."""
 
     defaultStyle = "back:#ffd7c7"
+    __slots__ = ()
@@ -0,0 +1,88 @@
+"""This script measures how long the code parser takes to analyze a large
+Python file, and how long it takes to process a single edit in the middle
+of that file: changing a line, and inserting or removing a line (which
+changes the line numbers of everything below it). It also measures how
+long it takes to get the tree of objects from a result, which is done
+when it is first needed (e.g. by the source structure tool).
+
+Run it from the root of the repository:
+
+    python -m pyzo.core._bench_codeparser
+"""
+
+import time
+
+from pyzo.core import codeparser
+
+
+def makeLines(nlines):
+    """Get the lines of a generated module with classes, functions and cells."""
+    lines = ["import os", "import sys", ""]
+    i = 0
+    while len(lines) < nlines:
+        lines += [
+            "## Cell {}".format(i),
+            "",
+            "class Class{}(Base):".format(i),
+            '    """Docstring of class {}."""'.format(i),
+            "",
+            "    def __init__(self, x):",
+            "        self.x = x",
+            "",
+            "    def method{}(self, a, b=1):".format(i),
+            "        # todo: check this",
+            "        return a + b",
+            "",
+            "",
+            "def function{}(x):".format(i),
+            "    return Class{}(x)".format(i),
+            "",
+            "",
+        ]
+        i += 1
+    return lines[:nlines]
+
+
+def analyze(parser, edit, lineCount):
+    """Let the parser apply the edit, returns the result and the time."""
+    job = codeparser.Job("bench", [edit], lineCount)
+    t0 = time.perf_counter()
+    result = parser._analyze(job)
+    return result, time.perf_counter() - t0
+
+
+def bench(nlines, nedits=200):
+    """Returns the time of a full analysis, of an edit and of getting the tree."""
+    parser = codeparser.Parser()
+    lines = makeLines(nlines)
+    result, tFull = analyze(parser, (0, None, lines), nlines)
+
+    # Change a line, insert a line, change it, remove it, etc.
+    mid = nlines // 2 + 6  # the line "        self.x = x" in the middle
+    tEdit = tTree = 0
+    lineCount = nlines
+    for i in range(nedits):
+        if i % 4 == 0:
+            edit = mid, 0, ["        y = 1"]
+        elif i % 4 == 2:
+            edit = mid, 1, []
+        else:
+            edit = mid, 1, ["        self.y = {}".format(i)]
+        lineCount += len(edit[2]) - edit[1]
+        result, t = analyze(parser, edit, lineCount)
+        tEdit += t
+        t0 = time.perf_counter()
+        result.rootItem.children, result.importList  # noqa: B018
+        tTree += time.perf_counter() - t0
+    return tFull, tEdit / nedits, tTree / nedits
+
+
+if __name__ == "__main__":
+    for nlines in (2000, 20000, 100000):
+        tFull, tEdit, tTree = bench(nlines)
+        print(
+            "{} lines: full {:.3f} s, per edit {:.3f} ms, "
+            "getting the tree {:.3f} ms".format(
+                nlines, tFull, tEdit * 1000, tTree * 1000
+            )
+        )
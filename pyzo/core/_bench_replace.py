@@ -0,0 +1,97 @@
+"""This script measures how long "replace all" takes in an editor with a
+large Python file, for a replacement that changes every line, and for one
+that changes a few lines. It also measures undoing the replacement.
+
+Run it from the root of the repository:
+
+    python -m pyzo.core._bench_replace [nlines]
+"""
+
+import sys
+import time
+
+import pyzo
+from pyzo import _start
+
+
+LINE = "    value_{0} = compute(value_{0}, factor)  # step {0}"
+
+
+class FakeMain:
+    def statusBar(self):
+        return self
+
+    def updateCursorInfo(self, *args):
+        pass
+
+    def setMainTitle(self, *args):
+        pass
+
+
+def createEditorTabs():
+    """Create an EditorTabs, with the bare minimum of pyzo being set up."""
+    _start.loadConfig(defaultsOnly=True)
+    from pyzo.qt import QtWidgets
+
+    app = QtWidgets.QApplication([])
+    QtWidgets.qApp = app
+
+    from pyzo.core import main, menu, codeparser, editorTabs
+
+    main.loadIcons()
+    pyzo.darkQt = False
+    pyzo.keyMapper = menu.KeyMapper()
+    pyzo.main = FakeMain()
+    pyzo.parser = codeparser.Parser()
+    pyzo.parser.start()
+
+    tabs = pyzo.editors = editorTabs.EditorTabs(None)
+    tabs.resize(1000, 700)
+    tabs.show()
+    app.processEvents()
+    return app, tabs
+
+
+def bench(app, tabs, nlines, find, replace):
+    """Replace all matches of find in a new file of nlines lines. Returns
+    the time of the replacement and of undoing it.
+    """
+    tabs.newFile()
+    editor = tabs.getCurrentEditor()
+    editor.setPlainText("\n".join(LINE.format(i) for i in range(nlines)) + "\n")
+    app.processEvents()
+
+    findReplace = tabs._findReplace
+    findReplace._findText.setText(find)
+    findReplace._replaceText.setText(replace)
+    findReplace._regExp.setChecked(False)
+    findReplace._caseCheck.setChecked(True)
+    findReplace._wholeWord.setChecked(False)
+
+    t0 = time.perf_counter()
+    findReplace._replaceAll(editor)
+    app.processEvents()
+    t1 = time.perf_counter()
+    editor.undo()
+    app.processEvents()
+    t2 = time.perf_counter()
+
+    editor.document().setModified(False)
+    tabs.closeFile(editor)
+    return t1 - t0, t2 - t1
+
+
+if __name__ == "__main__":
+    nlines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    app, tabs = createEditorTabs()
+    for find, replace in [
+        ("factor", "scale"),
+        ("e", "E"),
+        ("value_1234 ", "value_x "),
+    ]:
+        t, tUndo = bench(app, tabs, nlines, find, replace)
+        print(
+            f"{nlines} lines, {find!r} -> {replace!r}: "
+            f"replace {t:.2f} s, undo {tUndo:.2f} s"
+        )
+    pyzo.parser.stop()
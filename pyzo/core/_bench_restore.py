@@ -0,0 +1,91 @@
+"""This script measures how long it takes to restore the editor tabs of a
+previous session, with the pyzo source files as open files. The files are
+loaded lazily (when their editor is first shown), as pyzo does on startup,
+and eagerly (all files read, decoded and highlighted), as pyzo did before.
+
+Run it from the root of the repository:
+
+    python -m pyzo.core._bench_restore [nfiles]
+"""
+
+import os
+import sys
+import glob
+import time
+
+import pyzo
+from pyzo import _start
+
+
+class FakeMain:
+    def statusBar(self):
+        return self
+
+    def updateCursorInfo(self, *args):
+        pass
+
+    def setMainTitle(self, *args):
+        pass
+
+
+def createEditorTabs():
+    """Create an EditorTabs, with the bare minimum of pyzo being set up."""
+    _start.loadConfig(defaultsOnly=True)
+    from pyzo.qt import QtWidgets
+
+    app = QtWidgets.QApplication([])
+    QtWidgets.qApp = app
+
+    from pyzo.core import main, menu, codeparser, editorTabs
+
+    main.loadIcons()
+    pyzo.darkQt = False
+    pyzo.keyMapper = menu.KeyMapper()
+    pyzo.main = FakeMain()
+    pyzo.parser = codeparser.Parser()
+    pyzo.parser.start()
+
+    tabs = pyzo.editors = editorTabs.EditorTabs(None)
+    tabs.resize(1000, 700)
+    tabs.show()
+    app.processEvents()
+    return app, tabs
+
+
+def bench(app, tabs, filenames, lazy):
+    """Open the files as when restoring a session, and show the last one.
+    Returns the time and the number of files that were loaded.
+    """
+    t0 = time.perf_counter()
+    if lazy:
+        state = [(f, 0, 0) for f in filenames] + [(f, "hist") for f in filenames]
+        tabs._setCurrentOpenFilesAsSsdfList(state)
+    else:
+        for filename in filenames:
+            tabs.loadFile(filename, updateTabs=False, ignoreFail=True)
+        tabs._tabs.setCurrentItem(len(filenames) - 1)
+        tabs._tabs.updateItemsFull()
+    app.processEvents()
+    t = time.perf_counter() - t0
+    loaded = sum(editor.isLoaded() for editor in tabs)
+    for editor in list(tabs):
+        tabs._removeEditor(editor)
+    app.processEvents()
+    return t, loaded
+
+
+if __name__ == "__main__":
+    nfiles = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    pattern = os.path.join(os.path.dirname(pyzo.__file__), "**", "*.py")
+    filenames = sorted(glob.glob(pattern, recursive=True), key=os.path.getsize)
+    filenames = filenames[-nfiles:]
+    nlines = sum(open(f, "rb").read().count(b"\n") for f in filenames)
+
+    app, tabs = createEditorTabs()
+    for lazy in (False, True):
+        t, loaded = bench(app, tabs, filenames, lazy)
+        print(
+            f"{'lazy' if lazy else 'eager'}: {len(filenames)} files "
+            f"({nlines} lines) restored in {t:.2f} s, {loaded} files loaded"
+        )
+    pyzo.parser.stop()
@@ -0,0 +1,62 @@
+"""This script measures how fast the shell renders output, by writing
+lines in small batches (as a kernel that prints now and then), and in
+large batches (as a kernel that prints in a tight loop).
+
+Run it from the root of the repository:
+
+    python -m pyzo.core._bench_shell
+"""
+
+import time
+
+import pyzo
+from pyzo import _start
+
+
+def createShell():
+    """Create a BaseShell, with the bare minimum of pyzo being set up."""
+    _start.loadConfig(defaultsOnly=True)
+    from pyzo.qt import QtWidgets
+
+    app = QtWidgets.QApplication([])
+    QtWidgets.qApp = app
+
+    from pyzo.core import main, menu, shell
+
+    main.loadIcons()
+    pyzo.darkQt = False
+    pyzo.keyMapper = menu.KeyMapper()
+
+    s = shell.BaseShell(None)
+    s.resize(800, 600)
+    s.show()
+    s.write(">>> ", prompt=2)
+    app.processEvents()
+    return app, s
+
+
+def bench(app, s, linesPerBatch, duration=3.0):
+    """Write batches of lines for the given duration. Returns the number
+    of lines written per second, and the longest time spent on a batch.
+    """
+    n = 0
+    maxTime = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < duration:
+        text = "".join(f"output line {n + i}\n" for i in range(linesPerBatch))
+        t1 = time.perf_counter()
+        s.writeMany([(text, 0, None, "stdout")])
+        app.processEvents()
+        maxTime = max(maxTime, time.perf_counter() - t1)
+        n += linesPerBatch
+    return n / (time.perf_counter() - t0), maxTime
+
+
+if __name__ == "__main__":
+    app, s = createShell()
+    for linesPerBatch in (100, 1000, 10000, 100000):
+        speed, maxTime = bench(app, s, linesPerBatch)
+        print(
+            f"{linesPerBatch} lines per batch: {speed:.0f} lines/s, "
+            f"slowest batch {maxTime:.3f} s"
+        )
@@ -0,0 +1,226 @@
+"""This script measures how long it takes to update the workspace for a
+namespace with 10k names, after a command that changes a few of them.
+It measures the introspector of the kernel, the size of its reply, and
+the update of the tree, for dir2() (all variables) and for dir2Delta()
+(only the changes). It also measures browsing a dict with a million
+items, of which the workspace fetches a page at a time.
+
+Run it from the root of the repository:
+
+    python -m pyzo.core._bench_workspace [container]
+"""
+
+import os
+import sys
+import math
+import time
+
+import pyzo
+from pyzo import _start
+import yoton  # imported by pyzo._start
+
+# The kernel's modules are imported as in the kernel
+sys.path.insert(0, os.path.dirname(pyzo.__file__))
+from pyzokernel.introspection import PyzoIntrospector
+
+
+def makeNameSpace(n):
+    """Create a namespace with n variables of different kinds."""
+    values = [
+        lambda i: i,
+        lambda i: i * 0.5,
+        lambda i: "string %i" % i,
+        lambda i: list(range(i % 50)),
+        lambda i: {"a": i, "b": [1, 2]},
+        lambda i: math.sin,
+        lambda i: os,
+        lambda i: (i, "x"),
+    ]
+    return {"var%05i" % i: values[i % len(values)](i) for i in range(n)}
+
+
+def changeNameSpace(ns, i):
+    """Do what a command could do: add, remove and change a variable."""
+    ns["new%i" % i] = i
+    ns.pop("var%05i" % i, None)
+    ns.setdefault("alist", []).append(i)
+
+
+class FakeInterpreter:
+    def __init__(self, ns):
+        self.globals = self.locals = ns
+
+
+class FakeFuture:
+    """A future of a request that is handled right away, that also keeps
+    the size of the encoded reply.
+    """
+
+    def __init__(self, result):
+        self._result = result
+        self.size = len(yoton.OBJECT.message_to_bytes(result))
+
+    def cancelled(self):
+        return False
+
+    def exception(self):
+        return None
+
+    def result(self):
+        return self._result
+
+    def add_done_callback(self, fn):
+        fn(self)
+
+
+class FakeShell:
+    """A shell with a _request attribute that calls the introspector."""
+
+    _state = "Ready"
+
+    def __init__(self, introspector):
+        self.futures = []
+        self._request = self
+        self._introspector = introspector
+
+    def __getattr__(self, name):
+        def request(*args):
+            t0 = time.perf_counter()
+            result = getattr(self._introspector, name)(*args)
+            self.introspectTime = time.perf_counter() - t0
+            future = FakeFuture(result)
+            self.futures.append(future)
+            return future
+
+        return request
+
+
+def createWorkspace(ns):
+    """Create the workspace tool for the given namespace. Returns the
+    app, the workspace and the (fake) shell.
+    """
+    _start.loadConfig(defaultsOnly=True)
+    from pyzo.qt import QtCore, QtWidgets
+
+    app = QtWidgets.QApplication([])
+    QtWidgets.qApp = app
+
+    from pyzo.core import main, menu
+    from pyzo.util import zon
+
+    main.loadIcons()
+    pyzo.darkQt = False
+    pyzo.keyMapper = menu.KeyMapper()
+    pyzo.config.tools["pyzoworkspace"] = zon.Dict()
+
+    class Shells(QtCore.QObject):
+        currentShellChanged = QtCore.Signal()
+        currentShellStateChanged = QtCore.Signal()
+
+        def getCurrentShell(self):
+            return shell
+
+    sys._pyzoInterpreter = FakeInterpreter(ns)
+    introspector = PyzoIntrospector(yoton.Context(), "reqp-introspect")
+    shell = FakeShell(introspector)
+    pyzo.shells = Shells()
+
+    from pyzo.tools.pyzoWorkspace import PyzoWorkspace
+
+    workspace = PyzoWorkspace(None)
+    workspace.resize(400, 600)
+    workspace.show()
+    app.processEvents()
+    return app, workspace, shell
+
+
+def benchUpdates(n=10000, nUpdates=5):
+    ns = makeNameSpace(n)
+    app, workspace, shell = createWorkspace(ns)
+    proxy = workspace._tree._proxy
+
+    # dir2() with refilling the tree, like before dir2Delta() existed
+    introspectTimes, guiTimes = [], []
+    for i in range(nUpdates):
+        changeNameSpace(ns, i)
+        future = shell.dir2("")
+        introspectTimes.append(shell.introspectTime)
+        t0 = time.perf_counter()
+        proxy._variables = {info[0]: info for info in future.result()}
+        workspace._tree.fillWorkspace()
+        app.processEvents()
+        guiTimes.append(time.perf_counter() - t0)
+    printTimes("dir2", introspectTimes, future.size, guiTimes)
+
+    # dir2Delta() with updating the tree, as the workspace does
+    introspectTimes, guiTimes = [], []
+    for i in range(nUpdates):
+        changeNameSpace(ns, nUpdates + i)
+        t0 = time.perf_counter()
+        proxy.updateVariables()
+        app.processEvents()
+        introspectTimes.append(shell.introspectTime)
+        guiTimes.append(time.perf_counter() - t0 - shell.introspectTime)
+    printTimes("dir2Delta", introspectTimes, shell.futures[-1].size, guiTimes)
+
+
+def printTimes(title, introspectTimes, size, guiTimes):
+    """Print the median times in ms."""
+    introspectTimes.sort()
+    guiTimes.sort()
+    print(
+        "%s: introspector %.1f ms, reply %i bytes, tree %.1f ms"
+        % (
+            title,
+            introspectTimes[len(introspectTimes) // 2] * 1000,
+            size,
+            guiTimes[len(guiTimes) // 2] * 1000,
+        )
+    )
+
+
+def benchContainer(n=1000000, nPages=3):
+    ns = {"big": {"key%i" % i: i for i in range(n)}}
+    app, workspace, shell = createWorkspace(ns)
+    tree = workspace._tree
+    scrollBar = tree.verticalScrollBar()
+
+    # dir2() for all items, like before the workspace fetched pages
+    future = shell.dir2("big")
+    print(
+        "dir2 of %i items: introspector %.1f ms, reply %i bytes"
+        % (n, shell.introspectTime * 1000, future.size)
+    )
+
+    # Show the items, and scroll to the end to fetch more items
+    t0 = time.perf_counter()
+    tree._proxy.setName("big")
+    app.processEvents()
+    print(
+        "first page: introspector %.1f ms, reply %i bytes, total %.1f ms"
+        % (
+            shell.introspectTime * 1000,
+            shell.futures[-1].size,
+            (time.perf_counter() - t0) * 1000,
+        )
+    )
+    for i in range(nPages):
+        t0 = time.perf_counter()
+        scrollBar.setValue(scrollBar.maximum())
+        app.processEvents()
+        print(
+            "next page: introspector %.1f ms, reply %i bytes, total %.1f ms, %s"
+            % (
+                shell.introspectTime * 1000,
+                shell.futures[-1].size,
+                (time.perf_counter() - t0) * 1000,
+                workspace._line.text(),
+            )
+        )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["container"]:
+        benchContainer()
+    else:
+        benchUpdates()
@@ -13,6 +13,7 @@ import time
 from pyzo.core.pyzoLogging import print
 import pyzo.codeeditor.parsers.tokens as Tokens
 from pyzo.codeeditor import CodeEditor
+from pyzo.codeeditor.highlighter import PENDING
 
 from pyzo.qt import QtCore, QtGui, QtWidgets
 from pyzo.util import CalmedFunc
@@ -427,6 +428,9 @@ class BaseTextCtrl(CodeEditor):
         # In order to find the tokens, we need the userState from the highlighter
         if cursor.block().previous().isValid():
             previousState = cursor.block().previous().userState()
+            if previousState == PENDING:
+                # Not highlighted yet, so its state is not known
+                previousState = 0
         else:
             previousState = 0
 
@@ -9,6 +9,8 @@ structure of a source file in for example a tree widget.
 # TODO: replace this module, get data from the syntax highlighter in the code editor
 
 import time
+import bisect
+import functools
 import threading
 import re
 import pyzo
@@ -35,23 +37,91 @@ defPattern = re.compile(
     # Leave the colon, easier for cython
 )
 
+nonWhitespacePattern = re.compile(r"\S")
+
+cellPrefixes = ("##", "#%%", "# %%")
+
+# The number of lines to look ahead for the signature of a multiline def
+DEF_LOOKAHEAD = 15
+
+# The end line of objects that are not closed
+MAXLINENR = 9999999
+
 
 class Job:
-    """Simple class to represent a job."""
+    """Simple class to represent a job.
+
+    A job consists of a list of edits, which are applied in order to
+    the lines that the parser keeps for an editor. Each edit is a tuple
+    (first, count, lines): the count lines starting at line first are
+    replaced by the given lines. If count is None, all lines are replaced.
+    The lineCount is the number of lines after applying the edits.
+    """
 
-    def __init__(self, text, editorId):
-        self.text = text
+    def __init__(self, editorId, edits, lineCount):
         self.editorId = editorId
+        self.edits = edits
+        self.lineCount = lineCount
+        self.dueTime = 0.0  # when the job should be done, see Parser.parseThis
 
 
 class Result:
-    """Simple class to represent a parser result."""
+    """Simple class to represent a parser result.
 
-    def __init__(self, rootItem, importList, editorId):
-        self.rootItem = rootItem
-        self.importList = importList
+    The result is made from the segments of the source (see Source), which
+    are not changed afterwards. The tree of objects and the list of imports
+    are produced from the segments when they are first needed.
+    """
+
+    def __init__(self, segments, editorId):
+        self._segments = segments
+        self._rootItem = None
+        self._importList = None
         self.editorId = editorId
 
+    @property
+    def rootItem(self):
+        if self._rootItem is None:
+            self._placeSegments()
+        return self._rootItem
+
+    @property
+    def importList(self):
+        if self._importList is None:
+            self._placeSegments()
+        return self._importList
+
+    def _placeSegments(self):
+        """Produce the tree and the import list from the segments. The
+        leafs that come before the first def in a segment go after the
+        last def in the segments before.
+        """
+        root = FictiveObject("root", 0, -1, "root")
+        importList = []
+        orphanLeafs = []
+        rootItems = []  # of the segments after the last segment with defs
+        start = 0
+        lastSegment = self._segments[-1] if self._segments else None
+        for segment in self._segments:
+            end = start + segment.length
+            # The objects that are still open are closed by the next segment
+            closeLinenr = end + 1 if segment is not lastSegment else MAXLINENR
+            placement = Placement(segment, start, closeLinenr, root)
+            if segment.orphanLeafs:
+                orphanLeafs.extend(placement.place(segment.orphanLeafs))
+            rootItems.extend(placement.place(segment.rootItems))
+            if segment.hasDefs:
+                root.children.extend(orphanLeafs)
+                root.children.extend(rootItems)
+                orphanLeafs, rootItems = [], []
+            if segment.importList:
+                importList.extend(placement.place(segment.importList))
+            start = end
+
+        root.children.extend(orphanLeafs)
+        root.children.extend(rootItems)
+        self._rootItem, self._importList = root, importList
+
     def isMatch(self, editorId):
         """Returns whether the result matches with the given editorId.
 
@@ -62,6 +132,34 @@ class Result:
             return self.editorId == editorId.id()
 
 
+class ChangeTracker:
+    """Keeps track (in the GUI thread) of the lines of an editor that
+    changed since the last job was made for it.
+    """
+
+    def __init__(self, blockCount):
+        self.blockCount = blockCount  # block count after the last change
+        self.syncedBlockCount = blockCount  # block count known to the parser
+        self.first = None  # first changed line
+        self.last = None  # line after the last changed line
+
+    def registerChange(self, first, oldCount, newCount):
+        """Register that oldCount lines starting at first have been
+        replaced by newCount lines.
+        """
+        last = first + newCount
+        if self.first is not None:
+            # Map the previously changed range to the new line numbers
+            end = first + oldCount
+            delta = newCount - oldCount
+            if self.first > first:
+                self.first = self.first + delta if self.first >= end else first
+            if self.last > first:
+                self.last = self.last + delta if self.last >= end else last
+            first, last = min(first, self.first), max(last, self.last)
+        self.first, self.last = first, last
+
+
 class Parser(threading.Thread):
     """Parser
     Parsing sourcecode in a separate thread, this class obtains
@@ -79,35 +177,115 @@ class Parser(threading.Thread):
         # results dict
         self._results = {}  # key: editorId; value: Result
 
-        # Lock to enable save threading
+        # The lines of each editor and their analysis, used by the parser thread
+        self._sources = {}  # key: editorId; value: Source
+
+        # Editors for which the parser lost track and needs all lines again
+        self._resyncs = set()
+
+        # Changes not yet sent to the parser, used by the GUI thread
+        self._trackers = {}  # key: editorId; value: ChangeTracker
+
+        # The editor that is visible, its job is done first
+        self._priorityId = None
+
+        # Lock to enable save threading, and condition to wake up the thread
         self._lock = threading.RLock()
+        self._condition = threading.Condition(self._lock)
 
         # Set daemon
         self.daemon = True
         self._exit = False
 
     def stop(self, timeout=1.0):
-        self._exit = True
+        with self._lock:
+            self._exit = True
+            self._condition.notify()
         self.join(timeout)
 
+    def registerChange(self, editor, position, charsRemoved, charsAdded):
+        """Register a change of the text in the given editor.
+
+        Connected to the contentsChange signal of the document, so that
+        only the lines that changed have to be sent to the parser.
+        """
+        tracker = self._trackers.get(editor.id(), None)
+        if tracker is None:
+            return  # all lines will be sent anyway
+
+        # Get the range of changed lines in the new text
+        doc = editor.document()
+        blockCount = doc.blockCount()
+        first = doc.findBlock(position).blockNumber()
+        last = doc.findBlock(position + charsAdded).blockNumber()
+        if first < 0:
+            first = blockCount - 1
+        if last < 0:
+            last = blockCount - 1
+
+        # The number of replaced lines follows from the change in line count
+        newCount = last - first + 1
+        oldCount = newCount - (blockCount - tracker.blockCount)
+        if first > last or oldCount < 0:
+            self._trackers.pop(editor.id())  # lost track, send all lines
+        else:
+            tracker.registerChange(first, oldCount, newCount)
+            tracker.blockCount = blockCount
+
     def parseThis(self, editor):
         """Give the parser new text to parse.
 
-        If the parser is busy parsing text, it will stop doing that
-        and start anew with the most recent version of the text.
+        Only the lines that changed since the previous call are sent to
+        the parser. The parser waits until no changes have been made for
+        a short while (config.advanced.parserDelay) before it starts
+        parsing. The job of the visible editor is done first.
         """
 
-        # Get text
-        text = editor.toPlainText()
+        editorId = editor.id()
+        doc = editor.document()
+        blockCount = doc.blockCount()
 
-        # Make job
+        with self._lock:
+            resync = editorId in self._resyncs
+            self._resyncs.discard(editorId)
+            if editor.isVisible():
+                self._priorityId = editorId
+
+        # Get the lines that changed
+        tracker = self._trackers.get(editorId, None)
+        if tracker is None or resync:
+            edit = 0, None, getLines(doc, 0, blockCount)
+            self._trackers[editorId] = ChangeTracker(blockCount)
+        elif tracker.first is None:
+            return  # nothing changed
+        else:
+            first, last = tracker.first, min(tracker.last, blockCount)
+            oldCount = last - first - (blockCount - tracker.syncedBlockCount)
+            edit = first, oldCount, getLines(doc, first, last)
+            tracker.first = tracker.last = None
+            tracker.blockCount = tracker.syncedBlockCount = blockCount
 
-        editorId = editor.id()
+        # Make job, or add the edit to the job that is still waiting
         with self._lock:
-            job = Job(text, editorId)
-            self._requests.pop(editorId, None)  # discard old request, if present
-            # add new job to end of dict (highest priority)
+            job = self._requests.pop(editorId, None)  # discard old request, if present
+            if job is None or edit[1] is None:
+                job = Job(editorId, [edit], blockCount)
+            else:
+                job.edits.append(edit)
+                job.lineCount = blockCount
+            job.dueTime = time.monotonic() + pyzo.config.advanced.parserDelay / 1000
+            # add job to end of dict (highest priority)
             self._requests[editorId] = job
+            self._condition.notify()
+
+    def forget(self, editor):
+        """Discard all information of the given editor (e.g. when it is closed)."""
+        editorId = editor.id()
+        self._trackers.pop(editorId, None)
+        with self._lock:
+            self._requests.pop(editorId, None)
+            self._results.pop(editorId, None)
+            self._sources.pop(editorId, None)
 
     def getFictiveNameSpace(self, editor):
         """Produce the fictive namespace, based on the current position.
@@ -312,51 +490,288 @@ class Parser(threading.Thread):
     def run(self):
         """This is the main loop."""
 
-        time.sleep(0.5)
         try:
             while True:
-                time.sleep(0.1)
-
-                if self._exit:
-                    return
-
-                # safely obtain next job
-                job = None
+                # safely obtain next job, wait until there is one
                 with self._lock:
-                    if self._requests:
-                        editorId, job = self._requests.popitem()
-                        assert editorId == job.editorId
+                    while True:
+                        if self._exit:
+                            return
+                        job, timeout = self._popJob()
+                        if job is not None:
+                            break
+                        self._condition.wait(timeout)
 
-                if job:
-                    # Analyse job
-                    result = self._analyze(job)
+                # Analyse job
+                result = self._analyze(job)
+                if result is None:
+                    continue
 
-                    # Safely store result
-                    with self._lock:
+                # Safely store result
+                with self._lock:
+                    if result.editorId in self._sources:
                         self._results[result.editorId] = result
 
-                    # Notify
-                    if pyzo.editors is not None:
-                        pyzo.editors.parserDone.emit()
+                # Notify
+                if pyzo.editors is not None:
+                    pyzo.editors.parserDone.emit()
 
         except AttributeError:
             pass  # when python exits, time can be None...
 
+    def _popJob(self):
+        """Get the next job that is due. Should be called with the lock held.
+
+        Returns (job, None), or (None, timeout) with the time to wait
+        until the next job is due, which is None if there are no jobs.
+        """
+        now = time.monotonic()
+
+        # The job of the visible editor goes first, even if we need to wait for it
+        job = self._requests.get(self._priorityId, None)
+        if job is not None:
+            if job.dueTime > now:
+                return None, job.dueTime - now
+            return self._requests.pop(job.editorId), None
+
+        # Otherwise the most recent job that is due
+        timeout = None
+        for job in reversed(list(self._requests.values())):
+            if job.dueTime <= now:
+                return self._requests.pop(job.editorId), None
+            elif timeout is None or job.dueTime - now < timeout:
+                timeout = job.dueTime - now
+        return None, timeout
+
     def _analyze(self, job):
         """The core function.
-        Analyses the source code.
-        Produces:
+        Applies the edits of the job to the source of the editor, which
+        analyses the changed lines and the segments of the structure that
+        contain them. Returns a Result, which produces from the segments:
         - a tree of FictiveObject objects.
-        - a (flat) list of the same object
         - a list of imports
+        Returns None if the edits do not match the source.
+        """
+
+        # Apply the edits
+        with self._lock:
+            source = self._sources.get(job.editorId, None)
+        for first, count, lines in job.edits:
+            if count is None:
+                source = Source()
+                with self._lock:
+                    self._sources[job.editorId] = source
+            if source is None or not source.replaceLines(first, count, lines):
+                source = None
+                break
+
+        # If we lost track, ask for all lines on the next parseThis
+        if source is None or len(source.lines) != job.lineCount:
+            with self._lock:
+                self._sources.pop(job.editorId, None)
+                self._resyncs.add(job.editorId)
+            return None
+
+        # Return result. The segments are copied, because the source changes
+        # them on the next job.
+        return Result(tuple(source.segments), job.editorId)
+
+
+## Helper classes and functions
+
+
+class FictiveObject:
+    """An un-instantiated object.
+    type can be class, def, import, cell, todo
+    extra stuff:
+    class   - supers, members
+    def     - selfname
+    imports - text
+    cell    -
+    todo    -
+    attribute -
+    """
+
+    def __init__(self, type, linenr, indent, name):
+        self.children = []
+        self.type = type
+        self.linenr = linenr  # at which line this object starts
+        self.linenr2 = MAXLINENR  # at which line it ends
+        self.indent = indent
+        self.name = name
+        self.sig = ""  # for functions and methods
+
+
+def IsValidName(name):
+    """Given a string, checks whether it is a
+    valid name (dots are not valid!)
+    """
+    return name.isidentifier()
+
+
+def ParseImport(names):
+    for part in names.split(","):
+        i1 = part.find(" as ")
+        if i1 > 0:
+            name = part[i1 + 3 :].strip()
+        else:
+            name = part.strip()
+        yield name
+
+
+class Source:
+    """The lines of a source file, and the analysis of each line.
+
+    For each line, the multiline string state at the end of the line is
+    stored as well, so that after an edit only the changed lines (and the
+    lines after it for which the state changed) need to be analyzed again.
+    The structure is kept as a list of segments, of which only the ones
+    containing changed lines need to be analyzed again.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.states = []  # the multiline string that is open at the end of a line
+        self.records = []  # see analyzeLine()
+        self.segments = []
+        self._lastSegment = 0, 0  # the index and start of a segment, see _findSegment()
+
+    def washedLine(self, i):
+        """Get line i, with the text within multiline strings removed."""
+        state = self.states[i - 1] if i > 0 else None
+        return washLine(self.lines[i], state)[0]
+
+    def replaceLines(self, first, count, lines):
+        """Replace count lines starting at first by the given lines, and
+        update the analysis. If count is None, all lines are replaced.
+        Returns False if the lines to replace do not exist.
         """
 
-        # Remove multiline strings
-        text = washMultilineStrings(job.text)
+        if count is None:
+            first, count = 0, len(self.lines)
+            self.segments = []
+        if first < 0 or count < 0 or first + count > len(self.lines):
+            return False
+
+        # The state at the end of the last replaced line
+        oldState = self.states[first + count - 1] if first + count > 0 else None
+
+        # Replace lines
+        end = first + len(lines)
+        self.lines[first : first + count] = lines
+        self.states[first : first + count] = [None] * len(lines)
+        self.records[first : first + count] = [None] * len(lines)
+
+        # Wash the new lines, and the lines after it, until the state
+        # matches the state of the old lines
+        washedLines = {}
+        state = self.states[first - 1] if first > 0 else None
+        i = first
+        while i < len(self.lines):
+            if i >= end:
+                if state == oldState:
+                    break
+                oldState = self.states[i]
+            washedLines[i], state = washLine(self.lines[i], state)
+            self.states[i] = state
+            i += 1
+
+        def getWashedLine(i):
+            if i not in washedLines:
+                washedLines[i] = self.washedLine(i)
+            return washedLines[i]
+
+        def getNextLines(i):
+            i2 = min(i + DEF_LOOKAHEAD + 1, len(self.lines))
+            return [getWashedLine(ii) for ii in range(i + 1, i2)]
+
+        # Analyse the washed lines, and the lines above, which
+        # may be the start of a multiline def
+        i1, i2 = max(0, first - DEF_LOOKAHEAD), i
+        for i in range(i1, i2):
+            nextLines = functools.partial(getNextLines, i)
+            self.records[i] = analyzeLine(getWashedLine(i), nextLines)
+
+        # Update the segments
+        self._updateSegments(i1, i2, len(lines) - count)
+        return True
+
+    def _updateSegments(self, i1, i2, delta):
+        """Update the segments after the lines i1 up to i2 have been
+        analysed again, and the number of lines changed by delta.
+        """
 
-        # Split text in lines
-        lines = text.splitlines()
-        lines.insert(0, "")  # so the lines start at 1
+        segments = self.segments
+        if not segments:
+            self.segments = self._makeSegments(0, len(self.lines))
+            self._lastSegment = 0, 0
+            return
+
+        # Get the segments that contain the changed lines (in old line numbers).
+        # Also take the segment before, which grows if a segment start is removed.
+        k1, start = self._findSegment(max(i1 - 1, 0))
+        k2, start2 = self._findSegment(max(i2 - delta, i1 + 1) - 1)
+        end = start2 + segments[k2].length + delta
+
+        # Replace these by new segments. The segments after it do not change,
+        # as their line numbers are relative to their start.
+        segments[k1 : k2 + 1] = self._makeSegments(start, end)
+        self._lastSegment = (k1, start) if k1 < len(segments) else (0, 0)
+
+    def _findSegment(self, linenr):
+        """Get the index and the start of the segment that contains the
+        given line. The search starts at the segment that was found the
+        previous time, so that it is fast for edits close to each other.
+        """
+        segments = self.segments
+        k, start = self._lastSegment
+        while k > 0 and start > linenr:
+            k -= 1
+            start -= segments[k].length
+        while k + 1 < len(segments) and start + segments[k].length <= linenr:
+            start += segments[k].length
+            k += 1
+        self._lastSegment = k, start
+        return k, start
+
+    def _makeSegments(self, start, end):
+        """Make the segments for the lines start up to end. A new segment
+        starts at each line with code that is not indented.
+        """
+        records = self.records
+        segments = []
+        i1 = start
+        for i in range(start + 1, end):
+            record = records[i]
+            if record is not None and record[0] == 0 and record[2] is not None:
+                segments.append(Segment(records, i1, i))
+                i1 = i
+        if i1 < end:
+            segments.append(Segment(records, i1, end))
+        return segments
+
+
+class Segment:
+    """A part of the structure of a source file, that starts at a line with
+    code that is not indented. At such a line all objects are closed, so
+    that each segment can be analysed independently of the other segments.
+
+    The line numbers of the objects are relative to the start of the
+    segment, so that a segment (which can be shared by several results)
+    does not change when lines are inserted or removed above it.
+    """
+
+    def __init__(self, records, start, end):
+        self.length = end - start  # the number of lines
+        self.rootItems = []  # the objects and leafs that are in the root
+        self.orphanLeafs = []  # leafs that go after the last def before the segment
+        self.openItems = []  # the objects that are open at the end of the segment
+        self.importList = []
+        self.hasDefs = False
+        self._analyze(records, start, end)
+
+    def _analyze(self, records, start, end):
+        """Produce the objects from the analysis of the lines."""
 
         # The structure object. It will first only consist of class and defs
         # the rest will be inserted afterwards.
@@ -369,7 +784,7 @@ class Parser(threading.Thread):
         leafs = []
 
         # Keep a list of imports
-        importList = []
+        importList = self.importList
 
         # To know when to make something new when for instance a class is defined
         # in an if statement, we keep track of the last valid node/object:
@@ -388,44 +803,24 @@ class Parser(threading.Thread):
             object.parent = node
             lastObject[0] = object
 
-        # Find objects!
+        # Find objects! The lines start at 1 (at the start of the segment).
         # type can be: cell, class, def, import, var
-        for i, line in enumerate(lines):
-            # Should we stop?
-            if self._exit:
-                break
-
-            # Remove indentation
-            tmp = line.lstrip()
-            indent = len(line) - len(tmp)
-            line = tmp.rstrip()
-
-            # Detect cells
-            cellPrefixes = ("##", "#%%", "# %%")
-            if line.startswith(cellPrefixes):
-                for s in cellPrefixes:
-                    if line.startswith(s):
-                        name = line[len(s) :].lstrip()
-                        break
-                item = FictiveObject("cell", i, indent, name)
-                leafs.append(item)
-                # Next! (we have to put this before the elif stuff below
-                # because it looks like a comment!)
+        for i in range(1, end - start + 1):
+            # Skip empty lines
+            record = records[start + i - 1]
+            if record is None:
                 continue
+            indent, leaf, kind, info = record
 
-            # Split in line and comment
-            line, tmp, cmnt = line.partition("#")
-            line, cmnt = line.rstrip(), cmnt.strip()
-
-            # Detect todos
-            firstWord = cmnt.lstrip().split(" ", 1)[0].rstrip(":")
-            if firstWord.lower() in ["todo", "2do", "fixme"]:
-                item = FictiveObject("todo", i, indent, cmnt)
-                item.linenr2 = i + 1  # a todo is active at one line only
+            # Cells and todos
+            if leaf is not None:
+                item = FictiveObject(leaf[0], i, indent, leaf[1])
+                if leaf[0] == "todo":
+                    item.linenr2 = i + 1  # a todo is active at one line only
                 leafs.append(item)
 
-            # Continue of no line left
-            if not line:
+            # Continue of no code on this line
+            if kind is None:
                 continue
 
             # Find last valid node. As the indent of the root is set to -1,
@@ -434,90 +829,42 @@ class Parser(threading.Thread):
                 lastObject[0].linenr2 = i  # close object
                 lastObject[0] = lastObject[0].parent
 
-            # Make a lowercase version of the line
-            foundSomething = False
-
-            # Detect classes
-            if not foundSomething:
-                classResult = classPattern.search(line)
-
-                if classResult:
-                    foundSomething = True
-                    # Get name
-                    name = classResult.group(2)
-                    item = FictiveObject("class", i, indent, name)
-                    appendToStructure(item)
-                    item.supers = []
-                    item.members = []
-                    # Get inheritance
-                    supers = classResult.group(3)
-                    if supers:
-                        supers = supers[1:-1].split(",")
-                        supers = [tmp.strip() for tmp in supers]
-                        item.supers = [tmp for tmp in supers if tmp]
-
-            # Detect functions and methods (also multiline)
-            if (not foundSomething) and line.count("def "):
-                # Get a multiline version (for long defs)
-                multiLine = line
-                for ii in range(1, 16):
-                    if i + ii < len(lines):
-                        multiLine += " " + lines[i + ii].strip()
-                # Get result
-                defResult = defPattern.search(multiLine)
-                if defResult:
-                    # Get name
-                    name = defResult.group(4)
-                    item = FictiveObject("def", i, indent, name)
-                    appendToStructure(item)
-                    item.selfname = None  # will be filled in if a valid method
-                    item.sig = defResult.group(5)
-                    # is it a method? -> add method to attr and find selfname
-                    if item.parent.type == "class":
-                        item.parent.members.append(name)
-
-                        # Find what is used as "self"
-                        i2 = line.find("(")
-                        i4 = line.find(",", i2)
-                        if i4 < 0:
-                            i4 = line.find(")", i2)
-                        if i4 < 0:
-                            i4 = i2
-                        selfname = line[i2 + 1 : i4].strip()
-                        if selfname:
-                            item.selfname = selfname
-
-            elif line.count("import "):
-                if line.startswith("import "):
-                    for name in ParseImport(line[7:]):
-                        item = FictiveObject("import", i, indent, name)
-                        item.text = line
-                        item.linenr2 = i + 1  # an import is active at one line only
-                        leafs.append(item)
-                        importList.append(item)
-
-                elif line.startswith("from "):
-                    i1 = line.find(" import ")
-                    for name in ParseImport(line[i1 + 8 :]):
-                        if not IsValidName(name):
-                            continue  # we cannot do that!
-                        item = FictiveObject("import", i, indent, name)
-                        item.text = line
-                        item.linenr2 = i + 1  # an import is active at one line only
-                        leafs.append(item)
-                        importList.append(item)
-
-            elif (
-                not indent and line.startswith("if __name__ ==") and "__main__" in line
-            ):
+            if kind == "class":
+                name, supers = info
+                item = FictiveObject("class", i, indent, name)
+                appendToStructure(item)
+                item.supers = list(supers)
+                item.members = []
+
+            elif kind == "def":
+                name, sig, selfname = info
+                item = FictiveObject("def", i, indent, name)
+                appendToStructure(item)
+                item.selfname = None  # will be filled in if a valid method
+                item.sig = sig
+                # is it a method? -> add method to attr and set selfname
+                if item.parent.type == "class":
+                    item.parent.members.append(name)
+                    item.selfname = selfname
+
+            elif kind == "import":
+                names, text = info
+                for name in names:
+                    item = FictiveObject("import", i, indent, name)
+                    item.text = text
+                    item.linenr2 = i + 1  # an import is active at one line only
+                    leafs.append(item)
+                    importList.append(item)
+
+            elif kind == "nameismain":
                 item = FictiveObject("nameismain", i, indent, "__main__")
-                item.text = line
+                item.text = info
                 appendToStructure(item)
 
-            elif line.count("="):
+            elif kind == "assign":
                 if lastObject[0].type == "def" and lastObject[0].selfname:
                     selfname = lastObject[0].selfname + "."
-                    line = line.partition("=")[0]
+                    line = info
                     if line.count(selfname):
                         # A lot of ifs here. If we got here, the line is part of
                         # a valid method and contains the selfname before the =.
@@ -535,41 +882,44 @@ class Parser(threading.Thread):
                                 item = FictiveObject("attribute", i, indent, part2)
                                 item.parent = defItem
                                 defItem.children.append(item)
+                                flatList.append(item)
                                 if part2 not in classItem.members:
                                     classItem.members.append(part2)
 
+        # The objects that are still open are closed by the next segment
+        while lastObject[0] is not root:
+            self.openItems.append(lastObject[0])
+            lastObject[0] = lastObject[0].parent
+
         ## Post processing
 
-        def getTwoItems(series, linenr):
+        # The classes and defs, to find the two items just above and below
+        # the line of a leaf. The flat list is sorted by line number.
+        series = [ob for ob in flatList if ob.type in ["class", "def"]]
+        seriesLinenrs = [ob.linenr for ob in series]
+        self.hasDefs = bool(series)
+
+        def getTwoItems(linenr):
             """Return the two items just above and below the
             given linenr. The object always is a class or def.
             """
-            # find object after linenr
             object1, object2 = None, None  # if no items at all
-            i = -1
-            for i, object in enumerate(series):
-                if object.type not in ["class", "def"]:
-                    continue
-                if object.linenr > linenr:
-                    object2 = object
-                    break
-            # find object just before linenr
-            for ii in range(i, -1, -1):
-                object = series[ii]
-                if object.type not in ["class", "def"]:
-                    continue
-                if object.linenr < linenr:
-                    object1 = object
-                    break
-            # return result
+            i = bisect.bisect_right(seriesLinenrs, linenr)
+            if i < len(series):
+                object2 = series[i]
+            i = bisect.bisect_left(seriesLinenrs, linenr) - 1
+            if i >= 0:
+                object1 = series[i]
             return object1, object2
 
-        # insert the leafs (backwards as the last inserted is at the top)
-        for leaf in reversed(leafs):
-            ob1, ob2 = getTwoItems(flatList, leaf.linenr)
+        # Find where to insert the leafs. For each parent, collect the leafs
+        # to insert at the start (key None) or after a sibling.
+        insertions = {}  # key: parent; value: dict of lists of leafs
+        for leaf in leafs:
+            ob1, ob2 = getTwoItems(leaf.linenr)
             if ob1 is None:  # also if ob2 is None
-                # insert in root
-                root.children.insert(0, leaf)
+                # insert in root, after the last def of the segments before
+                self.orphanLeafs.append(leaf)
                 leaf.parent = root
                 continue
             if ob2 is None:
@@ -591,104 +941,200 @@ class Parser(threading.Thread):
                     break
 
             # insert into ob1, after sibling (if available)
-            L = ob1.children
-            if sibling:
-                i = L.index(sibling)
-                L.insert(i + 1, leaf)
-            else:
-                L.insert(0, leaf)
+            insertions.setdefault(ob1, {}).setdefault(sibling, []).append(leaf)
 
-        # Return result
-        return Result(root, importList, job.editorId)
+        # Insert the leafs, in one go for each parent
+        for parent, leafsPerSibling in insertions.items():
+            children = leafsPerSibling.get(None, [])
+            for child in parent.children:
+                children.append(child)
+                children.extend(leafsPerSibling.get(child, ()))
+            parent.children = children
 
-
-## Helper classes and functions
+        self.rootItems = root.children
 
 
-class FictiveObject:
-    """An un-instantiated object.
-    type can be class, def, import, cell, todo
-    extra stuff:
-    class   - supers, members
-    def     - selfname
-    imports - text
-    cell    -
-    todo    -
-    attribute -
+class Placement:
+    """The place of a segment in a result: the line at which it starts, and
+    the line at which the objects that are open at its end are closed.
     """
 
-    def __init__(self, type, linenr, indent, name):
-        self.children = []
-        self.type = type
-        self.linenr = linenr  # at which line this object starts
-        self.linenr2 = 9999999  # at which line it ends
-        self.indent = indent
-        self.name = name
-        self.sig = ""  # for functions and methods
+    def __init__(self, segment, start, closeLinenr, root):
+        self.openItems = segment.openItems
+        self.start = start
+        self.closeLinenr = closeLinenr
+        self.root = root
 
+    def place(self, objects, parent=None):
+        """Get a list of PlacedObject objects for the given objects."""
+        return [PlacedObject(ob, self, parent) for ob in objects]
 
-def IsValidName(name):
-    """Given a string, checks whether it is a
-    valid name (dots are not valid!)
-    """
-    return name.isidentifier()
 
+class PlacedObject:
+    """A FictiveObject of a segment, with the line numbers in the source
+    file. The other attributes are those of the FictiveObject. The parent
+    and children are placed when they are first needed.
+    """
 
-def ParseImport(names):
-    for part in names.split(","):
-        i1 = part.find(" as ")
-        if i1 > 0:
-            name = part[i1 + 3 :].strip()
+    def __init__(self, ob, placement, parent=None):
+        self._ob = ob
+        self._placement = placement
+        self._parent = parent
+        self._children = None
+        self.linenr = ob.linenr + placement.start
+        if ob.linenr2 < MAXLINENR:
+            self.linenr2 = ob.linenr2 + placement.start
+        elif ob in placement.openItems:
+            self.linenr2 = placement.closeLinenr
         else:
-            name = part.strip()
-        yield name
-
+            self.linenr2 = MAXLINENR
 
-def findString(text, s, i):
-    """find s in text, but only if s is not in a string or commented
+    def __getattr__(self, name):
+        return getattr(self._ob, name)
 
-    Helper function for washMultilineStrings
+    @property
+    def parent(self):
+        if self._parent is None:
+            parent = self._ob.parent
+            if parent.type == "root":
+                self._parent = self._placement.root
+            else:
+                self._parent = PlacedObject(parent, self._placement)
+        return self._parent
+
+    @property
+    def children(self):
+        if self._children is None:
+            self._children = self._placement.place(self._ob.children, self)
+        return self._children
+
+
+def analyzeLine(line, getNextLines):
+    """Analyse a single (washed) line of code.
+
+    Returns None for an empty line, or a tuple (indent, leaf, kind, info).
+    The leaf is None or a tuple (type, name) for a cell or todo item.
+    The kind is None if the line has no code, or one of "code", "class",
+    "def", "import", "nameismain" and "assign", with info:
+    class       - (name, supers)
+    def         - (name, sig, selfname)
+    import      - (names, line)
+    nameismain  - line
+    assign      - the part before the "="
+    getNextLines is called to get the next lines for multiline defs.
     """
 
-    while True:
-        i = _findString(text, s, i)
-        if i < -1:
-            i = -i + 1
+    # Remove indentation
+    tmp = line.lstrip()
+    indent = len(line) - len(tmp)
+    line = tmp.rstrip()
+    if not line:
+        return None
+
+    # Detect cells
+    if line.startswith(cellPrefixes):
+        for s in cellPrefixes:
+            if line.startswith(s):
+                name = line[len(s) :].lstrip()
+                break
+        return indent, ("cell", name), None, None
+
+    # Split in line and comment
+    line, tmp, cmnt = line.partition("#")
+    line, cmnt = line.rstrip(), cmnt.strip()
+
+    # Detect todos
+    leaf = None
+    firstWord = cmnt.lstrip().split(" ", 1)[0].rstrip(":")
+    if firstWord.lower() in ["todo", "2do", "fixme"]:
+        leaf = "todo", cmnt
+
+    # Done if no line left
+    if not line:
+        return (indent, leaf, None, None) if leaf else None
+
+    # Detect classes
+    classResult = classPattern.search(line)
+    if classResult:
+        # Get name
+        name = classResult.group(2)
+        # Get inheritance
+        supers = classResult.group(3)
+        if supers:
+            supers = supers[1:-1].split(",")
+            supers = [tmp.strip() for tmp in supers]
+            supers = [tmp for tmp in supers if tmp]
+        else:
+            supers = []
+        return indent, leaf, "class", (name, supers)
+
+    # Detect functions and methods (also multiline)
+    if line.count("def "):
+        # Get a multiline version (for long defs)
+        multiLine = " ".join([line] + [tmp.strip() for tmp in getNextLines()])
+        # Get result
+        defResult = defPattern.search(multiLine)
+        if not defResult:
+            return indent, leaf, "code", None
+        # Find what is used as "self" (if this is a method)
+        i2 = line.find("(")
+        i4 = line.find(",", i2)
+        if i4 < 0:
+            i4 = line.find(")", i2)
+        if i4 < 0:
+            i4 = i2
+        selfname = line[i2 + 1 : i4].strip() or None
+        return indent, leaf, "def", (defResult.group(4), defResult.group(5), selfname)
+
+    elif line.count("import "):
+        if line.startswith("import "):
+            names = list(ParseImport(line[7:]))
+        elif line.startswith("from "):
+            i1 = line.find(" import ")
+            names = [name for name in ParseImport(line[i1 + 8 :]) if IsValidName(name)]
         else:
-            break
-    return i
+            names = []
+        return indent, leaf, "import", (names, line)
+
+    elif not indent and line.startswith("if __name__ ==") and "__main__" in line:
+        return indent, leaf, "nameismain", line
 
+    elif line.count("="):
+        return indent, leaf, "assign", line.partition("=")[0]
 
-def _findString(text, s, i):
-    """Helper function of findString, which is called recursively
-    until a match is found, or it is clear there is no match."""
+    return indent, leaf, "code", None
 
-    # Find occurrence
-    i2 = text.find(s, i)
-    if i2 < 0:
-        return -1
 
-    # Find newline  (if none, we're done)
-    i1 = text.rfind("\n", 0, i2)
-    if i1 < 0:
-        return i2
+def getLines(doc, first, last):
+    """Get the text of the lines first up to last of a QTextDocument."""
+    if (last - first) * 8 > doc.blockCount():
+        # For many lines, splitting the text of the document is much faster
+        return doc.toRawText().split("\u2029")[first:last]
+    lines = []
+    block = doc.findBlockByNumber(first)
+    for i in range(first, last):
+        lines.append(block.text())
+        block = block.next()
+    return lines
 
-    # Extract the part on the line up to the match
-    line = text[i1:i2]
+
+def _isInStringOrComment(line):
+    """Get whether the end of the given line is in a string or comment.
+
+    Helper function for washLine
+    """
 
     # Count quotes, we're done if we found none
     if '"' not in line and "'" not in line and "#" not in line:
-        return i2
+        return False
 
     # So we found quotes, now really count them ...
     prev = ""
     inString = ""  # this is a boolean combined with a flag which quote was used
-    isComment = False
     for c in line:
         if c == "#":
             if not inString:
-                isComment = True
-                break
+                return True
         elif c in "\"'":
             if not inString:
                 inString = c
@@ -698,53 +1144,65 @@ def _findString(text, s, i):
                 else:
                     pass  # the other quote can safely be used inside this string
         prev = c
+    return bool(inString)
+
+
+def _findString(line, s, i):
+    """find s in line, but only if s is not in a string or commented
+
+    Helper function for washLine
+    """
+    while True:
+        i = line.find(s, i)
+        if i < 0 or not _isInStringOrComment(line[:i]):
+            return i
+        i += 1
 
-    # If we are in a string, this match is false ...
-    if inString or isComment:
-        return -i2  # indicate failure and where to continue
-    else:
-        return i2  # all's right
+
+def washLine(line, state=None):
+    """Replace all text within multiline strings in the given line with
+    spaces so that it is not parsed.
+
+    The state is the quote style of the multiline string that is open at
+    the start of the line, or None. Returns the washed line and the state
+    at the end of the line.
+    """
+    i = 0
+    while True:
+        if state is None:
+            # Detect start of a multiline string (there are two versions)
+            i1 = _findString(line, "'''", i)
+            i2 = _findString(line, '"""', i)
+            if i1 == -1 and i2 == -1:
+                return line, None
+            elif i2 == -1 or (i1 != -1 and i1 < i2):
+                state, i = "'''", i1
+            else:
+                state, i = '"""', i2
+            # Leave only the first two quotes of the start of the string
+            i += 2
+            i4 = line.find(state, i + 1)
+        else:
+            i4 = line.find(state, i)
+        # No end found -> wash the rest of the line
+        if i4 == -1:
+            return line[:i] + nonWhitespacePattern.sub(" ", line[i:]), state
+        # Replace all non-whitespace chars
+        i4 += 3
+        line = line[:i] + nonWhitespacePattern.sub(" ", line[i:i4]) + line[i4:]
+        state, i = None, i4 + 1
 
 
 def washMultilineStrings(text):
     """Replace all text within multiline strings with dummy chars
     so that it is not parsed.
     """
-    i = 0
-    s1 = "'''"
-    s2 = '"""'
-    while i < len(text):
-        # Detect start of a multiline comment (there are two versions)
-        i1 = findString(text, s1, i)
-        i2 = findString(text, s2, i)
-        # Stop if nothing found ...
-        if i1 == -1 and i2 == -1:
-            break
-        else:
-            # Make no result be very large
-            if i1 == -1:
-                i1 = 2**60
-            if i2 == -1:
-                i2 = 2**60
-            # Find end of the multiline comment
-            if i1 < i2:
-                i3 = i1 + 3
-                i4 = text.find(s1, i3)
-            else:
-                i3 = i2 + 3
-                i4 = text.find(s2, i3)
-            # No end found -> take all text, unclosed string!
-            if i4 == -1:
-                i4 = 2**32
-            # Leave only the first two quotes of the start of the comment
-            i3 -= 1
-            i4 += 3
-            # Replace all non-newline chars
-            tmp = re.sub(r"\S", " ", text[i3:i4])
-            text = text[:i3] + tmp + text[i3 + len(tmp) :]
-            # Prepare for next round
-            i = i4 + 1
-    return text
+    lines = []
+    state = None
+    for line in text.split("\n"):
+        line, state = washLine(line, state)
+        lines.append(line)
+    return "\n".join(lines)
 
 
 """
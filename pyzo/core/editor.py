@@ -10,6 +10,7 @@ import os
 import sys
 import re
 import codecs
+import hashlib
 
 from pyzo.qt import QtCore, QtGui, QtWidgets
 
@@ -186,15 +187,38 @@ def determineIndentationAndTrailingWS(text):
     return indent, trailing
 
 
+def getFingerprint(bb):
+    """Get a (size, digest) tuple that identifies the given bytes."""
+    return len(bb), hashlib.sha1(bb).digest()
+
+
+def getFileFingerprint(filepath, chunkSize=2**20):
+    """Get the fingerprint of the contents of the given file, without
+    reading it into memory at once.
+    """
+    size = 0
+    h = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        while True:
+            bb = f.read(chunkSize)
+            if not bb:
+                break
+            size += len(bb)
+            h.update(bb)
+    return size, h.digest()
+
+
 # To give each new file a unique name
 newFileCounter = 0
 
 
-def createEditor(parent, filename=None):
+def createEditor(parent, filename=None, lazy=False):
     """Tries to load the file given by the filename and
     if succesful, creates an editor instance to put it in,
     which is returned.
     If filename is None, an new/unsaved/temp file is created.
+    If lazy is True, the file is only read when the editor is first
+    shown (or when its text is needed), see PyzoEditor.ensureLoaded().
     """
 
     if filename is None:
@@ -210,6 +234,9 @@ def createEditor(parent, filename=None):
         # Set name
         editor._name = "<tmp {}>".format(newFileCounter)
 
+        # todo: rename style -> parser
+        editor.setParser(pyzo.config.settings.defaultStyle)
+
     else:
         # check and normalize
         if not os.path.isfile(filename):
@@ -218,23 +245,14 @@ def createEditor(parent, filename=None):
         # create editor
         editor = PyzoEditor(parent)
 
-        text = editor._loadTextFromFile(filename)
-
         # store name and filename
         editor._filename = filename
         editor._name = os.path.split(filename)[1]
 
-    if editor._filename:
-        editor._modifyTime = os.path.getmtime(editor._filename)
-
-    # Set parser
-    if editor._filename:
-        ext = os.path.splitext(editor._filename)[1]
-        parser = Manager.suggestParser(ext, text)
-        editor.setParser(parser)
-    else:
-        # todo: rename style -> parser
-        editor.setParser(pyzo.config.settings.defaultStyle)
+        if lazy:
+            editor._pendingLoad = 0, 0
+        else:
+            editor._loadFile()
 
     # return
     return editor
@@ -244,6 +262,9 @@ class PyzoEditor(BaseTextCtrl):
     # called when dirty changed or filename changed, etc
     somethingChanged = QtCore.Signal()
 
+    # emitted (with the editor) if a lazily loaded file could not be loaded
+    loadFailed = QtCore.Signal(object)
+
     def __repr__(self):
         return "<{} - {}, {}>".format(self.__class__.__qualname__, id(self), self.name)
 
@@ -262,6 +283,9 @@ class PyzoEditor(BaseTextCtrl):
         self.setWrap(bool(pyzo.config.view.wrap))
         self.setHighlightCurrentLine(pyzo.config.view.highlightCurrentLine)
         self.setLongLineIndicatorPosition(pyzo.config.view.edgeColumn)
+        # Highlight large files in slices, and only the visible part of huge files
+        self.setHighlightTimeSlice(pyzo.config.advanced.highlightTimeSlice)
+        self.setHighlightMaxSize(pyzo.config.advanced.highlightMaxFileSize * 2**20)
         # TODO: self.setFolding( int(view.codeFolding)*5 )
         # bracematch is set in baseTextCtrl, since it also applies to shells
         # dito for zoom and tabWidth
@@ -274,11 +298,15 @@ class PyzoEditor(BaseTextCtrl):
 
         # Modification time to test file change
         self._modifyTime = 0
-        self._binaryDataFromFile = None  # the binary data as it was loaded or saved
+        self._fingerprint = None  # of the file contents as they were loaded or saved
+
+        # Cursor and scroll position to apply when a lazy file is loaded
+        self._pendingLoad = None
 
         self.modificationChanged.connect(self._onModificationChanged)
 
         # To see whether the doc has changed to update the parser.
+        self.document().contentsChange.connect(self._onContentsChange)
         self.textChanged.connect(self._onModified)
 
         # This timer is used to hide the marker that shows which code is executed
@@ -293,8 +321,7 @@ class PyzoEditor(BaseTextCtrl):
         self.cursorPositionChanged.connect(self._updateStatusBar)
 
     def closeEvent(self, event):
-        # free some memory to mitigate memory leak losses
-        del self._binaryDataFromFile
+        pyzo.parser.forget(self)
 
     ## Properties
 
@@ -331,6 +358,59 @@ class PyzoEditor(BaseTextCtrl):
 
     ##
 
+    def isLoaded(self):
+        """Get whether the text of the file is loaded. This is False
+        for editors created with lazy=True that have not been shown yet.
+        """
+        return self._pendingLoad is None
+
+    def ensureLoaded(self):
+        """Load the text of the file, if this was postponed."""
+        if self._pendingLoad is None:
+            return
+        position, scroll = self._pendingLoad
+        self._pendingLoad = None
+        try:
+            self._loadFile()
+        except Exception as err:
+            print("Error loading file: ", err)
+            # Unbind the file, so that saving this empty editor cannot
+            # overwrite it. The editor tabs will remove the editor.
+            self._filename = ""
+            self.loadFailed.emit(self)
+            return
+        self.setCursorAndScrollPosition(position, scroll)
+
+    def cursorAndScrollPosition(self):
+        """Get the position of the text cursor and the vertical scroll bar."""
+        if self._pendingLoad is not None:
+            return self._pendingLoad
+        return self.textCursor().position(), self.verticalScrollBar().value()
+
+    def setCursorAndScrollPosition(self, position, scroll):
+        """Set the position of the text cursor and the vertical scroll bar.
+        For a file that is not loaded yet, this is done when it is loaded.
+        """
+        if self._pendingLoad is not None:
+            self._pendingLoad = position, scroll
+            return
+        cursor = self.textCursor()
+        cursor.setPosition(min(position, self.document().characterCount() - 1))
+        self.setTextCursor(cursor)
+        self.verticalScrollBar().setValue(scroll)
+
+    def toPlainText(self):
+        self.ensureLoaded()
+        return super().toPlainText()
+
+    def _loadFile(self):
+        """Load the text from our file, and set the parser that fits it."""
+        text = self._loadTextFromFile(self._filename)
+        self._modifyTime = os.path.getmtime(self._filename)
+        ext = os.path.splitext(self._filename)[1]
+        parser = Manager.suggestParser(ext, text)
+        self.setParser(parser)
+
     def _loadTextFromFile(self, filepath):
         with open(filepath, "rb") as f:
             bb = f.read()
@@ -396,7 +476,7 @@ class PyzoEditor(BaseTextCtrl):
         # set text
         self.setPlainText(text)
         self.document().setModified(not ok)
-        self._binaryDataFromFile = bb
+        self._fingerprint = getFingerprint(bb)
         return text
 
     def _saveTextToFile(self, filepath):
@@ -412,7 +492,7 @@ class PyzoEditor(BaseTextCtrl):
         if not encoding.startswith("utf-8"):
             self.useBom = False
 
-        self._binaryDataFromFile = bb
+        self._fingerprint = getFingerprint(bb)
 
         print(
             "saved file: {} ({}, {})".format(
@@ -538,10 +618,14 @@ class PyzoEditor(BaseTextCtrl):
         # whatever the user will decide, we will reset the modified time
         self._modifyTime = mtime
 
+        # Compare the size first, so the file is only read if needed
         try:
-            with open(filepath, "rb") as f:
-                bb = f.read()
-            if bb == self._binaryDataFromFile:
+            size = os.path.getsize(filepath)
+            if (
+                self._fingerprint is not None
+                and size == self._fingerprint[0]
+                and getFileFingerprint(filepath) == self._fingerprint
+            ):
                 print(
                     "modification time of file {} changed, but content is the same".format(
                         filepath
@@ -558,6 +642,9 @@ class PyzoEditor(BaseTextCtrl):
         for the editorStack to update the modification notice."""
         self.somethingChanged.emit()
 
+    def _onContentsChange(self, position, charsRemoved, charsAdded):
+        pyzo.parser.registerChange(self, position, charsRemoved, charsAdded)
+
     def _onModified(self):
         pyzo.parser.parseThis(self)
 
@@ -601,6 +688,9 @@ class PyzoEditor(BaseTextCtrl):
 
     def showEvent(self, event=None):
         """Capture show event to change title."""
+        # Load the file, if this was postponed
+        self.ensureLoaded()
+
         # Act normally
         if event:
             super().showEvent(event)
@@ -616,6 +706,8 @@ class PyzoEditor(BaseTextCtrl):
     def save(self, filename=None):
         """Save the file. No checking is done."""
 
+        self.ensureLoaded()
+
         # get filename
         if filename is None:
             filename = self._filename
@@ -714,6 +806,7 @@ class PyzoEditor(BaseTextCtrl):
 
     def saveCopy(self, filepath):
         """Creates a backup of the current editor's contents. No checking is done."""
+        self.ensureLoaded()
         self._saveTextToFile(filepath)
 
     def reload(self):
@@ -728,6 +821,11 @@ class PyzoEditor(BaseTextCtrl):
             return
         filename = self._filename
 
+        # A file that is not loaded yet can simply be loaded now
+        if not self.isLoaded():
+            self.ensureLoaded()
+            return
+
         # Remember where we are
         cursor = self.textCursor()
         linenr = cursor.blockNumber() + 1
@@ -998,9 +1096,15 @@ if __name__ == "__main__":
     # Do some stubbing to run this module as a unit separate from pyzo
     # TODO: untangle pyzo from this module where possible
     class DummyParser:
+        def registerChange(self, x, *args):
+            pass
+
         def parseThis(self, x):
             pass
 
+        def forget(self, x):
+            pass
+
     pyzo.parser = DummyParser()
     EditorContextMenu = QtWidgets.QMenu
     app = QtWidgets.QApplication([])
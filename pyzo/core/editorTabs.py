@@ -13,6 +13,9 @@ import sys
 import time
 import re
 import gc
+import weakref
+import threading
+from bisect import bisect_left, bisect_right
 from pyzo.qt import QtCore, QtGui, QtWidgets
 
 import pyzo
@@ -27,6 +30,11 @@ Qt = QtCore.Qt
 
 ismacos = sys.platform.startswith("darwin")
 
+# The average number of bytes per line of source files (about 35 for the
+# Python files of pyzo and of the standard library). It is used to estimate
+# the line count, shown in the tab icon, of files that are not loaded yet.
+BYTES_PER_LINE = 35
+
 
 def simpleDialog(item, action, question, options, defaultOption):
     """builds and displays a simple dialog
@@ -214,6 +222,195 @@ class LineEditWithShiftReturn(QtWidgets.QLineEdit):
 
 
 # todo: when this works with the new editor, put in own module.
+# Characters outside the BMP take two positions in a QTextDocument
+_astralRe = re.compile("[\U00010000-\U0010ffff]")
+
+
+def _getMatchSpans(regExp, text, offset=0):
+    """Get two lists with the start and end positions of the matches of
+    the regExp in the text, as positions in the document (at the given
+    offset).
+    """
+    astral = [mo.start() for mo in _astralRe.finditer(text)]
+    starts, ends = [], []
+    for mo in regExp.finditer(text):
+        i1, i2 = mo.span()
+        if astral:
+            i1 += bisect_left(astral, i1)
+            i2 += bisect_left(astral, i2)
+        starts.append(offset + i1)
+        ends.append(offset + i2)
+    return starts, ends
+
+
+def _indexToPosition(text, i):
+    """Convert an index in the text of a document to a position in it."""
+    return i + len(_astralRe.findall(text, 0, i))
+
+
+def _positionToIndex(text, pos):
+    """Convert a position in the document to an index in its text."""
+    astral = [mo.start() + i for i, mo in enumerate(_astralRe.finditer(text, 0, pos))]
+    return pos - bisect_left(astral, pos)
+
+
+class MatchIndex(QtCore.QObject):
+    """MatchIndex(document, regExp, incremental)
+
+    The positions of the matches of a regular expression in a document,
+    to quickly find the next match and count the matches. The index is
+    valid for a revision of the document. If incremental is True (the
+    matches never span multiple lines), the index is updated for the
+    changed lines when the document changes. Otherwise, it is made
+    invalid, and the document is scanned again when needed.
+
+    Large documents are scanned in a thread, and the ready signal is
+    emitted when done.
+    """
+
+    ready = QtCore.Signal(object)
+    _scanned = QtCore.Signal(int, object, object)
+
+    # Documents with more characters than this are scanned in a thread
+    MAX_SYNC_LENGTH = 2**20
+
+    def __init__(self, document, regExp, incremental):
+        super().__init__()
+        self._doc = document
+        self._regExp = regExp
+        self._incremental = incremental
+        self._starts = []
+        self._ends = []
+        self._revision = None  # None means that the index is not valid
+        self._length = 0
+        self._scanId = 0
+        self._scanRevision = None  # the revision that is being scanned
+        self._scanned.connect(self._onScanned)
+        document.contentsChange.connect(self._onContentsChange)
+
+    def regExp(self):
+        """Get the compiled regular expression of this index."""
+        return self._regExp
+
+    def close(self):
+        """Stop updating this index."""
+        self._scanId += 1
+        try:
+            self._doc.contentsChange.disconnect(self._onContentsChange)
+        except (RuntimeError, TypeError):
+            pass  # document deleted
+
+    def isReady(self, getText):
+        """Get whether the index is valid for the current document. If not,
+        a scan is started, using getText() to get the text of the document.
+        Small documents are scanned right away.
+        """
+        doc = self._doc
+        revision = doc.revision()
+        if self._revision == revision:
+            return True
+        elif self._scanRevision == revision:
+            return False  # a scan is in progress
+        self._scanId += 1
+        self._scanRevision = None
+        if doc.characterCount() <= self.MAX_SYNC_LENGTH:
+            self._onScanned(self._scanId, *_getMatchSpans(self._regExp, getText()))
+            return True
+        else:
+            self._scanRevision = revision
+            t = threading.Thread(target=self._scan, args=(self._scanId, getText()))
+            t.daemon = True
+            t.start()
+            return False
+
+    def _scan(self, scanId, text):
+        """Scan the text, in a thread."""
+        try:
+            starts, ends = _getMatchSpans(self._regExp, text)
+        except Exception:
+            starts, ends = [], []
+        self._scanned.emit(scanId, starts, ends)
+
+    def _onScanned(self, scanId, starts, ends):
+        if scanId != self._scanId:
+            return  # a newer scan was started
+        revision = self._doc.revision()
+        scanRevision, self._scanRevision = self._scanRevision, None
+        if scanRevision not in (None, revision):
+            return  # the document changed during the scan
+        self._starts, self._ends = starts, ends
+        self._revision = revision
+        self._length = self._doc.characterCount()
+        if scanRevision is not None:
+            self.ready.emit(self)
+
+    def _onContentsChange(self, position, charsRemoved, charsAdded):
+        doc = self._doc
+        if self._revision is None or self._revision == doc.revision():
+            return  # not valid, or only the formatting changed
+        delta = charsAdded - charsRemoved
+        if not self._incremental or doc.characterCount() != self._length + delta:
+            self._revision = None
+            return
+
+        # Get the (new) lines that changed, and the old end of these lines
+        block1 = doc.findBlock(position)
+        block2 = doc.findBlock(position + charsAdded)
+        start = block1.position()
+        end = block2.position() + block2.length() - 1
+        i1 = bisect_left(self._starts, start)
+        i2 = bisect_right(self._starts, end - delta)
+
+        # Scan these lines, and shift the matches after them
+        cursor = QtGui.QTextCursor(doc)
+        cursor.setPosition(start)
+        cursor.setPosition(end, cursor.MoveMode.KeepAnchor)
+        text = cursor.selectedText().replace("\u2029", "\n")
+        starts, ends = _getMatchSpans(self._regExp, text, start)
+        if delta:
+            starts += [i + delta for i in self._starts[i2:]]
+            ends += [i + delta for i in self._ends[i2:]]
+            i2 = len(self._starts)
+        self._starts[i1:i2] = starts
+        self._ends[i1:i2] = ends
+
+        self._revision = doc.revision()
+        self._length = doc.characterCount()
+
+    def count(self):
+        """Get the number of matches."""
+        return len(self._starts)
+
+    def find(self, pos, forward=True):
+        """Find the first match at or after the given position, or the last
+        match before it if not forward, wrapping around the document.
+        Returns (matchNumber, start, end, wrapped), or None if there are
+        no matches.
+        """
+        n = len(self._starts)
+        if not n:
+            return None
+        if forward:
+            i = bisect_left(self._starts, pos)
+            wrapped = i == n
+            if wrapped:
+                i = 0
+        else:
+            i = bisect_right(self._ends, pos) - 1
+            wrapped = i < 0
+            if wrapped:
+                i = n - 1
+        return i + 1, self._starts[i], self._ends[i], wrapped
+
+    def matchNumber(self, start, end):
+        """Get the number of the match with the given span, or None."""
+        i = bisect_left(self._starts, start)
+        if i < len(self._starts) and self._starts[i] == start:
+            if self._ends[i] == end:
+                return i + 1
+        return None
+
+
 class FindReplaceWidget(QtWidgets.QFrame):
     """A widget to find and replace text."""
 
@@ -371,6 +568,7 @@ class FindReplaceWidget(QtWidgets.QFrame):
         layout.addStretch(1)
 
         self._curEditor = None
+        self._matchIndices = weakref.WeakKeyDictionary()  # editor -> MatchIndex
         self.resetSearchResults()
 
         for lineEdit in [self._findText, self._replaceText]:
@@ -550,7 +748,9 @@ class FindReplaceWidget(QtWidgets.QFrame):
         self.findPrevious()
 
     def _find(self, forward=True, editor=None, onlyCount=False, includeSelection=False):
-        """The main find method. Returns the match object."""
+        """The main find method. Returns the (start, end) positions of the
+        match in the document, or None.
+        """
 
         # Reset timer
         self.autoHideTimerReset()
@@ -563,24 +763,17 @@ class FindReplaceWidget(QtWidgets.QFrame):
             if not editor:
                 return None
 
-        # find flags
-        flags = re.MULTILINE
-        if not self._caseCheck.isChecked():
-            flags |= re.IGNORECASE
-
         # focus
         self.selectFindText()
 
-        # get text to find
-        needle = self._findText.text()
-        if not needle:
+        # get regular expression to find
+        try:
+            regExp = self._getFindRegExp()
+        except re.error as err:
+            print("Error in RegExp: {}".format(err))
+            return None
+        if regExp is None:
             return None
-
-        if not self._regExp.isChecked():
-            needle = re.escape(needle)
-
-        if self._wholeWord.isChecked():
-            needle = r"\b" + needle + r"\b"
 
         # establish start position
         cursor = editor.textCursor()
@@ -598,57 +791,96 @@ class FindReplaceWidget(QtWidgets.QFrame):
         else:
             pos = cursor.position()
 
-        haystack = editor.toPlainText()
-        cntMatches = 0
-        result = None
-        resultWrapped = None
-        try:
-            for mo in re.finditer(needle, haystack, flags):
-                cntMatches += 1
-                if forward:
-                    if not resultWrapped:
-                        resultWrapped = cntMatches, mo
-                    if not result:
-                        if mo.start() >= pos:
-                            result = cntMatches, mo
-                else:
-                    resultWrapped = cntMatches, mo
-                    if mo.end() <= pos:
-                        result = cntMatches, mo
-        except re.error as err:
-            print("Error in RegExp: {}".format(err))
-            return None
+        # Use the match index, or search directly while it is being created
+        index = self._getMatchIndex(editor, regExp)
+        if index.isReady(editor.toPlainText):
+            result = index.find(pos, forward)
+            cntMatches = index.count()
+        else:
+            result = self._findDirect(editor, regExp, pos, forward)
+            cntMatches = None
 
         if not result:
-            result = resultWrapped
-            if resultWrapped:
-                self.notifyPassBeginEnd()
-
-        if result:
-            matchNum, mo = result
-            if onlyCount:
-                if not cursor.hasSelection() or pos != mo.start():
-                    matchNum = "-"
-                    # This can happen when the user selects part of a word
-                    # and then presses Ctrl+F, but "Whole words" is activated.
-                    # The cursor position in not changed in "onlyCount" mode,
-                    # so we do not have a current match number.
-            else:
-                cursor.setPosition(mo.start(), cursor.MoveMode.MoveAnchor)
-                cursor.setPosition(mo.end(), cursor.MoveMode.KeepAnchor)
-                editor.gotoBlock(cursor.block().blockNumber(), avoidScrolling=True)
-                editor.setTextCursor(cursor)
-            resultMatchObject = mo
+            return None
 
-            labelText = "{} / {}".format(matchNum, cntMatches)
-            self._setSearchResults(editor, labelText)
+        matchNum, start, end, wrapped = result
+        if wrapped:
+            self.notifyPassBeginEnd()
+
+        if onlyCount:
+            if not cursor.hasSelection() or pos != start:
+                matchNum = None
+                # This can happen when the user selects part of a word
+                # and then presses Ctrl+F, but "Whole words" is activated.
+                # The cursor position in not changed in "onlyCount" mode,
+                # so we do not have a current match number.
+        else:
+            cursor.setPosition(start, cursor.MoveMode.MoveAnchor)
+            cursor.setPosition(end, cursor.MoveMode.KeepAnchor)
+            editor.gotoBlock(cursor.block().blockNumber(), avoidScrolling=True)
+            editor.setTextCursor(cursor)
 
-            if not onlyCount:
-                editor.setFocus()
+        if cntMatches is None:
+            labelText = "counting..."
         else:
-            resultMatchObject = None
+            labelText = "{} / {}".format(matchNum or "-", cntMatches)
+        self._setSearchResults(editor, labelText)
+
+        if not onlyCount:
+            editor.setFocus()
 
-        return resultMatchObject
+        return start, end
+
+    def _findDirect(self, editor, regExp, pos, forward):
+        """Find the next (or previous) match by searching the text, as
+        MatchIndex.find(), but without a match number.
+        """
+        text = editor.toPlainText()
+        i = _positionToIndex(text, pos)
+        if forward:
+            mo = regExp.search(text, i)
+            wrapped = mo is None
+            if wrapped:
+                mo = regExp.search(text)
+        else:
+            mo = None
+            for m in regExp.finditer(text):
+                if m.end() > i:
+                    break
+                mo = m
+            wrapped = mo is None
+            if wrapped:
+                for mo in regExp.finditer(text, i):
+                    pass
+        if mo is None:
+            return None
+        start, end = [_indexToPosition(text, i) for i in mo.span()]
+        return None, start, end, wrapped
+
+    def _getMatchIndex(self, editor, regExp):
+        """Get the MatchIndex for the editor and regular expression."""
+        index = self._matchIndices.get(editor, None)
+        if index is not None:
+            other = index.regExp()
+            if (other.pattern, other.flags) == (regExp.pattern, regExp.flags):
+                return index
+            index.close()
+        # Literal text without newlines cannot match across lines
+        needle = self._findText.text()
+        incremental = not self._regExp.isChecked() and "\n" not in needle
+        index = MatchIndex(editor.document(), regExp, incremental)
+        index.ready.connect(self._onMatchIndexReady)
+        self._matchIndices[editor] = index
+        return index
+
+    def _onMatchIndexReady(self, index):
+        """Show the number of matches when they are counted in a thread."""
+        editor = self._curEditor
+        if editor is None or self._matchIndices.get(editor, None) is not index:
+            return
+        cursor = editor.textCursor()
+        matchNum = index.matchNumber(cursor.selectionStart(), cursor.selectionEnd())
+        self._lblResCount.setText("{} / {}".format(matchNum or "-", index.count()))
 
     def replace(self, event=None):
         i = self._replaceKind.currentIndex()
@@ -677,12 +909,12 @@ class FindReplaceWidget(QtWidgets.QFrame):
         if cursor.hasSelection():
             selBefore = cursor.selectionStart(), cursor.selectionEnd()
 
-        mo = self._find(editor=editor, includeSelection=True)
-        if not mo:
+        span = self._find(editor=editor, includeSelection=True)
+        if not span:
             return
 
         cursor = editor.textCursor()
-        if mo.span() != selBefore:
+        if span != selBefore:
             # We only moved to the first match and selected it
             # because the initially selected text did not match.
             return
@@ -691,6 +923,10 @@ class FindReplaceWidget(QtWidgets.QFrame):
         replacement = self._replaceText.text()
 
         if self._regExp.isChecked():
+            text = editor.toPlainText()
+            mo = self._getFindRegExp().match(text, _positionToIndex(text, span[0]))
+            if mo is None:
+                return
             try:
                 replacement = mo.expand(replacement)
             except re.error as err:
@@ -700,22 +936,17 @@ class FindReplaceWidget(QtWidgets.QFrame):
         cursor.insertText(replacement)  # replaces selection
         self._find(editor=editor)  # find and select next
 
-    def _replaceAll(self, editor=None):
-        # get editor
-        if not editor:
-            editor = self.parent().getCurrentEditor()
-            if not editor:
-                return
-
-        # find flags
+    def _getFindRegExp(self):
+        """Get the compiled regular expression for the find text, or None
+        if there is no find text. Raises re.error for invalid expressions.
+        """
         flags = re.MULTILINE
         if not self._caseCheck.isChecked():
             flags |= re.IGNORECASE
 
-        # get text to find
         needle = self._findText.text()
         if not needle:
-            return
+            return None
 
         if not self._regExp.isChecked():
             needle = re.escape(needle)
@@ -723,49 +954,124 @@ class FindReplaceWidget(QtWidgets.QFrame):
         if self._wholeWord.isChecked():
             needle = r"\b" + needle + r"\b"
 
-        haystack = editor.toPlainText()
+        return re.compile(needle, flags)
 
-        # get replacement
-        replacement = self._replaceText.text()
-        useRegExp = self._regExp.isChecked()
+    def _replaceAll(self, editor=None):
+        # get editor
+        if not editor:
+            editor = self.parent().getCurrentEditor()
+            if not editor:
+                return
 
-        originalCursor = editor.textCursor()
-        cursor = editor.textCursor()
-        cursor.beginEditBlock()
-        cntExtraChars = 0
-        cntMatches = 0
         try:
-            for mo in re.finditer(needle, haystack, flags):
-                cntMatches += 1
-                if useRegExp:
-                    try:
-                        r = mo.expand(replacement)
-                    except re.error as err:
-                        print("Error in RegExp replacement: {}".format(err))
-                        return
-                else:
-                    r = replacement
+            regExp = self._getFindRegExp()
+        except re.error as err:
+            print("Error in RegExp: {}".format(err))
+            return
+        if regExp is None:
+            return
 
-                cursor.setPosition(
-                    cntExtraChars + mo.start(), cursor.MoveMode.MoveAnchor
-                )
-                cursor.setPosition(cntExtraChars + mo.end(), cursor.MoveMode.KeepAnchor)
-                cursor.insertText(r)  # replaces selection
-                delta = len(r) - (mo.end() - mo.start())
-                cntExtraChars += delta
+        self._replaceAllInEditor(editor, regExp, self._replaceText.text())
+        editor.setFocus()
 
-            editor.setTextCursor(originalCursor)  # reset position
-            editor.setFocus()
-            print("replaced {} occurrences in {}".format(cntMatches, editor.id()))
+    def _replaceAllInEditor(self, editor, regExp, replacement):
+        """Replace all matches of the regExp in the editor.
+
+        The new text is computed in a single pass over the text. The lines
+        that changed are then replaced in one edit block (one undo step),
+        rather than moving a cursor and inserting text for each match.
+        Replacing whole lines keeps the blocks (and e.g. their breakpoints)
+        of the document intact.
+        """
+        # Only the paragraph separator ends a block in the raw text, so that
+        # the lines map to the blocks (toPlainText() also converts e.g. the
+        # line separator U+2028 to a newline)
+        editor.ensureLoaded()
+        haystack = editor.document().toRawText().replace("\u2029", "\n")
+
+        if self._regExp.isChecked():
 
+            def repl(mo):
+                return mo.expand(replacement)
+
+        else:
+
+            def repl(mo):
+                return replacement
+
+        # Compute the new text, and the range of the matches
+        span = [None, None]
+
+        def replTrackSpan(mo):
+            if span[0] is None:
+                span[0] = mo.start()
+            span[1] = mo.end()
+            return repl(mo)
+
+        try:
+            newText, cntMatches = regExp.subn(replTrackSpan, haystack)
         except re.error as err:
             print("Error in RegExp in editor {}:\n{}".format(editor.id(), err))
-        finally:
-            cursor.endEditBlock()
+            return
+
+        if newText != haystack:
+            # Get the old and new text of the lines with matches
+            i1 = haystack.rfind("\n", 0, span[0]) + 1
+            i2 = haystack.find("\n", span[1])
+            if i2 < 0:
+                i2 = len(haystack)
+            oldLines = haystack[i1:i2].split("\n")
+            newLines = newText[i1 : len(newText) - (len(haystack) - i2)].split("\n")
+
+            # Positions in the document are obtained from the blocks,
+            # because these can differ from the string indices (e.g. for
+            # characters outside the BMP).
+            doc = editor.document()
+            block = doc.findBlockByNumber(haystack.count("\n", 0, i1))
+
+            originalCursor = editor.textCursor()
+            cursor = editor.textCursor()
+            cursor.beginEditBlock()
+            try:
+                if len(oldLines) == len(newLines):
+                    MoveAnchor = cursor.MoveMode.MoveAnchor
+                    KeepAnchor = cursor.MoveMode.KeepAnchor
+                    for oldLine, newLine in zip(oldLines, newLines):  # noqa: B905
+                        if newLine != oldLine:
+                            pos = block.position()
+                            cursor.setPosition(pos, MoveAnchor)
+                            cursor.setPosition(pos + block.length() - 1, KeepAnchor)
+                            cursor.insertText(newLine)  # replaces selection
+                        block = block.next()
+                else:
+                    # Lines were added or removed, replace all lines at once
+                    lastBlock = doc.findBlockByNumber(
+                        block.blockNumber() + len(oldLines) - 1
+                    )
+                    cursor.setPosition(block.position(), cursor.MoveMode.MoveAnchor)
+                    cursor.setPosition(
+                        lastBlock.position() + lastBlock.length() - 1,
+                        cursor.MoveMode.KeepAnchor,
+                    )
+                    cursor.insertText("\n".join(newLines))  # replaces selection
+            finally:
+                cursor.endEditBlock()
+            editor.setTextCursor(originalCursor)  # reset position
+
+        print("replaced {} occurrences in {}".format(cntMatches, editor.id()))
 
     def _replaceInAllFiles(self):
+        try:
+            regExp = self._getFindRegExp()
+        except re.error as err:
+            print("Error in RegExp: {}".format(err))
+            return
+        if regExp is None:
+            return
+
+        replacement = self._replaceText.text()
         for editor in pyzo.editors:
-            self._replaceAll(editor)
+            self._replaceAllInEditor(editor, regExp, replacement)
 
 
 class FileTabWidget(CompactTabWidget):
@@ -960,6 +1266,9 @@ class FileTabWidget(CompactTabWidget):
         item.editor.somethingChanged.connect(self.updateItems)
         item.editor.blockCountChanged.connect(self.updateItems)
         item.editor.breakPointsChanged.connect(self.parent().updateBreakPoints)
+        item.editor.loadFailed.connect(
+            self.parent()._removeEditor, QtCore.Qt.ConnectionType.QueuedConnection
+        )
 
         # Store the item at the tab
         self.tabBar().setTabData(i, item)
@@ -1030,10 +1339,16 @@ class FileTabWidget(CompactTabWidget):
                 color = "#ddd" if pyzo.darkQt else "#444"
             tabBar.setTabTextColor(i, QtGui.QColor(color))
 
-            # Get number of blocks
-            nBlocks = item.editor.blockCount()
-            if nBlocks == 1 and not item.editor.toPlainText():
-                nBlocks = 0
+            # Get number of blocks (estimate it if the file is not loaded yet)
+            if not item.editor.isLoaded():
+                try:
+                    nBlocks = os.path.getsize(item.filename) // BYTES_PER_LINE + 1
+                except OSError:
+                    nBlocks = 0
+            else:
+                nBlocks = item.editor.blockCount()
+                if nBlocks == 1 and not item.editor.toPlainText():
+                    nBlocks = 0
 
             # Update appearance of icon
             but = tabBar.tabButton(i, QtWidgets.QTabBar.ButtonPosition.LeftSide)
@@ -1354,10 +1669,11 @@ class EditorTabs(QtWidgets.QWidget):
                 return item
         return None  # file is not opened in any of the editor tabs
 
-    def loadFile(self, filename, updateTabs=True, ignoreFail=False):
+    def loadFile(self, filename, updateTabs=True, ignoreFail=False, lazy=False):
         """Load the specified file.
         On success returns the item of the file, also if it was
-        already open.
+        already open. If lazy is True, the file is only read when its
+        editor is first shown.
         """
 
         # Note that by giving the name of a tempfile, we can select that
@@ -1384,7 +1700,7 @@ class EditorTabs(QtWidgets.QWidget):
 
         # create editor
         try:
-            editor = createEditor(self, filename)
+            editor = createEditor(self, filename, lazy)
         except Exception as err:
             # Notify in logger
             print("Error loading file: ", err)
@@ -1713,6 +2029,17 @@ class EditorTabs(QtWidgets.QWidget):
 
         return result
 
+    def _removeEditor(self, editor):
+        """Remove the given editor without asking, e.g. when its file could
+        not be loaded.
+        """
+        for item in self._tabs.items():
+            if item.editor is editor:
+                self._tabs.removeTab(item)
+                editor.close()
+                self.updateBreakPoints()
+                break
+
     def closeAllFiles(self):
         """Close all files"""
         for editor in self:
@@ -1766,8 +2093,9 @@ class EditorTabs(QtWidgets.QWidget):
             info = []
             # Add filename, line number, and scroll distance
             info.append(ed._filename)
-            info.append(int(ed.textCursor().position()))
-            info.append(int(ed.verticalScrollBar().value()))
+            position, scroll = ed.cursorAndScrollPosition()
+            info.append(int(position))
+            info.append(int(scroll))
             # Add whether pinned or main file
             if item.pinned:
                 info.append("pinned")
@@ -1796,36 +2124,63 @@ class EditorTabs(QtWidgets.QWidget):
 
         # Init dict
         fileItems = {}
+        history = []
+
+        # The files are loaded lazily, when their editor is first shown. Hide
+        # the tabs and block their signals while restoring, so that no editor
+        # is shown in passing, and the tabs are not updated for every file.
+        self._tabs.hide()
+        self._tabs.blockSignals(True)
+        try:
+            # Process items
+            for item in state:
+                fname = item[0]
+                if os.path.exists(fname):
+                    if item[1] == "hist":
+                        # the history is stored from old to recent
+                        if fname in fileItems:
+                            itm = fileItems[fname]
+                            if itm in history:
+                                history.remove(itm)
+                            history.insert(0, itm)
+                    elif fname:
+                        # a file item, create editor-item and store
+                        itm = self.loadFile(
+                            fname, updateTabs=False, ignoreFail=True, lazy=True
+                        )
+                        # set position and scrolling
+                        if itm:
+                            fileItems[fname] = itm
+                            try:
+                                ed = itm.editor
+                                ed.setCursorAndScrollPosition(
+                                    int(item[1]), int(item[2])
+                                )
+                                # ed.centerCursor() #TODO: this does not work properly yet
+                                # set main and/or pinned?
+                                if "main" in item:
+                                    self._tabs._mainFile = itm.id
+                                if "pinned" in item:
+                                    itm._pinned = True
+                            except Exception as err:
+                                print("Could not set position for", fname, err)
+
+            # Restore the history, and select the most recent item. Items that
+            # are not in the stored history are treated as opened in order.
+            for itm in reversed(list(fileItems.values())):
+                if itm not in history:
+                    history.append(itm)
+            for itm in self._tabs._itemHistory:
+                if itm not in history:
+                    history.append(itm)
+            self._tabs._itemHistory = history
+            if history:
+                self._tabs.setCurrentItem(history[0])
+        finally:
+            self._tabs.blockSignals(False)
+            self._tabs.show()
 
-        # Process items
-        for item in state:
-            fname = item[0]
-            if os.path.exists(fname):
-                if item[1] == "hist":
-                    # select item (to make the history right)
-                    if fname in fileItems:
-                        self._tabs.setCurrentItem(fileItems[fname])
-                elif fname:
-                    # a file item, create editor-item and store
-                    itm = self.loadFile(fname, ignoreFail=True)
-                    # set position
-                    if itm:
-                        fileItems[fname] = itm
-                        try:
-                            ed = itm.editor
-                            cursor = ed.textCursor()
-                            cursor.setPosition(int(item[1]))
-                            ed.setTextCursor(cursor)
-                            # set scrolling
-                            ed.verticalScrollBar().setValue(int(item[2]))
-                            # ed.centerCursor() #TODO: this does not work properly yet
-                            # set main and/or pinned?
-                            if "main" in item:
-                                self._tabs._mainFile = itm.id
-                            if "pinned" in item:
-                                itm._pinned = True
-                        except Exception as err:
-                            print("Could not set position for", fname, err)
+        self._tabs.currentChanged.emit(self._tabs.currentIndex())
 
         return len(fileItems) != 0
 
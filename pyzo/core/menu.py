@@ -2283,22 +2283,31 @@ class RunMenu(Menu):
 
         cellName = ""
 
+        def isCellCommentLine(block):
+            # use this as a fallback if no Python syntax highlighter parser is selected
+            # This fallback is dumber: lines starting with "##" in a multiline string literal
+            # will be misinterpreted as cell comments.
+            line = block.text().lstrip()
+            return line.startswith(("##", "#%%", "# %%"))
+
         if editor.parser().name().startswith("python"):
 
             def isCursorAtCellComment(cur):
+                block = cur.block()
+                bd = block.userData()
+                if bd is None or bd.revision != block.revision():
+                    # The block is not highlighted yet (e.g. in a large file)
+                    return isCellCommentLine(block)
                 # there could be a whitespace token before the cell token
-                for t in cur.block().userData().tokens[:2]:
+                for t in bd.tokens[:2]:
                     if isinstance(t, CellCommentToken):
                         return True
                 return False
 
         else:
-            # use this as a fallback if no Python syntax highlighter parser is selected
-            # This fallback is dumber: lines starting with "##" in a multiline string literal
-            # will be misinterpreted as cell comments.
+
             def isCursorAtCellComment(cur):
-                line = cur.block().text().lstrip()
-                return line.startswith(("##", "#%%", "# %%"))
+                return isCellCommentLine(cur.block())
 
         # Get current cell
         # Move up until the start of document
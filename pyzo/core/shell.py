@@ -34,6 +34,7 @@ ismacos = sys.platform.startswith("darwin")
 # Interval for polling messages. Timer for each kernel.
 POLL_TIMER_INTERVAL_IDLE = 100  # in ms; energy saving mode
 POLL_TIMER_INTERVAL_BUSY = 10  # in ms; faster updates
+POLL_READ_TIME = 0.02  # in s; max time to read messages per poll
 
 # Maximum number of lines in the shell
 MAXBLOCKCOUNT = pyzo.config.advanced.shellMaxLines
@@ -101,17 +102,6 @@ class ShellHighlighter(Highlighter):
     """
 
     def highlightBlock(self, line):
-        # Get previous state
-        previousState = self.previousBlockState()
-
-        # Get parser
-        parser = None
-        if hasattr(self._codeEditor, "parser"):
-            parser = self._codeEditor.parser()
-
-        # Get function to get format
-        nameToFormat = self._codeEditor.getStyleElementFormat
-
         # Last line?
         cursor1 = self._codeEditor._cursor1
         cursor2 = self._codeEditor._cursor2
@@ -130,6 +120,17 @@ class ShellHighlighter(Highlighter):
             # Do not highlight anything but current and last prompts
             return
 
+        # Get previous state
+        previousState = self.previousBlockState()
+
+        # Get parser
+        parser = None
+        if hasattr(self._codeEditor, "parser"):
+            parser = self._codeEditor.parser()
+
+        # Get function to get format
+        nameToFormat = self._codeEditor.getStyleElementFormat
+
         # Get user data
         bd = self.getCurrentBlockUserData()
 
@@ -802,6 +803,48 @@ class BaseShell(BaseTextCtrl):
             sb = self.verticalScrollBar()
             sb.setValue(sb.value() - n)
 
+    def writeMany(self, items):
+        """Write a sequence of (text, prompt, color, streamIdentifier) tuples,
+        see write(). Text before the prompt that is followed by more than the
+        maximum number of lines is not written, because it would be removed
+        right away. This keeps the shell responsive when a lot of text is
+        printed in a short time.
+        """
+        items = [
+            [text, "", prompt, color, streamIdentifier]
+            for text, prompt, color, streamIdentifier in items
+        ]
+
+        # Go back from the end, to find the text that would be scrolled out
+        remaining = MAXBLOCKCOUNT
+        for item in reversed(items):
+            text, _, prompt = item[:3]
+            if prompt == 2:
+                continue  # the prompt does not add lines
+            elif remaining <= 0:
+                if prompt == 0:
+                    item[:2] = "", text
+                continue
+            n = text.count("\n")
+            if prompt == 0 and n >= remaining:
+                # Keep the text from the remaining-th newline from the end
+                i = len(text)
+                for _ in range(remaining):
+                    i = text.rfind("\n", 0, i)
+                item[:2] = text[i:], text[:i]
+            remaining -= n
+
+        for text, skippedText, prompt, color, streamIdentifier in items:
+            if skippedText:
+                format = QtGui.QTextCharFormat()
+                if color:
+                    format.setForeground(QtGui.QColor(color))
+                shellWriter = self._shellWriters.setdefault(
+                    streamIdentifier, ShellWriter()
+                )
+                shellWriter.skipText(skippedText, format)
+            self.write(text, prompt, color, streamIdentifier)
+
     ## Executing stuff
 
     def processLine(self, line=None, execute=True):
@@ -1033,21 +1076,52 @@ class ShellWriter:
         # shorten very long lines
         finishedLines = self._shortenLines(finishedLines, cursor)
 
-        # write the text with proper formatting to the shell widget
+        # write the text with proper formatting to the shell widget,
+        # inserting consecutive pieces with the same format at once
         format = self._currentFormat
+        pieces = []
         for line in finishedLines:
             # lastPosInBlock = line[-1]
             for elem in line[:-1]:
                 if isinstance(elem, str):
-                    cursor.insertText(elem, format)
+                    pieces.append(elem)
                 elif isinstance(elem, QtGui.QTextCharFormat):
+                    if pieces:
+                        cursor.insertText("".join(pieces), format)
+                        pieces = []
                     format = elem
+        if pieces:
+            cursor.insertText("".join(pieces), format)
         cursor.endEditBlock()
 
         self._currentFormat = currentFormat
         newLeftLimit = leftLimit
         return newLeftLimit
 
+    def skipText(self, text, defaultFormat):
+        """Process the given text like writeText(), but without writing it.
+        Only the formatting (ANSI escape sequences) is kept track of. This is
+        used for text that would be removed from the shell right away.
+        """
+        if self._unfinishedTail.startswith("\x1b"):
+            text = self._unfinishedTail + text
+        self._unfinishedTail = ""
+
+        if self._currentFormat is None:
+            self._currentFormat = defaultFormat
+        format = self._currentFormat
+        for mo in self._reFormatPattern.finditer(text):
+            format = self.parseFormat(mo[1], format, defaultFormat)[0]
+        self._currentFormat = format
+
+        # check if the text ends with an incomplete format
+        i = text.rfind("\x1b")
+        if i >= 0 and not self._reFormatPattern.match(text, i):
+            for s2 in ("m", "0m", "[0m"):
+                if self._reFormatPattern.match(text[i:] + s2):
+                    self._unfinishedTail = text[i:]
+                    break
+
     @staticmethod
     def _splitStringIntoChunks(s, offset, chunkSize):
         n = len(s)
@@ -1205,8 +1279,8 @@ class PythonShell(BaseShell):
         self._currentCTO = None
         self._currentACO = None
 
-        # Write buffer to store messages in for writing
-        self._write_buffer = None
+        # The time before which poll() should not write again
+        self._nextWriteTime = 0
 
         # Create timer to keep polling any results
         # todo: Maybe use yoton events to process messages as they arrive.
@@ -1611,35 +1685,39 @@ class PythonShell(BaseShell):
         """To keep the shell up-to-date. Call this periodically."""
         idle = True
 
-        if self._write_buffer:
-            # There is still data in the buffer
-            sub, M = self._write_buffer
+        # Read the pending messages of the streams in the order in which they
+        # were sent, merging consecutive messages of the same stream. When a
+        # lot is printed, we keep reading for at most a short while. And if
+        # writing took long the last time, we wait as long before writing
+        # again, so that the shell stays responsive.
+        batches = []
+        t0 = time.perf_counter()
+        if t0 < self._nextWriteTime:
+            idle = False  # there may be more to write
         else:
-            # Check what subchannel has the latest message pending
-            sub = yoton.select_sub_channel(
-                self._strm_out,
-                self._strm_err,
-                self._strm_echo,
-                self._strm_raw,
-                self._strm_broker,
-                self._strm_prompt,
-            )
-            # Read messages from it
-            if sub:
+            while time.perf_counter() - t0 < POLL_READ_TIME:
+                # Check what subchannel has the latest message pending
+                sub = yoton.select_sub_channel(
+                    self._strm_out,
+                    self._strm_err,
+                    self._strm_echo,
+                    self._strm_raw,
+                    self._strm_broker,
+                    self._strm_prompt,
+                )
+                if not sub:
+                    break
+                # Read messages from it
                 M = sub.recv_selected()
                 # M = [sub.recv()] # Slow version (for testing)
+                if batches and batches[-1][0] is sub:
+                    batches[-1][1].extend(M)
+                else:
+                    batches.append((sub, M))
 
-        # Write all pending messages that are later than any other message
-        if sub:
-            idle = False
-            # Select messages to process
-            N = 256
-            M, buffer = M[:N], M[N:]
-            # Buffer the rest
-            if buffer:
-                self._write_buffer = sub, buffer
-            else:
-                self._write_buffer = None
+        # Write all messages at once
+        items = []
+        for sub, M in batches:
             # Get how to deal with prompt
             prompt = 0
             if sub is self._strm_echo:
@@ -1655,8 +1733,12 @@ class PythonShell(BaseShell):
                 color = "#bbb" if pyzo.darkSyntax else "#888888"
             elif sub is self._strm_err:
                 color = "#f00"
-            # Write
-            self.write("".join(M), prompt, color, sub)
+            items.append(("".join(M), prompt, color, sub))
+        if items:
+            idle = False
+            self.writeMany(items)
+            t1 = time.perf_counter()
+            self._nextWriteTime = t1 + (t1 - t0)
 
         # Do any actions?
         action = self._strm_action.recv(False)
@@ -17,4 +17,5 @@ def printDirect(msg):
     """
     import sys
 
+    sys._pyzoInterpreter.flush_output()
     sys._pyzoInterpreter.context._strm_out.send(msg)
@@ -0,0 +1,77 @@
+"""This script measures the overhead of the debugger of the pyzo kernel,
+by running a tight loop without breakpoints, with a breakpoint in an
+unrelated file, and with a breakpoint in the file of the loop.
+
+Run it from the pyzo directory of the repository:
+
+    python -m pyzokernel._bench_debug
+"""
+
+import sys
+import time
+
+from pyzokernel.debug import Debugger
+
+
+SOURCE = """
+def f(x):
+    return x + 1
+
+def g(n):
+    y = 0
+    for i in range(n):
+        y = f(y)
+    return y
+
+g(%i)
+"""
+
+
+class FakeInterpreter:
+    def write(self, text):
+        pass
+
+
+def bench(breaks, n):
+    """Run the loop with the given breakpoints (filename, lineno), as if it
+    is a cell at line 10 of "bench.py". Returns the time and the number
+    of times that the debugger stopped.
+    """
+    debugger = Debugger()
+    stops = []
+
+    def interaction(frame, traceback_=None, pm=False, pm_exc=None):
+        stops.append(frame.f_lineno)
+        debugger.set_continue()
+
+    debugger.interaction = interaction
+    for filename, lineno in breaks:
+        debugger.set_break(filename, lineno)
+    code = compile(SOURCE % n, debugger.canonic("bench.py") + "+10", "exec")
+
+    def execcode():
+        # This mimics PyzoInterpreter.execcode() and apply_breakpoints()
+        debugger.set_on()
+        if breaks:
+            sys.settrace(debugger.global_trace_dispatch)
+        exec(code, {})
+
+    t0 = time.perf_counter()
+    try:
+        execcode()
+    finally:
+        sys.settrace(None)
+        debugger.clear_all_breaks()
+    return time.perf_counter() - t0, len(stops)
+
+
+if __name__ == "__main__":
+    sys._pyzoInterpreter = FakeInterpreter()
+    n = 300000
+    for title, breaks in [
+        ("no breakpoints", []),
+        ("breakpoint in other file", [("other.py", 3)]),
+        ("breakpoint in same file", [("bench.py", 16)]),
+    ]:
+        t, nstops = bench(breaks, n)
+        print(f"{title}: {t:.3f} s for {n} calls, stopped {nstops} times")
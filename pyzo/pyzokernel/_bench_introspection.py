@@ -0,0 +1,53 @@
+"""This script measures how long the introspector of the pyzo kernel takes
+to answer the requests for autocompletion and call tips, for a namespace
+with many names. It does so for the namespace of the interpreter, for the
+frame of a function when debugging, and for that frame after each command
+(so that the globals and locals must be merged again).
+
+Run it from the pyzo directory of the repository:
+
+    python -m pyzokernel._bench_introspection
+"""
+
+import os
+import sys
+import time
+
+import yoton
+from pyzokernel.introspection import PyzoIntrospector
+
+
+class FakeInterpreter:
+    def __init__(self, globals, locals):
+        self.globals = globals
+        self.locals = locals
+        self._namespaceVersion = 0
+
+
+def bench(introspector, interpreter, n, execute=False):
+    """Do n rounds of requests, as when typing "os.path.join(". Returns the
+    time per round. If execute is True, code is "executed" before each round.
+    """
+    t0 = time.perf_counter()
+    for i in range(n):
+        if execute:
+            interpreter._namespaceVersion += 1
+        introspector.dir("os.path")
+        introspector.signature("os.path.join")
+    return (time.perf_counter() - t0) / n
+
+
+if __name__ == "__main__":
+    introspector = PyzoIntrospector(yoton.Context(), "reqp-introspect")
+    n = 100
+    for size in (1000, 100000, 1000000):
+        ns = {"var%i" % i: i for i in range(size)}
+        ns["os"] = os
+        for title, interpreter, execute in [
+            ("interpreter", FakeInterpreter(ns, ns), False),
+            ("debugging", FakeInterpreter(ns, {"x": 1}), False),
+            ("debugging, after a command", FakeInterpreter(ns, {"x": 1}), True),
+        ]:
+            sys._pyzoInterpreter = interpreter
+            t = bench(introspector, interpreter, n, execute)
+            print(f"{size} names, {title}: {t * 1000:.3f} ms per dir + signature")
@@ -24,6 +24,7 @@ class Debugger(bdb.Bdb):
         bdb.Bdb.__init__(self)
         self._debugmode = 0  # 0: no debug,  1: postmortem,  2: full debug
         self._files_with_offset = set()
+        self._files_with_breaks = {}  # filename -> bool, see global_trace_dispatch
         if hasattr(sys, "breakpointhook"):
             self._original_breakpointhook = sys.breakpointhook
             sys.breakpointhook = self.custom_breakpointhook
@@ -41,9 +42,32 @@ class Debugger(bdb.Bdb):
         else:
             self._original_breakpointhook(*args, **kwargs)
 
+    def set_trace(self, frame=None):
+        """Start debugging from the given frame (or the caller's frame),
+        using global_trace_dispatch() as the trace function, so that files
+        without breakpoints are not traced after continuing.
+        """
+        if frame is None:
+            frame = sys._getframe().f_back
+        bdb.Bdb.set_trace(self, frame)
+        sys.settrace(self.global_trace_dispatch)
+
     def clear_all_breaks(self):
         bdb.Bdb.clear_all_breaks(self)
         self._files_with_offset.clear()
+        self._files_with_breaks.clear()
+
+    def clear_break(self, filename, lineno):
+        self._files_with_breaks.clear()
+        return bdb.Bdb.clear_break(self, filename, lineno)
+
+    def clear_bpbynumber(self, arg):
+        self._files_with_breaks.clear()
+        return bdb.Bdb.clear_bpbynumber(self, arg)
+
+    def clear_all_file_breaks(self, filename):
+        self._files_with_breaks.clear()
+        return bdb.Bdb.clear_all_file_breaks(self, filename)
 
     def trace_dispatch(self, frame, event, arg):
         # Overload to deal with offset in filenames
@@ -66,6 +90,42 @@ class Debugger(bdb.Bdb):
 
         return bdb.Bdb.trace_dispatch(self, frame, event, arg)
 
+    def global_trace_dispatch(self, frame, event, arg):
+        """The trace function to pass to sys.settrace(). Bdb only traces
+        a new frame if it may stop there (when stepping, or when resuming
+        the generator that it stops in) or if its file has breakpoints.
+        We check this first, using a cache for the latter, so that code
+        from files without breakpoints runs at (nearly) full speed. Frames
+        that need tracing are handled by trace_dispatch().
+        """
+        stopframe = self.stopframe
+        if stopframe is not None and stopframe is not frame and self.botframe:
+            filename = frame.f_code.co_filename
+            try:
+                has_breaks = self._files_with_breaks[filename]
+            except KeyError:
+                has_breaks = self._has_breaks(filename)
+                self._files_with_breaks[filename] = has_breaks
+            if not has_breaks:
+                return None
+        return self.trace_dispatch(frame, event, arg)
+
+    def _has_breaks(self, filename):
+        """Get whether the given file has breakpoints. For cells or lines
+        being executed (with an offset in the filename), the breakpoints
+        of the file that they are from are used.
+        """
+        if "+" in filename:
+            clean_filename, offset = filename.rsplit("+", 1)
+            try:
+                int(offset)
+            except Exception:
+                pass
+            else:
+                if self.breaks.get(clean_filename):
+                    return True
+        return self.canonic(filename) in self.breaks
+
     def interaction(self, frame, traceback_=None, pm=False, pm_exc=None):
         """Enter an interaction-loop for debugging. No GUI events are
         processed here. We leave this event loop at some point, after
@@ -146,6 +206,8 @@ class Debugger(bdb.Bdb):
             interpreter._dbFrameName = frame.f_code.co_name
             interpreter.locals = frame.f_locals
             interpreter.globals = frame.f_globals
+            # The frame may be the same as before (e.g. when stepping)
+            interpreter._namespaceVersion += 1
 
         # Let the IDE know
         self._debugmode = 1 if pm else 2
@@ -228,6 +290,7 @@ class Debugger(bdb.Bdb):
     # Overload set_break to also allow non-existing filenames like "<tmp 1"
     def set_break(self, filename, lineno, temporary=False, cond=None, funcname=None):
         filename = self.canonic(filename)
+        self._files_with_breaks.clear()
         list = self.breaks.setdefault(filename, [])
         if lineno not in list:
             list.append(lineno)
@@ -32,6 +32,8 @@ import bdb
 import linecache
 import signal
 import tokenize
+import weakref
+from collections import OrderedDict
 
 import yoton
 from pyzokernel import guiintegration, printDirect
@@ -152,9 +154,16 @@ class PyzoInterpreter:
         self._dbFrameIndex = 0
         self._dbFrameName = ""
 
+        # Incremented when the namespace may have changed, so that the
+        # introspector knows when to merge the globals and locals again
+        self._namespaceVersion = 0
+
         # Init datase to store source code that we execute
         self._codeCollection = ExecutedSourceCollection()
 
+        # Init cache of compiled code, to run the same cell again quickly
+        self._compileCache = CompileCache()
+
         # Init buffer to deal with multi-line command in the shell
         self._buffer = []
 
@@ -667,9 +676,10 @@ class PyzoInterpreter:
             self._scriptToRunOnStartup, tmp = None, self._scriptToRunOnStartup
             self.runfile(tmp)
 
-        # Flush real stdout / stderr
+        # Flush real stdout / stderr, and send buffered output
         sys.__stdout__.flush()
         sys.__stderr__.flush()
+        self.flush_output()
 
         if self.introspector._run_mode == 0:
             # Introspection was set up without its own thread or event loop (see start.py).
@@ -883,28 +893,6 @@ class PyzoInterpreter:
                 lineno1,
                 fname_show,
             )
-            # Try to get the last expression printed in the cell.
-            try:
-                import ast
-
-                tree = ast.parse(source, fname, "exec")
-                if (
-                    isinstance(tree.body[-1], ast.Expr)
-                    and tree.body[-1].col_offset == 0
-                ):
-                    e = tree.body[-1]
-                    lines = source.splitlines()
-                    lines[e.lineno - 1] = "_=\\\n" + lines[e.lineno - 1]
-                    source2 = (
-                        "\n".join(lines).rstrip()
-                        + "\nif _ is not None:\n  print(repr(_))\n"
-                    )
-                    ast.parse(
-                        source2, fname, "exec"
-                    )  # This is to make sure it still compiles
-                    source = source2
-            except Exception:
-                pass
         elif lineno1 == lineno2:
             runtext = '(executing line %i of "%s")\n' % (lineno1, fname_show)
         else:
@@ -920,6 +908,14 @@ class PyzoInterpreter:
             if self._ipython:
                 self._ipython.execution_count += 1
 
+        # Running the same code again (e.g. a cell) is common, so we cache
+        # the (rewritten) source and its code object. The compiler flags are
+        # part of the key, because a __future__ import can change them.
+        printLast = bool(cellName) and cellName != fname
+        flags = getattr(getattr(self._compile, "compiler", None), "flags", 0)
+        cacheKey = source, fname, lineno, printLast, flags
+        cached = self._compileCache.get(cacheKey)
+
         # Bring fname to the canonical form so that pdb recognizes the breakpoints,
         # otherwise filename r"C:\..." would be different from canonical form r"c:\..."
         fname = self.debugger.canonic(fname)
@@ -930,15 +926,25 @@ class PyzoInterpreter:
         if lineno:
             fname = "%s+%i" % (fname, lineno)
 
-        # Try compiling the source
-        code = None
-        try:
-            # Compile
-            code = self.compilecode(source, fname, "exec")
+        if cached is not None:
+            source, code = cached
+        else:
+            # Try to get the last expression printed in the cell.
+            if printLast:
+                source = printLastExpression(source, fname)
 
-        except (OverflowError, SyntaxError, ValueError):
-            self.showsyntaxerror(fname)
-            return
+            # Try compiling the source
+            code = None
+            try:
+                # Compile
+                code = self.compilecode(source, fname, "exec")
+
+            except (OverflowError, SyntaxError, ValueError):
+                self.showsyntaxerror(fname)
+                return
+
+            if code:
+                self._compileCache.put(cacheKey, (source, code))
 
         if code:
             # Store the source using the (id of the) code object as a key
@@ -1063,6 +1069,8 @@ class PyzoInterpreter:
         except KeyboardInterrupt:  # is a BaseException, not an Exception
             time.sleep(0.2)
             self.showtraceback()
+        finally:
+            self._namespaceVersion += 1
 
     def apply_breakpoints(self):
         """Breakpoints are updated at each time a command is given,
@@ -1076,7 +1084,7 @@ class PyzoInterpreter:
                     for linenr in breaks[fname]:
                         self.debugger.set_break(fname, linenr)
             if breaks or self.debugger._last_db_command in ("step", "next", "return"):
-                sys.settrace(self.debugger.trace_dispatch)
+                sys.settrace(self.debugger.global_trace_dispatch)
         except Exception:
             type, value, tb = sys.exc_info()
             del tb
@@ -1098,6 +1106,7 @@ class PyzoInterpreter:
         else:
             action = "open %s" % os.path.abspath(filename)
         # Send
+        self.flush_output()
         self.context._strm_action.send(action)
 
     def ipython_ask_exit(self):
@@ -1117,6 +1126,14 @@ class PyzoInterpreter:
         """Write errors."""
         sys.stderr.write(text)
 
+    def flush_output(self):
+        """Send the text that is buffered in stdout and stderr, e.g. before
+        sending a prompt or an action, which should come after the output.
+        """
+        for file in (sys.stdout, sys.stderr):
+            if isinstance(file, yoton.FileWrapper):
+                file.flush_buffer()
+
     def showsyntaxerror(self, filename=None):
         """Display the syntax error that just occurred.
         This doesn't display a stack trace because there isn't one.
@@ -1292,6 +1309,107 @@ class PyzoInterpreter:
         self._main_globals = self.globals = f.f_globals
 
 
+def printLastExpression(source, fname):
+    """Rewrite the source of a cell so that the value of the expression
+    on its last line (if any) is printed. Returns the source unchanged if
+    that is not possible.
+    """
+    try:
+        import ast
+
+        tree = ast.parse(source, fname, "exec")
+        if isinstance(tree.body[-1], ast.Expr) and tree.body[-1].col_offset == 0:
+            e = tree.body[-1]
+            lines = source.splitlines()
+            lines[e.lineno - 1] = "_=\\\n" + lines[e.lineno - 1]
+            source2 = (
+                "\n".join(lines).rstrip() + "\nif _ is not None:\n  print(repr(_))\n"
+            )
+            ast.parse(source2, fname, "exec")  # This is to make sure it still compiles
+            return source2
+    except Exception:
+        pass
+    return source
+
+
+class CompileCache:
+    """A small LRU cache that maps the source of code executed with
+    runlargecode() to the (rewritten) source and its code object, so that
+    running the same cell again does not parse and compile it again. The
+    number of hits and misses is available via info().
+    """
+
+    def __init__(self, maxSize=32):
+        self._maxSize = maxSize
+        self._cache = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        """Get the value for the given key, or None if it is not cached."""
+        try:
+            value = self._cache.pop(key)
+        except KeyError:
+            self._misses += 1
+            return None
+        self._cache[key] = value  # move to the end
+        self._hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store a value, removing the least recently used one if necessary."""
+        self._cache[key] = value
+        while len(self._cache) > self._maxSize:
+            self._cache.popitem(last=False)
+
+    def info(self):
+        """Get a dict with the number of hits and misses, and the size."""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": len(self._cache),
+            "maxSize": self._maxSize,
+        }
+
+
+class ExecutedSource:
+    """The source of an executed piece of code. Keeps weak references to
+    its code objects (including those of the functions and classes that
+    it defines), to tell whether these can still show up in a traceback.
+    """
+
+    def __init__(self, codeObject, source):
+        self.source = source
+        self.size = sys.getsizeof(source)
+        self._lines = None
+        self._codeRefs = []
+        codeObjects = [codeObject]
+        while codeObjects:
+            co = codeObjects.pop()
+            try:
+                self._codeRefs.append(weakref.ref(co))
+            except TypeError:
+                self._codeRefs = None  # cannot track, so consider it alive
+                break
+            codeObjects.extend(c for c in co.co_consts if isinstance(c, type(co)))
+
+    def isAlive(self):
+        """Get whether any of the code objects of this source still exist."""
+        if self._codeRefs is None:
+            return True
+        for ref in self._codeRefs:
+            if ref() is not None:
+                return True
+        return False
+
+    def getLines(self):
+        """Get the source as a list of lines, like linecache does."""
+        lines = self._lines
+        if lines is None:
+            lines = self._lines = [line + "\n" for line in self.source.splitlines()]
+        return lines
+
+
 class ExecutedSourceCollection:
     """Stores the source of executed pieces of code, so that the right
     traceback can be reproduced when an error occurs. The filename
@@ -1299,14 +1417,38 @@ class ExecutedSourceCollection:
     the linecache module so that we first try our cache to look up the
     lines. In that way we also allow third party modules (e.g. IPython)
     to get the lines for executed cells.
+
+    To limit the memory use in long sessions, the least recently executed
+    sources are removed when their total size exceeds maxSize bytes. But
+    sources of which code objects still exist (e.g. because a function
+    that it defines is still referenced) are kept.
     """
 
-    def __init__(self):
-        self._cache = {}
+    def __init__(self, maxSize=16 * 2**20):
+        self._cache = OrderedDict()  # filename -> ExecutedSource
+        self._size = 0
+        self._maxSize = maxSize
         self._patch()
 
     def store_source(self, codeObject, source):
-        self._cache[codeObject.co_filename] = source
+        filename = codeObject.co_filename
+        old = self._cache.pop(filename, None)
+        if old is not None:
+            self._size -= old.size
+        entry = self._cache[filename] = ExecutedSource(codeObject, source)
+        self._size += entry.size
+        if self._size > self._maxSize:
+            self._prune()
+
+    def _prune(self):
+        """Remove the oldest sources until we are within budget."""
+        for filename in list(self._cache):
+            if self._size <= self._maxSize:
+                break
+            entry = self._cache[filename]
+            if not entry.isAlive():
+                del self._cache[filename]
+                self._size -= entry.size
 
     def _patch(self):
         def getlines(filename, module_globals=None):
@@ -1316,9 +1458,9 @@ class ExecutedSourceCollection:
 
             # Try getting the source from our own cache,
             # otherwise fallback to linecache's own cache
-            src = self._cache.get(filename, "")
-            if src:
-                return [line + "\n" for line in src.splitlines()]
+            entry = self._cache.get(filename, None)
+            if entry is not None and entry.source:
+                return entry.getLines()
             else:
                 return linecache._getlines(filename, module_globals)
 
@@ -1,4 +1,6 @@
 import sys
+import weakref
+import itertools
 import yoton
 import inspect  # noqa - used in eval()
 
@@ -63,6 +65,86 @@ def getRepr(obj, maxChars, _path=(), _sList=None):
         return "".join(_sList[1:])[:maxChars]
 
 
+def getVariableInfo(name, val):
+    """Get a tuple (name, type, kind, repr) for the given variable."""
+
+    # Determine type
+    typeName = type(val).__name__
+    # Determine kind
+    kind = typeName
+    if typeName != "type":
+        if (
+            hasattr(val, "__array__")
+            and hasattr(val, "dtype")
+            and hasattr(val, "shape")
+            and not hasattr(
+                val,
+                "if_this_is_an_attribute_then_there_are_likely_inf_attributes",
+            )
+        ):
+            kind = "array"
+        elif isinstance(val, list):
+            kind = "list"
+        elif isinstance(val, tuple):
+            kind = "tuple"
+    # Determine representation
+    if kind == "array":
+        tmp = "x".join([str(s) for s in val.shape])
+        if tmp:
+            values_repr = ""
+            if hasattr(val, "flat"):
+                for el in val.flat:
+                    # using str instead of repr to have
+                    # "<array 3 int64: 1, 2, 3>"
+                    # instead of
+                    # "<array 3 int64: np.int64(1), np.int64(2), np.int64(3)>"
+                    values_repr += ", " + str(el)
+                    if len(values_repr) > 70:
+                        values_repr = values_repr[:69] + THREE_DOTS_CHAR
+                        break
+            repres = "<array %s %s: %s>" % (
+                tmp,
+                val.dtype.name,
+                values_repr[2:],  # remove the leading ", "
+            )
+        elif val.size:
+            # val can be a non-numeric or structured type as well, e.g.:
+            #     val = np.array(['abc'], dtype=np.dtype('U3'))[0]
+            repres = "<array scalar %s (%s)>" % (val.dtype.name, str(val))
+        else:
+            repres = "<array empty %s>" % (val.dtype.name)
+    elif kind in (
+        "list",
+        "tuple",
+        "dict",
+        "frozendict",
+        "set",
+        "frozenset",
+    ):
+        maxChars = 70
+        values_repr = getRepr(val, maxChars + 1)
+        if len(values_repr) > maxChars:
+            values_repr = values_repr[: maxChars - 1] + THREE_DOTS_CHAR
+
+        if kind in ("frozendict", "frozenset"):
+            values_repr = values_repr[len(kind + "({") : -1]
+        else:
+            values_repr = values_repr[1:-1]
+
+        if kind in ("dict", "frozendict"):
+            elem = "item"
+        else:
+            elem = "element"
+
+        repres = "<{}-{} {}: {}>".format(len(val), elem, kind, values_repr)
+    else:
+        maxChars = 80
+        repres = getRepr(val, maxChars + 1)
+        if len(repres) > maxChars:
+            repres = repres[: maxChars - 1] + THREE_DOTS_CHAR
+    return name, typeName, kind, repres
+
+
 # Functions/objects like "dir" could be redefined in the namespace of the user's code.
 # To use our known "dir", we assign it to a rather unique variable name that is only
 # visible in a global namespace used for introspection, e.g.:
@@ -84,37 +166,99 @@ for name in INTERNAL_OBJECT_NAMES:
     inames[name] = uniqueName
 
 
+# The info of variables of these types only changes when another object is
+# assigned to the variable. dir2Delta() recognizes them by identity (small
+# objects are kept in the snapshot, the others via a weak reference), and
+# re-evaluates the info of all other objects (e.g. lists, which can be
+# changed in-place, and strings, which can be large).
+_KEPT_TYPES = (bool, int, float, complex, type(None), type(len))
+_WEAKREF_TYPES = (type, type(sys), type(getRepr))
+
+
 class PyzoIntrospector(yoton.RepChannel):
     """This is a RepChannel object to respond to requests from the IDE."""
 
+    def __init__(self, *args, **kwargs):
+        yoton.RepChannel.__init__(self, *args, **kwargs)
+
+        # Snapshots of the variables known to clients of dir2Delta()
+        self._dir2Snapshots = {}
+        self._dir2Version = 0
+
+        # The merged namespace when debugging, see _getNameSpaceWindow()
+        self._mergedNameSpace = None
+
     def _getNameSpace(self, name=""):
         """Get the namespace to apply introspection in.
 
         If name is given, will find that name. For example sys.stdin.
         """
+        return self._getNameSpaceWindow(name)[0]
 
-        # Get namespace
-        NS1 = sys._pyzoInterpreter.locals
-        NS2 = sys._pyzoInterpreter.globals
-        if not NS2:
+    def _getNameSpaceWindow(self, name, limit=None, offset=0):
+        """Get the namespace to apply introspection in, like _getNameSpace().
+
+        If limit is given and name refers to a container (e.g. a list or
+        dict), the namespace only contains its elements offset ... limit
+        (in the order of the container), so that the cost does not depend
+        on the size of the container.
+
+        Returns a tuple (NS, total), where total is the number of elements
+        of the container, or None if name does not refer to a container.
+        """
+
+        # Get namespace. Usually the locals are the globals, and we use
+        # them as they are. When debugging in a function, the globals and
+        # locals of its frame are merged. That is expensive for a large
+        # module, so the merged namespace is reused until the interpreter
+        # executes code or switches to another frame.
+        interpreter = sys._pyzoInterpreter
+        NS1 = interpreter.locals
+        NS2 = interpreter.globals
+        if not NS2 or NS2 is NS1:
             NS = NS1
+            self._mergedNameSpace = None
         else:
-            NS = NS2.copy()
-            NS.update(NS1)
+            version = interpreter._namespaceVersion
+            cached = self._mergedNameSpace
+            if (
+                cached
+                and cached[0] is NS1
+                and cached[1] is NS2
+                and cached[2] == version
+            ):
+                NS = cached[3]
+            else:
+                NS = NS2.copy()
+                NS.update(NS1)
+                self._mergedNameSpace = NS1, NS2, version, NS
 
         # Look up a name?
         if not name:
-            return NS
+            return NS, None
         else:
             try:
                 # Get object
                 ob = eval(name, None, NS)
+                total = None
 
                 # Get namespace for this object
                 if isinstance(ob, dict) or hasattr(
                     ob, "keys"
                 ):  # os.environ is no dict but has keys
-                    NS = {"[" + repr(el) + "]": ob[el] for el in ob.keys()}
+                    keys = ob.keys()
+                    if limit is not None:
+                        # Count the keys, not the object, e.g. the len() of
+                        # a DataFrame is the number of rows, not columns
+                        if not hasattr(keys, "__len__"):
+                            keys = list(keys)
+                        total = len(keys)
+                        keys = itertools.islice(keys, offset, limit)
+                    NS = {"[" + repr(el) + "]": ob[el] for el in keys}
+                elif isinstance(ob, (list, tuple)) and limit is not None:
+                    total = len(ob)
+                    indices = range(offset, min(limit, total))
+                    NS = {"[{}]".format(i): ob[i] for i in indices}
                 elif isinstance(ob, (list, tuple)):
                     NS = {}
                     for i, el in enumerate(ob):
@@ -133,10 +277,10 @@ class PyzoIntrospector(yoton.RepChannel):
                             NS[key] = "<unknown>"
 
                 # Done
-                return NS
+                return NS, total
 
             except Exception:
-                return {}
+                return {}, None
 
     def _getSignature(self, objectName):
         """Get the signature of builtin, function or method.
@@ -313,11 +457,20 @@ class PyzoIntrospector(yoton.RepChannel):
 
         return sigs, kind
 
+    def _storeIntermediateResult(self, cacheVarName, objectName):
+        """Evaluate objectName, and store the result in the namespace of the
+        interpreter as cacheVarName.
+        """
+        interpreter = sys._pyzoInterpreter
+        command = cacheVarName + " = " + str(objectName)
+        exec(command, interpreter.globals, interpreter.locals)
+        # The namespace has changed, so a merged namespace is outdated
+        self._mergedNameSpace = None
+
     def dirWithIntermediateResult(self, objectName):
         cacheVarName = "__pyzo__autocomp"
         try:
-            command = cacheVarName + " = " + str(objectName)
-            exec(command, sys._pyzoInterpreter.globals, sys._pyzoInterpreter.locals)
+            self._storeIntermediateResult(cacheVarName, objectName)
         except Exception:
             return []
         else:
@@ -369,8 +522,7 @@ class PyzoIntrospector(yoton.RepChannel):
     def dir2WithIntermediateResult(self, objectName):
         cacheVarName = "__pyzo__autocomp"
         try:
-            command = cacheVarName + " = " + str(objectName)
-            exec(command, sys._pyzoInterpreter.globals, sys._pyzoInterpreter.locals)
+            self._storeIntermediateResult(cacheVarName, objectName)
         except Exception:
             return []
         else:
@@ -382,95 +534,18 @@ class PyzoIntrospector(yoton.RepChannel):
         Returns a list of tuple of strings: name, type, kind, repr.
         """
         try:
-            name = ""
             names = []
 
-            def storeInfo(name, val):
-                # Determine type
-                typeName = type(val).__name__
-                # Determine kind
-                kind = typeName
-                if typeName != "type":
-                    if (
-                        hasattr(val, "__array__")
-                        and hasattr(val, "dtype")
-                        and hasattr(val, "shape")
-                        and not hasattr(
-                            val,
-                            "if_this_is_an_attribute_then_there_are_likely_inf_attributes",
-                        )
-                    ):
-                        kind = "array"
-                    elif isinstance(val, list):
-                        kind = "list"
-                    elif isinstance(val, tuple):
-                        kind = "tuple"
-                # Determine representation
-                if kind == "array":
-                    tmp = "x".join([str(s) for s in val.shape])
-                    if tmp:
-                        values_repr = ""
-                        if hasattr(val, "flat"):
-                            for el in val.flat:
-                                # using str instead of repr to have
-                                # "<array 3 int64: 1, 2, 3>"
-                                # instead of
-                                # "<array 3 int64: np.int64(1), np.int64(2), np.int64(3)>"
-                                values_repr += ", " + str(el)
-                                if len(values_repr) > 70:
-                                    values_repr = values_repr[:69] + THREE_DOTS_CHAR
-                                    break
-                        repres = "<array %s %s: %s>" % (
-                            tmp,
-                            val.dtype.name,
-                            values_repr[2:],  # remove the leading ", "
-                        )
-                    elif val.size:
-                        # val can be a non-numeric or structured type as well, e.g.:
-                        #     val = np.array(['abc'], dtype=np.dtype('U3'))[0]
-                        repres = "<array scalar %s (%s)>" % (val.dtype.name, str(val))
-                    else:
-                        repres = "<array empty %s>" % (val.dtype.name)
-                elif kind in (
-                    "list",
-                    "tuple",
-                    "dict",
-                    "frozendict",
-                    "set",
-                    "frozenset",
-                ):
-                    maxChars = 70
-                    values_repr = getRepr(val, maxChars + 1)
-                    if len(values_repr) > maxChars:
-                        values_repr = values_repr[: maxChars - 1] + THREE_DOTS_CHAR
-
-                    if kind in ("frozendict", "frozenset"):
-                        values_repr = values_repr[len(kind + "({") : -1]
-                    else:
-                        values_repr = values_repr[1:-1]
-
-                    if kind in ("dict", "frozendict"):
-                        elem = "item"
-                    else:
-                        elem = "element"
-
-                    repres = "<{}-{} {}: {}>".format(len(val), elem, kind, values_repr)
-                else:
-                    maxChars = 80
-                    repres = getRepr(val, maxChars + 1)
-                    if len(repres) > maxChars:
-                        repres = repres[: maxChars - 1] + THREE_DOTS_CHAR
-                # Store
-                tmp = (name, typeName, kind, repres)
-                names.append(tmp)
-
             # Get locals
             NS = self._getNameSpace(objectName)
-            for name in NS.keys():  # name can be a key in a dict, i.e. not str
+            # Take the keys first, because NS can be the namespace of the
+            # interpreter, which may be changed in the main thread meanwhile.
+            # Note that the name can be a key in a dict, i.e. not str.
+            for name in list(NS.keys()):
                 if hasattr(name, "startswith") and name.startswith("__"):
                     continue
                 try:
-                    storeInfo(str(name), NS[name])
+                    names.append(getVariableInfo(str(name), NS[name]))
                 except Exception:
                     pass
 
@@ -479,11 +554,80 @@ class PyzoIntrospector(yoton.RepChannel):
         except Exception:
             return []
 
+    def dir2Delta(self, objectName, clientId, version, limit=None, offset=0):
+        """Like dir2(), but only get what changed since the previous call.
+
+        The kernel keeps a snapshot of the variables for each clientId.
+        If the given version is that of the snapshot, and the snapshot is
+        for the same objectName, only the changes are returned. Otherwise
+        all variables are returned (i.e. the changes with respect to an
+        empty namespace) and baseVersion is 0.
+
+        If limit is given and objectName refers to a container (e.g. a
+        list or dict), only its elements offset ... limit are evaluated.
+        The other entries of the snapshot are then assumed to be unchanged,
+        so that the client can get the next page of elements by asking
+        again with offset set to the previous limit. The new elements are
+        returned as changes.
+
+        Returns a tuple (baseVersion, version, changed, removed, total),
+        where changed is a list of tuples like returned by dir2(), removed
+        is a list of names, and total is the number of elements of the
+        container (or None if objectName does not refer to a container).
+        """
+        snapshot = self._dir2Snapshots.pop(clientId, None)
+        if snapshot and snapshot[0] == objectName and snapshot[1] == version:
+            oldEntries = snapshot[2]
+        else:
+            oldEntries = {}
+            version = 0
+            offset = 0
+
+        try:
+            entries = oldEntries.copy() if offset else {}
+            changed = []
+            NS, total = self._getNameSpaceWindow(objectName, limit, offset)
+            for name in list(NS.keys()):  # see dir2()
+                if hasattr(name, "startswith") and name.startswith("__"):
+                    continue
+                try:
+                    val = NS[name]
+                    name = str(name)
+                    old = oldEntries.get(name)
+                    if old is not None and old[0] is not None:
+                        ref = old[0]
+                        if ref is val or (
+                            isinstance(ref, weakref.ref) and ref() is val
+                        ):
+                            entries[name] = old
+                            continue
+                    info = getVariableInfo(name, val)
+                    if type(val) in _KEPT_TYPES:
+                        ref = val
+                    elif type(val) in _WEAKREF_TYPES:
+                        ref = weakref.ref(val)
+                    else:
+                        ref = None
+                    entries[name] = ref, info
+                    if old is None or old[1] != info:
+                        changed.append(info)
+                except Exception:
+                    pass
+            if offset:
+                removed = []
+            else:
+                removed = [name for name in oldEntries if name not in entries]
+        except Exception:
+            return 0, 0, [], [], None
+
+        self._dir2Version += 1
+        self._dir2Snapshots[clientId] = objectName, self._dir2Version, entries
+        return version, self._dir2Version, changed, removed, total
+
     def signatureWithIntermediateResult(self, objectName):
         cacheVarName = "__pyzo__calltip"
         try:
-            command = cacheVarName + " = " + str(objectName)
-            exec(command, sys._pyzoInterpreter.globals, sys._pyzoInterpreter.locals)
+            self._storeIntermediateResult(cacheVarName, objectName)
         except Exception:
             return None
         else:
@@ -601,6 +745,10 @@ class PyzoIntrospector(yoton.RepChannel):
 
         return returnValue
 
+    def compileCacheInfo(self):
+        """Get the hits and misses of the cache of compiled cells."""
+        return sys._pyzoInterpreter._compileCache.info()
+
     def eval(self, command):
         """Evaluate a command and return result."""
 
@@ -121,7 +121,7 @@ class Magician:
         # Get namespace
         NS1 = sys._pyzoInterpreter.locals
         NS2 = sys._pyzoInterpreter.globals
-        if not NS2:
+        if not NS2 or NS2 is NS1:
             NS = NS1
         else:
             NS = NS2.copy()
@@ -397,6 +397,7 @@ class Magician:
         return ""
 
     def cls(self, line, command):
+        sys._pyzoInterpreter.flush_output()
         sys._pyzoInterpreter.context._strm_action.send("cls")
         return ""
 
@@ -458,9 +459,11 @@ class Magician:
             print('Could not determine file name for object "%s".' % name)
         elif linenr is not None:
             action = "open %i %s" % (linenr, os.path.abspath(fname))
+            sys._pyzoInterpreter.flush_output()
             sys._pyzoInterpreter.context._strm_action.send(action)
         else:
             action = "open %s" % os.path.abspath(fname)
+            sys._pyzoInterpreter.flush_output()
             sys._pyzoInterpreter.context._strm_action.send(action)
         #
         return ""
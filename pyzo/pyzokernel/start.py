@@ -70,11 +70,12 @@ ct._stat_breakpoints = yoton.StateChannel(ct, "stat-breakpoints", yoton.OBJECT)
 port = int(sys.argv[-1])
 ct.connect("localhost:" + str(port), timeout=1.0)
 
-# Create file objects for stdin, stdout, stderr
+# Create file objects for stdin, stdout, stderr. The output is buffered,
+# so that code that prints a lot does not send a message for each print.
 sys._original_std_before_pyzo = (sys.stdin, sys.stdout, sys.stderr)
 sys.stdin = yoton.FileWrapper(ct._ctrl_command, echo=ct._strm_echo, isatty=True)
-sys.stdout = yoton.FileWrapper(ct._strm_out, 256, isatty=True)
-sys.stderr = yoton.FileWrapper(ct._strm_err, 256, isatty=True)
+sys.stdout = yoton.FileWrapper(ct._strm_out, 1024, isatty=True, buffersize=1024)
+sys.stderr = yoton.FileWrapper(ct._strm_err, 1024, isatty=True, buffersize=1024)
 
 # Set fileno on both
 sys.stdout.fileno = sys.__stdout__.fileno
@@ -171,6 +172,10 @@ finally:
     # Restore original streams, so that SystemExit behaves as intended
     import sys
 
+    try:
+        __pyzo__.flush_output()
+    except Exception:
+        pass
     try:
         sys.stdin, sys.stdout, sys.stderr = sys._original_std_before_pyzo
         del sys._original_std_before_pyzo
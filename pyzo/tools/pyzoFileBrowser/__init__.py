@@ -20,6 +20,7 @@ The config consists of three fields:
       * str path, the directory that is starred
       * str name, the name of the project (op.basename(path) by default)
       * bool addToPythonpath
+      * bool searchIndex, whether to keep a search index for the files
   * searchMatchCase, searchRegExp, wholeWords, searchSubDirs, searchExcludeBinary
   * nameFilter
 
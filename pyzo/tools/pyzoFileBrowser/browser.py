@@ -152,6 +152,7 @@ class Browser(QtWidgets.QWidget):
         newProject.path = op.normcase(path)  # Normalize case!
         newProject.name = op.basename(path)
         newProject.addToPythonpath = False
+        newProject.searchIndex = False
         # Add it to the config
         self.parent().config.starredDirs.append(newProject)
         # Update list
@@ -487,6 +488,13 @@ class Projects(QtWidgets.QWidget):
             checked = bool(d and d["addToPythonpath"])
             action.setChecked(checked)
 
+        # Add check action for using a search index
+        action = menu.addAction(translate("filebrowser", "Index files for search"))
+        action._id = "searchindex"
+        action.setCheckable(True)
+        if d:
+            action.setChecked(bool(d.get("searchIndex", False)))
+
         # Add action to cd to the project directory
         action = menu.addAction(
             translate("filebrowser", "Go to this directory in the current shell")
@@ -519,6 +527,10 @@ class Projects(QtWidgets.QWidget):
             # Flip add-to-pythonpath flag
             d["addToPythonpath"] = not d["addToPythonpath"]
 
+        elif action._id == "searchindex":
+            # Flip search-index flag
+            d["searchIndex"] = not d.get("searchIndex", False)
+
         elif action._id == "cd":
             # cd to the directory
             shell = pyzo.shells.getCurrentShell()
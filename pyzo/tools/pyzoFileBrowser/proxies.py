@@ -16,6 +16,7 @@ from queue import Queue, Empty
 import os.path as op
 
 from . import QtCore
+from . import watcher
 from .utils import isdir
 
 
@@ -274,9 +275,9 @@ class BaseFSProxy(threading.Thread):
         with self._lock:
             self._pathProxies.discard(pathProxy)
 
-    def _push(self, pathProxy):
+    def _push(self, pathProxy, forceUpdate=True):
         # todo: use weak ref here too?
-        self._q.put(pathProxy)
+        self._q.put((pathProxy, forceUpdate))
         self._interrupt = True
 
     def stop(self, *, timeout=1.0):
@@ -284,6 +285,7 @@ class BaseFSProxy(threading.Thread):
             self._exit = True
             self._interrupt = True
             self._pathProxies.clear()
+        self._q.put(None)  # Wake up
         self.join(timeout)
 
     def dir(self, path):
@@ -325,8 +327,8 @@ class BaseFSProxy(threading.Thread):
             try:
                 # Process items from the queue
                 item = self._q.get(True, self.IDLE_TIMEOUT)
-                if item is not None and not item._cancelled:
-                    self._processItem(item, True)
+                if item is not None and not item[0]._cancelled:
+                    self._processItem(*item)
             except Empty:
                 # Queue empty, check items periodically
                 self._idle()
@@ -371,7 +373,7 @@ class BaseFSProxy(threading.Thread):
     def fileSize(self, path):
         raise NotImplementedError()  # Should rerurn None if it does not exist
 
-    def read(self, path):
+    def read(self, path, size=None, offset=0):
         raise NotImplementedError()  # Should rerurn None if it does not exist
 
     def write(self, path, bb):
@@ -391,7 +393,81 @@ import os
 
 
 class NativeFSProxy(BaseFSProxy):
-    """File system proxy for the native file system."""
+    """File system proxy for the native file system.
+
+    Where possible, the tracked dirs and files are watched for changes
+    (using inotify on Linux) instead of being polled.
+    """
+
+    def __init__(self):
+        self._watcher = watcher.createWatcher()
+        self._watches = {}  # watch descriptor -> set of PathProxy
+        self._watchIds = {}  # PathProxy -> watch descriptor
+        super().__init__()
+        if self._watcher is not None:
+            t = threading.Thread(target=self._watchLoop)
+            t.daemon = True
+            t.start()
+
+    def _track(self, pathProxy):
+        if self._watcher is None or not self._addWatch(pathProxy):
+            super()._track(pathProxy)  # poll
+
+    def _unTrack(self, pathProxy):
+        super()._unTrack(pathProxy)
+        if self._watcher is None:
+            return
+        with self._lock:
+            wd = self._watchIds.pop(pathProxy, None)
+            pathProxies = self._watches.get(wd, None)
+            if pathProxies is not None:
+                pathProxies.discard(pathProxy)
+                if not pathProxies:
+                    self._watches.pop(wd)
+                    self._watcher.removeWatch(wd)
+
+    def _addWatch(self, pathProxy):
+        isDir = isinstance(pathProxy, DirProxy)
+        try:
+            wd = self._watcher.addWatch(pathProxy.path(), isDir)
+        except OSError:
+            return False
+        with self._lock:
+            self._watches.setdefault(wd, set()).add(pathProxy)
+            self._watchIds[pathProxy] = wd
+        return True
+
+    def _watchLoop(self):
+        try:
+            while not self._exit:
+                events = self._watcher.readEvents(0.5)
+                if events:
+                    self._processEvents(events)
+        except Exception as err:
+            print("Exception in file watcher thread: " + str(err))
+        finally:
+            self._watcher.close()
+
+    def _processEvents(self, events):
+        toPush, lost = set(), set()
+        with self._lock:
+            for wd, mask in events:
+                if wd == -1:
+                    # Events were lost, process all watched paths
+                    toPush.update(self._watchIds)
+                elif mask & watcher.IN_IGNORED:
+                    # The watch was removed because the path was deleted
+                    # or moved. Re-add the watch or poll the path.
+                    lost.update(self._watches.pop(wd, ()))
+                else:
+                    toPush.update(self._watches.get(wd, ()))
+            for pathProxy in lost:
+                self._watchIds.pop(pathProxy, None)
+        for pathProxy in lost:
+            if not pathProxy._cancelled:
+                self._track(pathProxy)
+        for pathProxy in toPush | lost:
+            self._push(pathProxy, False)
 
     def listDirs(self, path):
         if isdir(path):
@@ -411,10 +487,12 @@ class NativeFSProxy(BaseFSProxy):
         if op.isfile(path):
             return op.getsize(path)
 
-    def read(self, path, size=None):
+    def read(self, path, size=None, offset=0):
         size = size or -1
         if op.isfile(path):
             with open(path, "rb") as f:
+                if offset:
+                    f.seek(offset)
                 return f.read(size)
 
     def write(self, path, bb):
@@ -0,0 +1,170 @@
+"""
+Search for text in the files of a directory (and its subdirectories).
+
+The directories are listed and the files are searched by a pool of
+worker threads. Reading a file releases the GIL, so the workers can
+wait for the file system in parallel. The results are passed to the
+tree in batches, so that it is not flooded with events.
+"""
+
+import time
+import threading
+from queue import Queue
+
+from . import QtCore
+from . import tasks, searchindex
+
+
+class SearchJob(QtCore.QObject):
+    """SearchJob(fsProxy, searchFilter, filterEntries, index=None)
+
+    A search in the files of a directory. The searchFilter is the dict as
+    obtained from Browser.searchFilter(). The filterEntries function is
+    called with the lists of dirs and files of a directory, and should
+    return these lists with the entries that should be searched. If a
+    SearchIndex is given, it is used to skip the files that cannot
+    contain the pattern, and it is updated for the files that are read.
+
+    Use start() to start searching, and cancel() to stop. The found signal
+    is emitted with this job, a list of (path, lines) tuples for the files
+    that contain the pattern, the number of files that are searched, and
+    the total number of files found so far.
+    """
+
+    found = QtCore.Signal(object, list, int, int)
+
+    # The number of worker threads
+    NUM_WORKERS = 4
+
+    # The minimum time between two emits of the found signal
+    BATCH_INTERVAL = 0.1
+
+    def __init__(self, fsProxy, searchFilter, filterEntries, index=None):
+        super().__init__()
+        self._fsProxy = fsProxy
+        self._searchFilter = searchFilter
+        self._filterEntries = filterEntries
+        self._task = tasks.SearchTask(**searchFilter)
+        self._index = index
+        self._indexQuery = None
+        if index is not None:
+            query = searchindex.SearchIndexQuery(
+                searchFilter["pattern"], searchFilter["regExp"]
+            )
+            self._indexQuery = query if query.isUseful() else None
+        #
+        self._lock = threading.RLock()
+        self._queue = Queue()
+        self._cancelled = False
+        self._pendingCount = 0  # number of paths in the queue or in process
+        self._checkCount = 0
+        self._totalCount = 0
+        self._hits = []
+        self._lastEmit = 0
+
+    def start(self, dirs, files):
+        """Start searching the given files, and the files in the given dirs."""
+        self._add(dirs, files)
+        if not self._pendingCount:
+            self._emit(True)
+            return
+        for i in range(self.NUM_WORKERS):
+            t = threading.Thread(target=self._run)
+            t.daemon = True
+            t.start()
+
+    def cancel(self):
+        """Stop searching. The found signal will not be emitted anymore."""
+        self._cancelled = True
+        self._stopWorkers()
+
+    def _stopWorkers(self):
+        for i in range(self.NUM_WORKERS):
+            self._queue.put(None)
+
+    def _add(self, dirs, files):
+        if not self._searchFilter["subDirs"]:
+            dirs = []
+        with self._lock:
+            for path in files:
+                self._queue.put((path, False))
+            for path in dirs:
+                self._queue.put((path, True))
+            self._pendingCount += len(files) + len(dirs)
+            self._totalCount += len(files)
+
+    def _run(self):
+        """The loop of a worker thread."""
+        while True:
+            item = self._queue.get()
+            if item is None or self._cancelled:
+                return
+            path, isDir = item
+            try:
+                if isDir:
+                    self._processDir(path)
+                else:
+                    self._processFile(path)
+            except Exception as err:
+                print("Search failed for {}:\n{}".format(path, str(err)))
+            with self._lock:
+                self._pendingCount -= 1
+                done = not self._pendingCount
+                self._emit(done)
+            if done:
+                self._stopWorkers()
+                if self._index is not None:
+                    self._index.save(self._fsProxy)
+
+    def _processDir(self, path):
+        try:
+            dirs = self._fsProxy.listDirs(path)
+            files = self._fsProxy.listFiles(path)
+        except OSError:
+            return
+        if dirs is None or files is None:
+            return  # deleted
+        dirs, files = self._filterEntries(dirs, files)
+        self._add(dirs, files)
+
+    def _processFile(self, path):
+        try:
+            useIndex = self._index is not None and self._index.contains(path)
+            if useIndex and not self._task.isLargeFile(self._fsProxy, path):
+                result = self._searchIndexedFile(path)
+            else:
+                result = self._task.searchFile(
+                    self._fsProxy, path, **self._searchFilter
+                )
+        finally:
+            with self._lock:
+                self._checkCount += 1
+        if result:
+            with self._lock:
+                self._hits.append((path, result))
+
+    def _searchIndexedFile(self, path):
+        excludeBinary = self._searchFilter["excludeBinary"]
+        mtime = self._fsProxy.modified(path)
+        if mtime is None:
+            return  # deleted
+        entry = self._index.lookup(path, mtime)
+        if entry is not None and self._indexQuery is not None:
+            if not self._indexQuery.mayMatch(entry, excludeBinary):
+                return
+        text = self._task.getText(self._fsProxy, path, excludeBinary)
+        if entry is None:
+            self._index.update(path, mtime, text)
+        return self._task.searchText(text, **self._searchFilter)
+
+    def _emit(self, force=False):
+        """Emit the found signal, if some time has passed since the last emit."""
+        with self._lock:
+            now = time.perf_counter()
+            if self._cancelled:
+                return
+            if not force and now - self._lastEmit < self.BATCH_INTERVAL:
+                return
+            self._lastEmit = now
+            hits, self._hits = self._hits, []
+            self.found.emit(self, hits, self._checkCount, self._totalCount)
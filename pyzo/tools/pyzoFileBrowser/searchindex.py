@@ -0,0 +1,263 @@
+"""
+A trigram index of the files in a (starred) directory, to speed up
+searching in files.
+
+For each file, the index stores the modification time and a bit set
+in which the trigrams of the words in the file are hashed (a bloom
+filter). When searching, a file is only opened if the bits for all the
+trigrams in the search pattern are set, or if the file changed since
+it was indexed. The index is updated while searching, and stored in
+the application data dir.
+
+Only the trigrams in words (of ASCII letters, digits and underscores)
+are used, and the text is case folded. This makes the index small,
+and means that it can be used for any literal search, case sensitive
+or not, and for regular expressions that consist of literal parts.
+"""
+
+import os
+import hashlib
+import pickle
+import threading
+import os.path as op
+
+import pyzo
+
+
+# The version of the file format, increase when the format changes
+INDEX_VERSION = 1
+
+# The number of bits per trigram in the bit set of a file
+BITS_PER_TRIGRAM = 4
+
+# Translation table that replaces all bytes that are not in a word by a space
+wordTable = bytes(c if chr(c).isalnum() or c == 95 else 32 for c in range(128))
+wordTable += b" " * 128
+
+# The indices per (normalized) directory
+_indices = {}
+
+
+def getSearchIndex(path):
+    """Get the SearchIndex for the given directory."""
+    key = op.normcase(path)
+    if key not in _indices:
+        _indices[key] = SearchIndex(path)
+    return _indices[key]
+
+
+def _foldText(text):
+    # re.IGNORECASE also matches the dotless i to i, casefold() does not
+    return text.casefold().replace("ı", "i").encode("utf-8")
+
+
+def getTrigramHashes(text):
+    """Get a set with the hashes of the trigrams in the words of the text."""
+    words = set(_foldText(text).translate(wordTable).split())
+    trigrams = {w[i : i + 3] for w in words for i in range(len(w) - 2)}
+    fromBytes = int.from_bytes
+    return {fromBytes(t, "little") * 2654435761 & 0xFFFFFFFF for t in trigrams}
+
+
+def makeBitSet(hashes, nbits):
+    """Make a bit set of 2**nbits bits, in which the given hashes are set.
+    The bit set is returned as an int.
+    """
+    shift = 32 - nbits
+    buf = bytearray(max(1, (1 << nbits) >> 3))
+    for h in hashes:
+        b = h >> shift
+        buf[b >> 3] |= 1 << (b & 7)
+    return int.from_bytes(buf, "little")
+
+
+# The number of characters after escapes like \x41 in regular expressions
+_escapeLengths = {"x": 2, "u": 4, "U": 8}
+
+
+def getRegExpLiterals(pattern):
+    """Get the literal parts of a simple regular expression, which must
+    be present in any match. Returns None for expressions with
+    alternatives or groups.
+    """
+    parts, part = [], []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            c2 = pattern[i + 1 : i + 2]
+            i += 2
+            if c2.isalnum() or not c2:
+                # Character class (e.g. \w), anchor (e.g. \b), reference or
+                # escaped character (e.g. \n or \x41). Skip the argument.
+                parts.append("".join(part))
+                part = []
+                if c2 == "N":
+                    i = pattern.find("}", i) + 1
+                    if i == 0:
+                        return None
+                elif c2.isdigit():
+                    # A reference (e.g. \12) or an octal escape (e.g. \012)
+                    for _ in range(2):
+                        if pattern[i : i + 1].isdigit():
+                            i += 1
+                else:
+                    i += _escapeLengths.get(c2, 0)
+            else:
+                part.append(c2)
+            continue
+        elif c in "|()":
+            return None
+        elif c in "*?{":
+            # The preceding character is optional
+            if part:
+                part.pop()
+            parts.append("".join(part))
+            part = []
+            if c == "{":
+                i = pattern.find("}", i)
+                if i < 0:
+                    return None
+        elif c == "[":
+            # Skip the character set, a "]" at the start is a literal
+            parts.append("".join(part))
+            part = []
+            i += 1
+            if pattern[i : i + 1] == "^":
+                i += 1
+            if pattern[i : i + 1] == "]":
+                i += 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+        elif c in "+.^$":
+            parts.append("".join(part))
+            part = []
+        else:
+            part.append(c)
+        i += 1
+    parts.append("".join(part))
+    return [part for part in parts if part]
+
+
+class SearchIndexQuery:
+    """SearchIndexQuery(pattern, regExp=False)
+
+    Use mayMatch() to test whether an entry of a SearchIndex may contain
+    the pattern. If nothing is known about the pattern, all files may
+    contain it.
+    """
+
+    def __init__(self, pattern, regExp=False):
+        parts = getRegExpLiterals(pattern) if regExp else [pattern]
+        self._hashes = set()
+        for part in parts or []:
+            self._hashes.update(getTrigramHashes(part))
+        self._bitSets = {}  # per nbits
+
+    def isUseful(self):
+        """Get whether this query can exclude files."""
+        return bool(self._hashes)
+
+    def mayMatch(self, entry, excludeBinary=True):
+        """Get whether the file of the given index entry may contain
+        the pattern.
+        """
+        mtime, nbits, bits = entry
+        if bits is None:
+            return not excludeBinary  # Binary or unreadable
+        q = self._bitSets.get(nbits, None)
+        if q is None:
+            q = self._bitSets[nbits] = makeBitSet(self._hashes, nbits)
+        return bits & q == q
+
+
+class SearchIndex:
+    """SearchIndex(path)
+
+    Trigram index for the files in the given directory (and its
+    subdirectories). Obtain instances using getSearchIndex(). The methods
+    can be called from any thread.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        key = hashlib.sha1(op.normcase(path).encode("utf-8")).hexdigest()
+        self._filename = op.join(pyzo.appDataDir, "searchindex", key + ".pickle")
+        self._lock = threading.RLock()
+        self._files = None  # Loaded on first use
+        self._seen = set()
+        self._dirty = False
+
+    def path(self):
+        """Get the path of the directory that this index is for."""
+        return self._path
+
+    def contains(self, path):
+        """Get whether the given file is in the directory of this index."""
+        return op.normcase(path).startswith(op.normcase(self._path) + op.sep)
+
+    def lookup(self, path, mtime):
+        """Get the entry for the given file, or None if the file is
+        not indexed or was modified since.
+        """
+        with self._lock:
+            if self._files is None:
+                self._load()
+            self._seen.add(path)
+            entry = self._files.get(path, None)
+        if entry is not None and entry[0] == mtime:
+            return entry
+
+    def update(self, path, mtime, text):
+        """Update the entry for the given file. The text may be None for
+        binary files and files that cannot be read.
+        """
+        if text is None:
+            entry = mtime, 0, None
+        else:
+            hashes = getTrigramHashes(text)
+            nbits = max(6, min(32, (BITS_PER_TRIGRAM * len(hashes)).bit_length()))
+            entry = mtime, nbits, makeBitSet(hashes, nbits)
+        with self._lock:
+            if self._files is None:
+                self._load()
+            self._files[path] = entry
+            self._dirty = True
+
+    def save(self, fsProxy):
+        """Save the index to disk, if it has changed. Files that are
+        no longer present are removed from the index.
+        """
+        with self._lock:
+            if self._files is None:
+                return
+            for path in list(self._files):
+                if path not in self._seen and fsProxy.modified(path) is None:
+                    self._files.pop(path)
+                    self._dirty = True
+            self._seen = set()
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = {"version": INDEX_VERSION, "path": self._path}
+            data["files"] = self._files
+            try:
+                os.makedirs(op.dirname(self._filename), exist_ok=True)
+                tmpFilename = self._filename + ".tmp"
+                with open(tmpFilename, "wb") as f:
+                    pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+                os.replace(tmpFilename, self._filename)
+            except Exception as err:
+                print("Could not save search index: " + str(err))
+
+    def _load(self):
+        self._files = {}
+        if not op.isfile(self._filename):
+            return
+        try:
+            with open(self._filename, "rb") as f:
+                data = pickle.load(f)
+            if data["version"] == INDEX_VERSION:
+                self._files = data["files"]
+        except Exception as err:
+            print("Could not load search index: " + str(err))
@@ -4,16 +4,29 @@ These inherit from proxies.Task and implement that specific interface.
 """
 
 import re
+import codecs
 
+import pyzo
 from . import proxies
 
 
 class SearchTask(proxies.Task):
     __slots__ = []
 
-    def process(
+    # The maximum number of matches to return per file
+    MAX_MATCHES = 100
+
+    # When searching large files in chunks, matches that start in the last
+    # OVERLAP characters of a chunk are searched again with the next chunk
+    OVERLAP = 2**16
+
+    def process(self, proxy, **params):
+        return self.searchFile(proxy._fsProxy, proxy.path(), **params)
+
+    def searchFile(
         self,
-        proxy,
+        fsProxy,
+        path,
         pattern=None,
         matchCase=False,
         regExp=False,
@@ -21,15 +34,61 @@ class SearchTask(proxies.Task):
         excludeBinary=True,
         **rest,
     ):
+        """Search the file at the given path. Returns a list of
+        (linenr, line) tuples. If there are more than MAX_MATCHES matches,
+        the last tuple is (None, message). Can be called from any thread.
+        """
         # Quick test
         if not pattern:
             return
 
+        # Search large files in chunks
+        if self.isLargeFile(fsProxy, path):
+            return self._searchLargeFile(
+                fsProxy, path, pattern, matchCase, regExp, wholeWords, excludeBinary
+            )
+
         # Get text
-        haystack = self._getText(proxy, excludeBinary)
+        haystack = self.getText(fsProxy, path, excludeBinary)
+        return self.searchText(haystack, pattern, matchCase, regExp, wholeWords)
+
+    def searchText(
+        self,
+        haystack,
+        pattern=None,
+        matchCase=False,
+        regExp=False,
+        wholeWords=False,
+        **rest,
+    ):
+        """Search the given text, see searchFile()."""
         if not haystack:
             return
 
+        pattern, flags = self._makePattern(pattern, matchCase, regExp, wholeWords)
+
+        # Stop searching when we have more matches than we show
+        indices = self._getIndicesRegExp(haystack, pattern, flags, self.MAX_MATCHES + 1)
+
+        # Return as lines
+        lines = self._indicesToLines(haystack, indices[: self.MAX_MATCHES])
+        return self._limitLines(lines, len(indices))
+
+    def isLargeFile(self, fsProxy, path):
+        """Get whether the file at the given path is larger than the
+        memory that may be used to search it. Such files are searched
+        in chunks.
+        """
+        try:
+            size = fsProxy.fileSize(path) or 0
+        except NotImplementedError:
+            size = 0
+        return size > self._getMaxMemory()
+
+    def _getMaxMemory(self):
+        return int(pyzo.config.advanced.fileBrowserSearchMemory * 2**20)
+
+    def _makePattern(self, pattern, matchCase, regExp, wholeWords):
         flags = re.MULTILINE
         if not matchCase:
             flags |= re.IGNORECASE
@@ -40,39 +99,28 @@ class SearchTask(proxies.Task):
         if wholeWords:
             pattern = r"\b" + pattern + r"\b"
 
-        indices = self._getIndicesRegExp(haystack, pattern, flags)
-
-        # Return as lines
-        if indices:
-            return self._indicesToLines(haystack, indices)
-        else:
-            return []
-
-    def _getText(self, proxy, excludeBinary=True):
-        # Init
-        path = proxy.path()
-        fsProxy = proxy._fsProxy
+        return pattern, flags
 
-        # # Get file size
-        # try:
-        #     size = fsProxy.fileSize(path) or 0
-        # except NotImplementedError:
-        #     size = 0
+    def _limitLines(self, lines, count):
+        if count > self.MAX_MATCHES:
+            message = "Only the first {} matches are shown"
+            lines.append((None, message.format(self.MAX_MATCHES)))
+        return lines
 
+    def getText(self, fsProxy, path, excludeBinary=True):
+        """Get the text of the file at the given path, or None if the file
+        cannot be read, or is binary and excludeBinary is set.
+        """
         # Always search Python files.
         if path.lower().endswith(".py"):
             excludeBinary = False
 
         if excludeBinary:
-            # Check first few bytes for presence of zero bytes.
-            # Git supposedly uses the same logic to determine whether
-            # a file is binary. Note that files with certain encodings
-            # other than utf-8 can be marked binary too.
             preamble_len = 8000
             bb_preamble = fsProxy.read(path, preamble_len)
             if bb_preamble is None:
                 return None
-            if 0 in bb_preamble:
+            if self._isBinary(bb_preamble):
                 return None
             # Ready bytes (or re-use)
             if len(bb_preamble) < preamble_len:
@@ -88,26 +136,110 @@ class SearchTask(proxies.Task):
         else:
             return bb.decode("utf-8", errors="replace")
 
-    def _getIndicesRegExp(self, text, pattern, flags):
+    def _isBinary(self, bb):
+        # Check first few bytes for presence of zero bytes.
+        # Git supposedly uses the same logic to determine whether
+        # a file is binary. Note that files with certain encodings
+        # other than utf-8 can be marked binary too.
+        return 0 in bb[:8000]
+
+    def _searchLargeFile(
+        self, fsProxy, path, pattern, matchCase, regExp, wholeWords, excludeBinary
+    ):
+        """Search a file in chunks, to limit the memory that is used. The
+        chunks are decoded and matched in the same way as the text of small
+        files. Note that matches longer than OVERLAP characters may be missed.
+        """
+        chunkSize = max(2 * self.OVERLAP, self._getMaxMemory() // 8)
+
+        pattern, flags = self._makePattern(pattern, matchCase, regExp, wholeWords)
+        prog = re.compile(pattern, flags)
+
+        # A character can be split over two chunks
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        lines = []
+        count = 0
+        linenr = 1  # the line number at the start of the buffer
+        buffer = ""
+        filePos = 0
+        LE = None
+        while True:
+            # Read next chunk
+            chunk = fsProxy.read(path, chunkSize, filePos)
+            if chunk is None:
+                return None
+            if LE is None:
+                if excludeBinary and not path.lower().endswith(".py"):
+                    if self._isBinary(chunk):
+                        return None
+            filePos += len(chunk)
+            final = len(chunk) < chunkSize
+            buffer += decoder.decode(chunk, final)
+            if LE is None:
+                LE = self._determineLineEnding(buffer[:8192])
+
+            # Matches that start before end are reported now, the rest of
+            # the buffer is kept and searched again with the next chunk
+            limit = len(buffer) - self.OVERLAP
+            if final:
+                end = len(buffer)
+            elif limit <= 0:
+                end = 0  # can happen for non-ASCII text, wait for more
+            else:
+                end = buffer.rfind(LE, 0, limit) + 1
+                if end <= 0:
+                    end = limit  # very long line
+
+            i0 = 0
+            for match in prog.finditer(buffer):
+                i = match.start()
+                if i >= end:
+                    break
+                count += 1
+                if count > self.MAX_MATCHES:
+                    return self._limitLines(lines, count)
+                # Get linenr and the line
+                linenr += buffer.count(LE, i0, i)
+                i0 = i
+                i1 = buffer.rfind(LE, 0, i) + 1
+                i2 = buffer.find(LE, i)
+                if i2 < 0:
+                    i2 = len(buffer)
+                lines.append((linenr, repr(buffer[i1:i2].strip()[:80])))
+
+            if final:
+                return lines
+            linenr += buffer.count(LE, i0, end)
+            buffer = buffer[end:]
+
+    def _getIndicesRegExp(self, text, pattern, flags, maxCount=None):
         indices = []
         for match in re.finditer(pattern, text, flags):
             indices.append(match.start())
+            if len(indices) == maxCount:
+                break
         return indices
 
     def _indicesToLines(self, text, indices):
         # Determine line endings
         LE = self._determineLineEnding(text)
 
-        # Obtain line and line numbers
+        # Obtain line and line numbers. The indices are sorted, so we
+        # only count the line endings since the previous index.
         lines = []
+        linenr, i0 = 1, 0
         for i in indices:
             # Get linenr and index of the line
-            linenr = text.count(LE, 0, i) + 1
+            linenr += text.count(LE, i0, i)
+            i0 = i
             i1 = text.rfind(LE, 0, i)
             i2 = text.find(LE, i)
             # Get line and strip
             if i1 < 0:
                 i1 = 0
+            if i2 < 0:
+                i2 = len(text)
             line = text[i1:i2].strip()[:80]
             # Store
             lines.append((linenr, repr(line)))
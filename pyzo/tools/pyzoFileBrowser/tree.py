@@ -13,7 +13,7 @@ import pyzo
 from pyzo import translate
 from . import QtCore, QtGui, QtWidgets
 
-from . import tasks
+from . import tasks, search, searchindex
 from .utils import hasHiddenAttribute, getMounts, cleanpath, isdir, ext
 
 
@@ -84,35 +84,20 @@ def createMounts(browser, tree):
         DriveItem(tree, fsProxy.dir(entry))
 
 
-def createItemsFun(browser, parent):
-    """Create the tree widget items for a Tree or DirItem."""
-
-    # Get file system proxy and dir proxy for which we shall create items
-    fsProxy = browser._fsProxy
-    dirProxy = parent._proxy
-
-    # Get meta information from browser
-    searchFilter = browser.searchFilter()
-    searchFilter = searchFilter if searchFilter["pattern"] else None
-    expandedDirs = browser.expandedDirs
-    starredDirs = browser.starredDirs
-
-    if searchFilter and searchFilter["regExp"]:
-        try:
-            re.compile(searchFilter["pattern"], re.MULTILINE)
-        except re.error as err:
-            ErrorItem(parent, "Error in regular expression:\n{}".format(err))
-            return
-
+def makeEntryFilter(browser):
+    """Get a function that filters the dirs and files of a directory,
+    using the name filter of the browser. The function can be used
+    from any thread.
+    """
     # Prepare name filter info
     nameFilters = browser.nameFilter().replace(",", " ").split()
     hideHidden = "!hidden" in nameFilters
     nameFilters = [f for f in nameFilters if f not in ("", "!hiddden", "hidden")]
+    basePath = browser._tree.path()
 
-    # Filter the contents of this folder
-    try:
+    def filterEntries(dirProxyDirs, dirProxyFiles):
         dirs = []
-        for entry in dirProxy.dirs():
+        for entry in dirProxyDirs:
             entry = cleanpath(entry)
             if hideHidden:
                 if op.basename(entry).startswith("."):
@@ -126,27 +111,67 @@ def createItemsFun(browser, parent):
             dirs.append(entry)
 
         files = []
-        for entry in dirProxy.files():
+        for entry in dirProxyFiles:
             entry = cleanpath(entry)
             if hideHidden and op.basename(entry).startswith("."):
                 continue  # Skip hidden files
             if hideHidden and hasHiddenAttribute(entry):
                 continue  # Skip hidden files on Windows
-            if not _filterFileByName(entry, nameFilters, browser._tree.path()):
+            if not _filterFileByName(entry, nameFilters, basePath):
                 continue
             files.append(entry)
 
-    except (OSError, IOError) as err:
-        ErrorItem(parent, str(err))
-        return
+        return dirs, files
+
+    return filterEntries
+
+
+def makeSearchEntryFilter(browser):
+    """Get a function that filters the dirs and files to search in."""
+    filterEntries = makeEntryFilter(browser)
+
+    def filterSearchEntries(dirProxyDirs, dirProxyFiles):
+        dirs, files = filterEntries(dirProxyDirs, dirProxyFiles)
+        dirs = [d for d in dirs if op.basename(d) not in (".git", ".hg")]
+        return dirs, files
+
+    return filterSearchEntries
+
+
+def createItemsFun(browser, parent):
+    """Create the tree widget items for a Tree or DirItem."""
+
+    # Get file system proxy and dir proxy for which we shall create items
+    fsProxy = browser._fsProxy
+    dirProxy = parent._proxy
 
-    # Sort dirs (case insensitive, number aware)
-    dirs.sort(key=dirpathSplitName2sortkey)
+    # Get meta information from browser
+    searchFilter = browser.searchFilter()
+    searchFilter = searchFilter if searchFilter["pattern"] else None
+    expandedDirs = browser.expandedDirs
+    starredDirs = browser.starredDirs
 
-    # Sort files (case insensitive, first by type, then by name, number aware)
-    files.sort(key=filepathSplitName2sortkey)
+    if searchFilter and searchFilter["regExp"]:
+        try:
+            re.compile(searchFilter["pattern"], re.MULTILINE)
+        except re.error as err:
+            ErrorItem(parent, "Error in regular expression:\n{}".format(err))
+            return
 
     if not searchFilter:
+        # Filter the contents of this folder
+        try:
+            dirs, files = makeEntryFilter(browser)(dirProxy.dirs(), dirProxy.files())
+        except (OSError, IOError) as err:
+            ErrorItem(parent, str(err))
+            return
+
+        # Sort dirs (case insensitive, number aware)
+        dirs.sort(key=dirpathSplitName2sortkey)
+
+        # Sort files (case insensitive, first by type, then by name, number aware)
+        files.sort(key=filepathSplitName2sortkey)
+
         # Create dirs
         for path in dirs:
             starred = op.normcase(path) in starredDirs
@@ -163,27 +188,27 @@ def createItemsFun(browser, parent):
             item = FileItem(parent, fsProxy.file(path))
 
     else:
-        # If searching, inject everything in the tree
-        # And every item is hidden at first
-        parent = browser._tree
-        if parent.topLevelItemCount():
-            searchInfoItem = parent.topLevelItem(0)
-        else:
-            searchInfoItem = SearchInfoItem(parent)
-
-        # Increase number of found files
-        searchInfoItem.increaseTotal(len(files))
+        # If searching, the files are searched in a pool of worker threads,
+        # and every file with results is injected in the tree
+        filterEntries = makeSearchEntryFilter(browser)
+        try:
+            dirs, files = filterEntries(dirProxy.dirs(), dirProxy.files())
+        except (OSError, IOError) as err:
+            ErrorItem(parent, str(err))
+            return
 
-        # Create temporary file items
-        for path in files:
-            item = TemporaryFileItem(parent, fsProxy.file(path))
-            item.search(searchFilter)
+        # Use the search index of the current project, if enabled
+        index = None
+        d = browser.currentProject()
+        if d and d.get("searchIndex", False):
+            index = searchindex.getSearchIndex(d.path)
 
-        # Create temporary dir items
-        if searchFilter["subDirs"]:
-            for path in dirs:
-                if os.path.basename(path) not in (".git", ".hg"):
-                    item = TemporaryDirItem(parent, fsProxy.dir(path))
+        # Start the search
+        tree = browser._tree
+        SearchInfoItem(tree)
+        tree._searchJob = search.SearchJob(fsProxy, searchFilter, filterEntries, index)
+        tree._searchJob.found.connect(tree.onSearchResults)
+        tree._searchJob.start(dirs, files)
 
     # Return number of files added
     return len(dirs) + len(files)
@@ -512,14 +537,10 @@ class SearchInfoItem(ErrorItem):
         self._checkCount = 0
         self._hitCount = 0
 
-    def increaseTotal(self, c):
-        self._totalCount += c
-        self.updateCounts()
-
-    def addFile(self, hit):
-        self._checkCount += 1
-        if hit:
-            self._hitCount += 1
+    def addResults(self, hitCount, checkCount, totalCount):
+        self._hitCount += hitCount
+        self._checkCount = checkCount
+        self._totalCount = totalCount
         # Update appearance
         self.updateCounts()
 
@@ -528,68 +549,6 @@ class SearchInfoItem(ErrorItem):
         self.setText(0, "Searched {}/{} files: {} hits".format(*counts))
 
 
-class TemporaryDirItem:
-    """Created when searching. This object posts a requests for its contents
-    which are then processed, after which this object disbands itself.
-    """
-
-    __slots__ = ["__weakref__", "_proxy", "_tree"]
-
-    def __init__(self, tree, pathProxy):
-        self._tree = tree
-        self._proxy = pathProxy
-        self._proxy.changed.connect(self.onChanged)
-        # Process asap, but do not track
-        self._proxy.push()
-        # Store ourself
-        tree._temporaryItems.add(self)
-
-    def clear(self):
-        pass  # tree.createItems() calls this ...
-
-    def onChanged(self):
-        # Disband
-        self._tree._temporaryItems.discard(self)
-        # Process contents
-        self._tree.createItems(self)
-
-
-class TemporaryFileItem:
-    """Created when searching. This object posts a requests to search
-    its contents which are then processed, after which this object
-    disbands itself, passing the proxy object to a real FileItem if the
-    search had results.
-    """
-
-    __slots__ = ["__weakref__", "_proxy", "_tree"]
-
-    def __init__(self, tree, pathProxy):
-        self._tree = tree
-        self._proxy = pathProxy
-        self._proxy.taskFinished.connect(self.onSearchResult)
-        # Store ourself
-        tree._temporaryItems.add(self)
-
-    def search(self, searchFilter):
-        self._proxy.pushTask(tasks.SearchTask(**searchFilter))
-
-    def onSearchResult(self, task):
-        # Disband now
-        self._tree._temporaryItems.discard(self)
-
-        # Get result. May raise an error
-        result = task.result()
-        # Process contents
-        if result:
-            item = FileItem(self._tree, self._proxy, "search")  # Search mode
-            for r in result:
-                SubFileItem(item, *r, showlinenr=True)
-        # Update counter
-        searchInfoItem = self._tree.topLevelItem(0)
-        if isinstance(searchInfoItem, SearchInfoItem):
-            searchInfoItem.addFile(bool(result))
-
-
 class Tree(QtWidgets.QTreeWidget):
     """Representation of the tree view.
     Instances of this class are responsible for keeping the contents
@@ -619,8 +578,8 @@ class Tree(QtWidgets.QTreeWidget):
         self._selectedPath = ""  # To restore a selection after updating
         self._selectedScrolling = 0
 
-        # Set of temporary items
-        self._temporaryItems = set()
+        # The running search (if any)
+        self._searchJob = None
 
         # Define context menu
         self.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.CustomContextMenu)
@@ -684,10 +643,10 @@ class Tree(QtWidgets.QTreeWidget):
         """Overload the clear method to remove the items in a nice
         way, allowing the pathProxy instance to be closed correctly.
         """
-        # Clear temporary (invisible) items
-        for item in self._temporaryItems:
-            item._proxy.cancel()
-        self._temporaryItems.clear()
+        # Stop searching
+        if self._searchJob is not None:
+            self._searchJob.cancel()
+            self._searchJob = None
         # Clear visible items
         for i in reversed(range(self.topLevelItemCount())):
             item = self.topLevelItem(i)
@@ -725,6 +684,23 @@ class Tree(QtWidgets.QTreeWidget):
         # Restore state
         self._restoreSelectionState()
 
+    def onSearchResults(self, job, hits, checkCount, totalCount):
+        """Called when a batch of search results is available."""
+        if job is not self._searchJob:
+            return  # Results of a cancelled search
+        fsProxy = self.parent()._fsProxy
+        for path, result in hits:
+            item = FileItem(self, fsProxy.file(path), "search")  # Search mode
+            for linenr, text in result:
+                if linenr is None:
+                    ErrorItem(item, text)  # There are more matches
+                else:
+                    SubFileItem(item, linenr, text, showlinenr=True)
+        # Update counter
+        searchInfoItem = self.topLevelItem(0)
+        if isinstance(searchInfoItem, SearchInfoItem):
+            searchInfoItem.addResults(len(hits), checkCount, totalCount)
+
     def onErrored(self, err="..."):
         self.clear()
         ErrorItem(self, "Error: " + err)
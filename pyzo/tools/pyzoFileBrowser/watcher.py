@@ -0,0 +1,122 @@
+"""
+Watch paths in the native file system for changes, so that the file
+system proxy does not have to poll them. Uses inotify on Linux (via
+ctypes). On other platforms createWatcher() returns None, and the
+file system proxy falls back to polling.
+"""
+
+import os
+import sys
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+
+
+# Flags from sys/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+# The events to watch for directories and files
+DIR_EVENTS = (
+    IN_CREATE
+    | IN_DELETE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+FILE_EVENTS = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF
+
+_eventHeader = struct.Struct("iIII")
+
+
+def createWatcher():
+    """Create a watcher for the native file system, or return None if
+    this is not supported on this platform.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError):
+        return None
+
+
+class InotifyWatcher:
+    """Thin wrapper around inotify. Use addWatch() to watch a path, and
+    readEvents() to wait for events.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._init = libc.inotify_init1
+        self._addWatch = libc.inotify_add_watch
+        self._addWatch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rmWatch = libc.inotify_rm_watch
+        self._rmWatch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._fd = self._init(IN_CLOEXEC | IN_NONBLOCK)
+        if self._fd < 0:
+            self._raise()
+
+    def _raise(self):
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e))
+
+    def addWatch(self, path, isDir):
+        """Start watching the given path. Returns the watch descriptor.
+        Raises OSError if the path cannot be watched (e.g. because it does
+        not exist or because the limit of watches is reached).
+        """
+        mask = DIR_EVENTS if isDir else FILE_EVENTS
+        wd = self._addWatch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            self._raise()
+        return wd
+
+    def removeWatch(self, wd):
+        """Stop watching the path of the given watch descriptor."""
+        self._rmWatch(self._fd, wd)
+
+    def readEvents(self, timeout):
+        """Wait at most timeout seconds for events. Returns a list of
+        (wd, mask) tuples. A wd of -1 means that events were lost.
+        """
+        try:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+        except (OSError, ValueError):
+            return []  # closed
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError as err:
+            if err.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            raise
+        events = []
+        i = 0
+        while i + _eventHeader.size <= len(data):
+            wd, mask, cookie, length = _eventHeader.unpack_from(data, i)
+            events.append((wd, mask))
+            i += _eventHeader.size + length
+        return events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
@@ -8,6 +8,10 @@ tool_summary = pyzo.translate(
     "pyzoWorkspace", "Lists the variables in the current shell's namespace."
 )
 
+# The number of elements of a container (e.g. a list or dict) that are
+# fetched at once. More elements are fetched when scrolling down.
+PAGE_SIZE = 1000
+
 
 def splitName(name):
     """Split an object name in parts, taking dots and indexing into account."""
@@ -50,8 +54,22 @@ class WorkspaceProxy(QtCore.QObject):
     def __init__(self):
         super().__init__()
 
-        # Variables
-        self._variables = []
+        # Variables, a dict name -> (name, typeName, kind, repres)
+        self._variables = {}
+
+        # The names of the variables that were changed, added or removed by
+        # the last update, or None if all variables may have changed.
+        self._changes = None
+
+        # The kernel sends only the changes since the version that we have
+        self._shell = None
+        self._version = 0
+
+        # For a container, we fetch only the first limit elements, and the
+        # kernel tells us the total number of elements (else total is None)
+        self._limit = PAGE_SIZE
+        self._total = None
+        self._fetching = False
 
         # Element to get more info of
         self._name = ""
@@ -72,11 +90,11 @@ class WorkspaceProxy(QtCore.QObject):
     def setName(self, name):
         """Set the name that we want to know more of."""
         self._name = name
+        self._limit = PAGE_SIZE
 
         shell = pyzo.shells.getCurrentShell()
         if shell:
-            future = shell._request.dir2(self._name)
-            future.add_done_callback(self._processResponse)
+            self._requestVariables(shell)
 
     def goUp(self):
         """Cut the last part off the name."""
@@ -91,25 +109,60 @@ class WorkspaceProxy(QtCore.QObject):
         """
         shell = pyzo.shells.getCurrentShell()
         if not shell:
-            self._variables = []
+            self._clearVariables()
             self.haveNewData.emit()
 
     def _onCurrentShellStateChanged(self):
         """Do a request for information!"""
         self.updateVariables()
 
+    def _clearVariables(self):
+        self._variables = {}
+        self._changes = None
+        self._version = 0
+        self._total = None
+
     def updateVariables(self):
         shell = pyzo.shells.getCurrentShell()
         if not shell:
-            self._variables = []
+            self._clearVariables()
         elif shell._state not in ("Busy", "Very busy"):
-            future = shell._request.dir2(self._name)
-            future.add_done_callback(self._processResponse)
+            self._requestVariables(shell)
+
+    def hasMore(self):
+        """Get whether the container that we show has more elements than
+        we fetched.
+        """
+        return self._total is not None and self._limit < self._total
+
+    def fetchMore(self):
+        """Fetch the next page of elements of the container that we show."""
+        shell = pyzo.shells.getCurrentShell()
+        if self._fetching or not self.hasMore() or shell is not self._shell:
+            return
+        if shell._state not in ("Busy", "Very busy"):
+            self._fetching = True
+            self._limit += PAGE_SIZE
+            self._requestVariables(shell, self._limit - PAGE_SIZE)
+
+    def _requestVariables(self, shell, offset=0):
+        """Ask the kernel for the variables that changed since the version
+        that we have. Another shell has another kernel, so it has to send
+        all variables.
+        """
+        if shell is not self._shell:
+            self._shell = shell
+            self._version = 0
+        future = shell._request.dir2Delta(
+            self._name, "workspace", self._version, self._limit, offset
+        )
+        future.add_done_callback(self._processResponse)
 
     def _processResponse(self, future):
         """We got a response, update our list and notify the tree."""
 
-        response = []
+        response = 0, 0, [], [], None
+        self._fetching = False
 
         # Process future
         if future.cancelled():
@@ -119,7 +172,25 @@ class WorkspaceProxy(QtCore.QObject):
         else:
             response = future.result()
 
-        self._variables = response
+        baseVersion, version, changed, removed, total = response
+        if baseVersion == 0:
+            self._variables = {}
+            self._changes = None
+        elif baseVersion == self._version:
+            self._changes = set(removed)
+            self._changes.update(info[0] for info in changed)
+        else:
+            # We missed an update, so we ask for all variables
+            self._version = 0
+            self.updateVariables()
+            return
+
+        for name in removed:
+            self._variables.pop(name, None)
+        for info in changed:
+            self._variables[info[0]] = info
+        self._version = version
+        self._total = total
         self.haveNewData.emit()
 
 
@@ -164,7 +235,14 @@ class WorkspaceTree(QtWidgets.QTreeWidget):
             ]
         )
         # self.setColumnWidth(0, 100)
-        self.setSortingEnabled(True)
+
+        # Enable sorting. We sort the items ourselves instead of using
+        # setSortingEnabled(), because then Qt sorts all items (using our
+        # slow WorkspaceItem.__lt__) whenever an item is added.
+        header = self.header()
+        header.setSortIndicatorShown(True)
+        header.setSectionsClickable(True)
+        header.sortIndicatorChanged.connect(self._sortItems)
 
         # Nice rows
         self.setAlternatingRowColors(True)
@@ -172,7 +250,10 @@ class WorkspaceTree(QtWidgets.QTreeWidget):
 
         # Create proxy
         self._proxy = WorkspaceProxy()
-        self._proxy.haveNewData.connect(self.fillWorkspace)
+        self._proxy.haveNewData.connect(self._onHaveNewData)
+
+        # The items in the tree, a dict name -> item
+        self._items = {}
 
         # For menu
         self.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.DefaultContextMenu)
@@ -181,6 +262,7 @@ class WorkspaceTree(QtWidgets.QTreeWidget):
 
         # Bind to events
         self.itemActivated.connect(self.onItemExpand)
+        self.verticalScrollBar().valueChanged.connect(self._onScrolled)
 
         self._startUpVariables = frozenset(("In", "Out", "exit", "get_ipython", "quit"))
 
@@ -294,6 +376,105 @@ class WorkspaceTree(QtWidgets.QTreeWidget):
         """Set the name filter for variables via a compiled regular expression."""
         self._compiledRegExp = compiledRegExp_or_errorstring
 
+    def _isVisible(self, name, kind):
+        """Get whether a variable should be shown, given the filters."""
+        # <kludge 2>
+        # the typeTranslation dictionary contains "synonyms" for types that will be hidden
+        kind = self._config.typeTranslation.get(kind, kind)
+        # </kludge 2>
+        if kind in self._config.hideTypes:
+            return False
+        if name.startswith("_") and "private" in self._config.hideTypes:
+            return False
+        if "startup" in self._config.hideTypes and name in self._startUpVariables:
+            return False
+        return bool(self._compiledRegExp.fullmatch(name))
+
+    def _setItemInfo(self, item, name, typeName, repres):
+        """Set the texts and tooltips of an item."""
+        item.setText(0, name)
+        item.setText(1, typeName)
+        item.setText(2, repres)
+        tt = "{}: {}".format(name, repres)
+        item.setToolTip(0, tt)
+        item.setToolTip(1, tt)
+        item.setToolTip(2, tt)
+
+    def _onScrolled(self, value):
+        """Fetch more elements of a container when scrolled to the end."""
+        if value >= self.verticalScrollBar().maximum():
+            self._proxy.fetchMore()
+
+    def _updateNameLine(self):
+        """Show the name, and how many elements of a container we have."""
+        text = self._proxy._name
+        if self._proxy.hasMore():
+            text += "  " + pyzo.translate(
+                "pyzoWorkspace", "({} of {} elements, scroll down for more)"
+            ).format(self._proxy._limit, self._proxy._total)
+        self.parent()._line.setText(text)
+
+    def _onHaveNewData(self):
+        """Apply the changes of the variables, or fill the workspace tree
+        again if all variables may have changed.
+        """
+        changes = self._proxy._changes
+        if changes is None or isinstance(self._compiledRegExp, str):
+            self.fillWorkspace()
+        elif changes:
+            self.updateWorkspace(changes)
+        else:
+            self._updateNameLine()  # the total may have changed
+
+    def _sortItems(self, *args):
+        """Sort all items, e.g. when the user clicked on the header."""
+        header = self.header()
+        self.sortItems(header.sortIndicatorSection(), header.sortIndicatorOrder())
+
+    def _insertSorted(self, item):
+        """Insert the item at its position in the sorted items."""
+        ascending = (
+            self.header().sortIndicatorOrder() == QtCore.Qt.SortOrder.AscendingOrder
+        )
+        lo, hi = 0, self.topLevelItemCount()
+        while lo < hi:
+            mid = (lo + hi) // 2
+            other = self.topLevelItem(mid)
+            if (other < item) == ascending:
+                lo = mid + 1
+            else:
+                hi = mid
+        self.insertTopLevelItem(lo, item)
+
+    def updateWorkspace(self, names):
+        """Update the items of the given variable names in the workspace
+        tree, without touching the other items. The items stay sorted.
+        """
+        sortColumn = self.header().sortIndicatorSection()
+        for name in names:
+            info = self._proxy._variables.get(name, None)
+            item = self._items.get(name, None)
+            if info is not None and self._isVisible(name, info[2]):
+                name, typeName, kind, repres = info
+                if item is None:
+                    item = WorkspaceItem((name, typeName, repres), 0)
+                    self._setItemInfo(item, name, typeName, repres)
+                    self._items[name] = item
+                    self._insertSorted(item)
+                elif item.text(1) != typeName or item.text(2) != repres:
+                    self._setItemInfo(item, name, typeName, repres)
+                    if sortColumn != 0:
+                        self.takeTopLevelItem(self.indexOfTopLevelItem(item))
+                        self._insertSorted(item)
+            elif item is not None:
+                del self._items[name]
+                self.takeTopLevelItem(self.indexOfTopLevelItem(item))
+
+        self._updateNameLine()
+        self.parent().displayEmptyWorkspace(
+            self.topLevelItemCount() == 0 and self._proxy._name == ""
+        )
+
     def fillWorkspace(self):
         """Update the workspace tree."""
 
@@ -309,26 +490,14 @@ class WorkspaceTree(QtWidgets.QTreeWidget):
             return
 
         # Set name
-        line = self.parent()._line
-        line.setText(self._proxy._name)
-
-        self.setSortingEnabled(False)
+        self._updateNameLine()
 
         # Add elements
         # The widget is not cleared to keep its current scroll bar position.
         i = -1
-        for name, typeName, kind, repres in self._proxy._variables:
-            # <kludge 2>
-            # the typeTranslation dictionary contains "synonyms" for types that will be hidden
-            kind = self._config.typeTranslation.get(kind, kind)
-            # </kludge 2>
-            if kind in self._config.hideTypes:
-                continue
-            if name.startswith("_") and "private" in self._config.hideTypes:
-                continue
-            if "startup" in self._config.hideTypes and name in self._startUpVariables:
-                continue
-            if not self._compiledRegExp.fullmatch(name):
+        self._items = {}
+        for name, typeName, kind, repres in self._proxy._variables.values():
+            if not self._isVisible(name, kind):
                 continue
 
             i += 1
@@ -338,24 +507,17 @@ class WorkspaceTree(QtWidgets.QTreeWidget):
                 item = WorkspaceItem((name, typeName, repres), 0)
                 self.addTopLevelItem(item)
             else:
-                item.setText(0, name)
-                item.setText(1, typeName)
-                item.setText(2, repres)
                 item.setSelected(False)
+            self._setItemInfo(item, name, typeName, repres)
+            self._items[name] = item
 
             if name == selectedName:
                 newSelectedItem = item
 
-            # Set tooltip
-            tt = "{}: {}".format(name, repres)
-            item.setToolTip(0, tt)
-            item.setToolTip(1, tt)
-            item.setToolTip(2, tt)
-
         for _ in range(i + 1, self.topLevelItemCount()):
             self.takeTopLevelItem(i + 1)  # delete remaining entries
 
-        self.setSortingEnabled(True)
+        self._sortItems()
         if newSelectedItem is not None:
             newSelectedItem.setSelected(True)
             self.setCurrentItem(newSelectedItem)
@@ -7,14 +7,22 @@ a file like interface.
 
 import sys
 import os
+import time
+import threading
 
 from yoton.channels import PubChannel, SubChannel
 
 PY2 = sys.version_info[0] == 2
 
+# The file wrappers that buffer their output. Before a buffered wrapper
+# adds text to its buffer, the buffers of the others are flushed, so that
+# e.g. stdout and stderr arrive in the right order.
+_bufferedWrappers = []
+
 
 class FileWrapper(object):
-    """FileWrapper(channel, chunksize=0, echo=None)
+    """FileWrapper(channel, chunksize=0, echo=None, isatty=False,
+    buffersize=0, bufferdelay=0.01)
 
     Class that wraps a PubChannel or SubChannel instance to provide
     a file-like interface by implementing methods such as read() and
@@ -24,6 +32,13 @@ class FileWrapper(object):
     The file wrapper also splits messages into smaller messages if they
     are above the chunksize (only if chunksize > 0).
 
+    If buffersize > 0, written text is collected in a buffer, so that
+    printing many small pieces of text results in a few larger messages.
+    Text written after a period of silence is sent right away. Otherwise
+    the buffer is sent when it holds more than buffersize characters, or
+    at most bufferdelay seconds after the text was written. The buffer is
+    also sent on flush() and flush_buffer().
+
     On Python 2, the read methods return str (utf-8 encoded Unicode).
 
     """
@@ -33,7 +48,15 @@ class FileWrapper(object):
     # don't seem to make sense: readlines, seek, tell, truncate, errors,
     # mode, name,
 
-    def __init__(self, channel, chunksize=0, echo=None, isatty=False):
+    def __init__(
+        self,
+        channel,
+        chunksize=0,
+        echo=None,
+        isatty=False,
+        buffersize=0,
+        bufferdelay=0.01,
+    ):
         if not isinstance(channel, (PubChannel, SubChannel)):
             raise ValueError("FileWrapper needs a PubChannel or SubChannel.")
         if echo is not None:
@@ -47,6 +70,19 @@ class FileWrapper(object):
         self.errors = "strict"  # compat
         self._isatty = isatty
 
+        # Output buffering
+        self._buffersize = int(buffersize)
+        self._bufferdelay = float(bufferdelay)
+        self._buffer = []
+        self._buffered = 0  # Number of characters in the buffer
+        self._buffertime = 0  # Time when the buffer became non-empty
+        self._sendtime = 0  # Time when we last sent a message
+        self._bufferlock = threading.RLock()
+        self._bufferevent = threading.Event()
+        self._bufferthread = None
+        if self._buffersize > 0:
+            _bufferedWrappers.append(self)
+
     def close(self):
         """Close the file object."""
         # Deal with multiprocessing
@@ -59,6 +95,7 @@ class FileWrapper(object):
                 sys.__stderr__.close()
             return
         # Normal behavior
+        self.flush_buffer()
         self._channel.close()
 
     @property
@@ -73,8 +110,27 @@ class FileWrapper(object):
 
     def flush(self):
         """Wait here until all messages have been sent."""
+        self.flush_buffer()
         self._channel._context.flush()
 
+    def flush_buffer(self):
+        """Send the text in the buffer (if output is buffered), without
+        waiting for it to arrive at the other end. If the buffer is being
+        sent from another thread, this waits until that is done, so that
+        text that is sent afterwards cannot overtake it.
+        """
+        with self._bufferlock:
+            if not self._buffer:
+                return
+            # The buffer is emptied after sending, so that other threads
+            # see that there is text to wait for (see write())
+            try:
+                self._send("".join(self._buffer))
+            finally:
+                self._buffer = []
+                self._buffered = 0
+                self._bufferevent.clear()
+
     @property
     def newlines(self):
         """The type of newlines used. Returns None; we never know what the
@@ -118,6 +174,43 @@ class FileWrapper(object):
                 realfile.flush()
             return
 
+        if self._buffersize <= 0:
+            self._send(message)
+            return
+
+        # Keep the order of the output of all buffered wrappers
+        for wrapper in _bufferedWrappers:
+            if wrapper is not self and wrapper._buffer:
+                wrapper.flush_buffer()
+
+        with self._bufferlock:
+            now = time.time()
+            if not self._buffer:
+                if now - self._sendtime > self._bufferdelay:
+                    # First output in a while, send right away
+                    self._send(message)
+                    return
+                self._buffertime = now
+                self._bufferevent.set()
+                if self._bufferthread is None:
+                    self._start_buffer_thread()
+            self._buffer.append(message)
+            self._buffered += len(message)
+            # Send the buffer if it is full or if it waited long enough
+            if (
+                self._buffered >= self._buffersize
+                or now - self._buffertime > self._bufferdelay
+            ):
+                self.flush_buffer()
+
+    def writelines(self, lines):
+        """Write a sequence of messages to the channel."""
+        for line in lines:
+            self.write(line)
+
+    def _send(self, message):
+        """Send the message, partitioned in parts of at most chunksize."""
+        self._sendtime = time.time()
         chunkSize = self._chunksize
         if 0 < chunkSize < len(message):
             for i in range(0, len(message), chunkSize):
@@ -125,10 +218,23 @@ class FileWrapper(object):
         else:
             self._channel.send(message)
 
-    def writelines(self, lines):
-        """Write a sequence of messages to the channel."""
-        for line in lines:
-            self._channel.send(line)
+    def _start_buffer_thread(self):
+        """Start the thread that sends the buffer when it is not filled
+        further, e.g. when the code that prints pauses or waits for input.
+        """
+
+        def run():
+            while not self._channel._closed:
+                self._bufferevent.wait()
+                time.sleep(self._bufferdelay)
+                try:
+                    self.flush_buffer()
+                except Exception:  # e.g. the channel is closed
+                    break
+
+        self._bufferthread = threading.Thread(target=run, name="FileWrapperBuffer")
+        self._bufferthread.daemon = True
+        self._bufferthread.start()
 
     def readline(self, size=0):
         """Read one string that was sent as one from the other end (always
@@ -11,7 +11,7 @@ the xdrrpc Python module by Rob Reilink and Windel Bouwman.
 
 import sys
 import struct
-from yoton.misc import bytes, basestring, long
+from yoton.misc import bytes, str, basestring, long, V2
 
 # To decode P2k strings that are not unicode
 if sys.__stdin__ and sys.__stdin__.encoding:
@@ -67,7 +67,8 @@ class BinaryMessageType(MessageType):
         return message
 
     def message_from_bytes(self, bb):
-        return bb
+        # Large packages are received in a bytearray
+        return bytes(bb)
 
 
 class TextMessageType(MessageType):
@@ -138,11 +139,13 @@ class ObjectMessageType(MessageType):
             return None
 
 
-# Formats
-_FMT_TYPE = "<B"
-_FMT_BOOL = "<B"
-_FMT_INT = "<q"
-_FMT_FLOAT = "<d"
+# Formats, the type code is packed together with the value
+_STRUCT_BOOL = struct.Struct("<BB")
+_STRUCT_INT = struct.Struct("<Bq")
+_STRUCT_FLOAT = struct.Struct("<Bd")
+_STRUCT_HEADER = struct.Struct("<BB")  # type code and small number
+_STRUCT_LONG_HEADER = struct.Struct("<BBQ")  # type code, 255 and number
+_STRUCT_NUMBER = struct.Struct("<Q")
 
 # Types
 _TYPE_NONE = ord("n")
@@ -156,119 +159,172 @@ _TYPE_DICT = ord("d")
 
 
 class Packer:
-    # Note that while xdrlib uses StringIO/BytesIO, this approach using
-    # a list is actually faster.
+    # The values are packed in a bytearray, which is faster than joining
+    # a list of small bytes objects. The type code of a value is packed
+    # together with the value, and strings (the most common value) are
+    # handled inline in the loop over the items of a list or tuple.
 
     def __init__(self):
-        self._buf = []
+        self._buf = bytearray()
 
     def get_buffer(self):
-        return bytes().join(self._buf)
+        return bytes(self._buf)
 
-    def write(self, bb):
-        self._buf.append(bb)
-
-    def write_number(self, n):
+    def write_header(self, object_type, n):
         if n < 255:
-            self.write(struct.pack("<B", n))
+            self._buf += _STRUCT_HEADER.pack(object_type, n)
         else:
-            self.write(struct.pack("<B", 255))
-            self.write(struct.pack("<Q", n))
+            self._buf += _STRUCT_LONG_HEADER.pack(object_type, 255, n)
 
     def pack_object(self, object):
-        if object is None:
-            self.write(struct.pack(_FMT_TYPE, _TYPE_NONE))
-        elif isinstance(object, bool):
-            self.write(struct.pack(_FMT_TYPE, _TYPE_BOOL))
-            self.write(struct.pack(_FMT_BOOL, object))
+        buf = self._buf
+        tp = type(object)
+        if tp is str:
+            bb = object.encode("utf-8")
+            self.write_header(_TYPE_STRING, len(bb))
+            buf += bb
+        elif tp is list or tp is tuple:
+            self.pack_sequence(object)
+        elif object is None:
+            buf.append(_TYPE_NONE)
+        elif tp is bool:
+            buf += _STRUCT_BOOL.pack(_TYPE_BOOL, object)
         elif isinstance(object, (int, long)):
-            self.write(struct.pack(_FMT_TYPE, _TYPE_INT))
-            self.write(struct.pack(_FMT_INT, object))
+            buf += _STRUCT_INT.pack(_TYPE_INT, object)
         elif isinstance(object, float):
-            self.write(struct.pack(_FMT_TYPE, _TYPE_FLOAT))
-            self.write(struct.pack(_FMT_FLOAT, object))
+            buf += _STRUCT_FLOAT.pack(_TYPE_FLOAT, object)
         elif isinstance(object, basestring):
             bb = object.encode("utf-8")
-            self.write(struct.pack(_FMT_TYPE, _TYPE_STRING))
-            self.write_number(len(bb))
-            self.write(bb)
-        elif isinstance(object, list):
-            self.write(struct.pack(_FMT_TYPE, _TYPE_LIST))
-            self.write_number(len(object))
-            for value in object:
-                self.pack_object(value)  # call recursive
-        elif isinstance(object, tuple):
-            self.write(struct.pack(_FMT_TYPE, _TYPE_TUPLE))
-            self.write_number(len(object))
-            for value in object:
-                self.pack_object(value)  # call recursive
+            self.write_header(_TYPE_STRING, len(bb))
+            buf += bb
+        elif isinstance(object, (list, tuple)):
+            self.pack_sequence(object)
         elif isinstance(object, dict):
-            self.write(struct.pack(_FMT_TYPE, _TYPE_DICT))
-            self.write_number(len(object))
-            # call recursive
+            self.write_header(_TYPE_DICT, len(object))
             for key in object:
                 self.pack_object(key)
                 self.pack_object(object[key])
         else:
             raise ValueError("Unsupported type: %s" % repr(type(object)))
 
+    def pack_sequence(self, object):
+        buf = self._buf
+        n = len(object)
+        self.write_header(_TYPE_LIST if isinstance(object, list) else _TYPE_TUPLE, n)
+        if n > 8:
+            tp = type(object[0])
+            if tp is int or tp is float:
+                # Fast path for homogeneous lists of numbers
+                if all(type(value) is tp for value in object):
+                    if tp is int:
+                        fmt, object_type = "<" + "Bq" * n, _TYPE_INT
+                    else:
+                        fmt, object_type = "<" + "Bd" * n, _TYPE_FLOAT
+                    values = [object_type, 0] * n
+                    values[1::2] = object
+                    buf += struct.pack(fmt, *values)
+                    return
+        for value in object:
+            if type(value) is str:
+                bb = value.encode("utf-8")
+                if len(bb) < 255:
+                    buf += _STRUCT_HEADER.pack(_TYPE_STRING, len(bb))
+                else:
+                    buf += _STRUCT_LONG_HEADER.pack(_TYPE_STRING, 255, len(bb))
+                buf += bb
+            else:
+                self.pack_object(value)  # call recursive
+
 
 class Unpacker:
+    # Values are read at an offset in the buffer with Struct.unpack_from(),
+    # so that the buffer is not sliced, except to decode strings.
+
     def __init__(self, data):
+        if V2:
+            data = bytearray(data)  # so that indexing gives ints
         self._buf = data
         self._pos = 0
 
-    def read(self, n):
-        i1 = self._pos
-        i2 = self._pos + n
-        if i2 > len(self._buf):
-            raise EOFError
-        else:
-            self._pos = i2
-            return self._buf[i1:i2]
-
-    def read_number(self):
-        (n,) = struct.unpack("<B", self.read(1))
-        if n == 255:
-            (n,) = struct.unpack("<Q", self.read(8))
-        return n
-
-    def unpack(self, fmt, n):
-        i1 = self._pos
-        i2 = self._pos + n
-        if i2 > len(self._buf):
-            raise EOFError
-        else:
-            self._pos = i2
-            data = self._buf[i1:i2]
-            return struct.unpack(fmt, data)[0]
-
     def unpack_object(self):
-        object_type = self.unpack(_FMT_TYPE, 1)
-
-        if object_type == _TYPE_NONE:
-            return None
-        elif object_type == _TYPE_BOOL:
-            return bool(self.unpack(_FMT_BOOL, 1))
+        try:
+            object, self._pos = self._unpack(self._buf, self._pos)
+        except (IndexError, struct.error):
+            raise EOFError
+        return object
+
+    def _unpack(self, data, pos):
+        """Unpack the object at the given position. Returns the object
+        and the position after it.
+        """
+        object_type = data[pos]
+
+        if object_type == _TYPE_STRING:
+            n = data[pos + 1]
+            pos += 2
+            if n == 255:
+                (n,) = _STRUCT_NUMBER.unpack_from(data, pos)
+                pos += 8
+            if pos + n > len(data):
+                raise EOFError
+            return data[pos : pos + n].decode("utf-8"), pos + n
         elif object_type == _TYPE_INT:
-            return self.unpack(_FMT_INT, 8)
+            return _STRUCT_INT.unpack_from(data, pos)[1], pos + 9
         elif object_type == _TYPE_FLOAT:
-            return self.unpack(_FMT_FLOAT, 8)
-        elif object_type == _TYPE_STRING:
-            n = self.read_number()
-            return self.read(n).decode("utf-8")
-        elif object_type == _TYPE_LIST:
-            object = [self.unpack_object() for i in range(self.read_number())]
-            return object
-        elif object_type == _TYPE_TUPLE:
-            object = [self.unpack_object() for i in range(self.read_number())]
-            return tuple(object)
+            return _STRUCT_FLOAT.unpack_from(data, pos)[1], pos + 9
+        elif object_type == _TYPE_NONE:
+            return None, pos + 1
+        elif object_type == _TYPE_BOOL:
+            return bool(data[pos + 1]), pos + 2
+        elif object_type == _TYPE_LIST or object_type == _TYPE_TUPLE:
+            n = data[pos + 1]
+            pos += 2
+            if n == 255:
+                (n,) = _STRUCT_NUMBER.unpack_from(data, pos)
+                pos += 8
+            if n > 8 and (data[pos] == _TYPE_INT or data[pos] == _TYPE_FLOAT):
+                # Fast path for homogeneous lists of numbers
+                t = data[pos]
+                fmt = ("<" + "Bq" * n) if t == _TYPE_INT else ("<" + "Bd" * n)
+                if pos + 9 * n <= len(data):
+                    values = struct.unpack_from(fmt, data, pos)
+                    if values[0::2].count(t) == n:
+                        object = list(values[1::2])
+                        if object_type == _TYPE_TUPLE:
+                            object = tuple(object)
+                        return object, pos + 9 * n
+            object = []
+            append = object.append
+            unpack = self._unpack
+            for i in range(n):
+                # Strings are handled inline, because they are most common
+                if data[pos] == _TYPE_STRING:
+                    m = data[pos + 1]
+                    pos += 2
+                    if m == 255:
+                        (m,) = _STRUCT_NUMBER.unpack_from(data, pos)
+                        pos += 8
+                    if pos + m > len(data):
+                        raise EOFError
+                    append(data[pos : pos + m].decode("utf-8"))
+                    pos += m
+                else:
+                    value, pos = unpack(data, pos)
+                    append(value)
+            if object_type == _TYPE_TUPLE:
+                object = tuple(object)
+            return object, pos
         elif object_type == _TYPE_DICT:
+            n = data[pos + 1]
+            pos += 2
+            if n == 255:
+                (n,) = _STRUCT_NUMBER.unpack_from(data, pos)
+                pos += 8
             object = {}
-            for i in range(self.read_number()):
-                key = self.unpack_object()
-                object[key] = self.unpack_object()
-            return object
+            for i in range(n):
+                key, pos = self._unpack(data, pos)
+                object[key], pos = self._unpack(data, pos)
+            return object, pos
         else:
             raise ValueError("Unsupported type: %s" % repr(object_type))
 
@@ -31,6 +31,9 @@ STOP_THREAD_ERROR = "Error in io thread."
 # Use a relatively small buffer size, to keep the channels better in sync
 SOCKET_BUFFERS_SIZE = 10 * 1024
 
+# Packages larger than this are received directly into a bytearray
+RECV_INTO_SIZE = 64 * 1024
+
 
 class TcpConnection(Connection):
     """TcpConnection(context, name='')
@@ -586,6 +589,7 @@ class ReceivingThread(BaseIOThread):
 
         # Short names in local namespace avoid dictionary lookups
         socket_recv = bsd_socket.recv
+        socket_recv_into = bsd_socket.recv_into
         recv_package = context_connection._context._recv_package
         package_from_header = Package.from_header
         HS = HEADER_SIZE
@@ -622,7 +626,9 @@ class ReceivingThread(BaseIOThread):
                     continue
 
             # Get package
-            package = self._getPackage(socket_recv, HS, package_from_header)
+            package = self._getPackage(
+                socket_recv, socket_recv_into, HS, package_from_header
+            )
             if package is None:
                 continue
             elif isinstance(package, basestring):
@@ -635,12 +641,12 @@ class ReceivingThread(BaseIOThread):
                 print("Error depositing package in ReceivingThread.")
                 print(getErrorMsg())
 
-    def _getPackage(self, socket_recv, HS, package_from_header):
+    def _getPackage(self, socket_recv, socket_recv_into, HS, package_from_header):
         """Get exactly one package from the socket. Blocking."""
 
         # Get header and instantiate package object from it
         try:
-            header = self._recv_n_bytes(socket_recv, HS)
+            header = self._recv_n_bytes(socket_recv, socket_recv_into, HS)
         except EOFError:
             return STOP_EOF
         package, size = package_from_header(header)
@@ -661,30 +667,38 @@ class ReceivingThread(BaseIOThread):
         else:
             # Get package data
             try:
-                package._data = self._recv_n_bytes(socket_recv, size)
+                package._data = self._recv_n_bytes(socket_recv, socket_recv_into, size)
             except EOFError:
                 return STOP_EOF
             return package
 
-    def _recv_n_bytes(self, socket_recv, n):
-        """Receive exactly n bytes from the socket."""
-
-        # First round
-        data = socket_recv(n)
-        if len(data) == 0:
-            raise EOFError()
-
-        # How many more do we need? For small n, we probably only need 1 round
-        n -= len(data)
-        if n == 0:
-            return data  # We're lucky!
+    def _recv_n_bytes(self, socket_recv, socket_recv_into, n):
+        """Receive exactly n bytes from the socket. Returns bytes for small
+        n, and a bytearray for large n.
+        """
 
-        # Else, we need more than one round
-        parts = [data]
-        while n:
+        if n <= RECV_INTO_SIZE:
+            # First round
             data = socket_recv(n)
-            parts.append(data)
-            n -= len(data)
-
-        # Return combined data of multiple rounds
-        return b"".join(parts)
+            if len(data) == 0:
+                raise EOFError()
+            # For small n, we probably only need 1 round
+            if len(data) == n:
+                return data  # We're lucky!
+            i = len(data)
+        else:
+            data = None
+            i = 0
+
+        # Else, receive directly into a buffer of the final size. This
+        # avoids allocating n bytes per round, and joining the parts.
+        buffer = bytearray(n)
+        view = memoryview(buffer)
+        if data:
+            view[:i] = data
+        while i < n:
+            count = socket_recv_into(view[i:], n - i)
+            if count == 0:
+                raise EOFError()
+            i += count
+        return buffer
@@ -129,3 +129,30 @@ for ax in [ax1, ax2]:
 fig.tight_layout()
 
 # fig.savefig("yoton_performance.jpg")
+
+
+## Run experiment with the object message type
+
+# Messages similar to those of the introspection (e.g. dir2) and of the
+# workspace: lists with many tuples of strings, and lists of numbers
+messages = {
+    "tuples of strings": [
+        ("name%i" % i, "function", "function", "<function name%i>" % i)
+        for i in range(10000)
+    ],
+    "ints": list(range(100000)),
+    "floats": [i * 0.5 for i in range(100000)],
+    "nested": [[i, [str(i), (i * 1.5, None)], {"key": i}] for i in range(10000)],
+}
+
+for name, message in messages.items():
+    t0 = time.perf_counter()
+    bb = yoton.OBJECT.message_to_bytes(message)
+    t1 = time.perf_counter()
+    message2 = yoton.OBJECT.message_from_bytes(bb)
+    t2 = time.perf_counter()
+    assert message2 == message
+    print(
+        "Packed %s (%i B) in %1.1f ms, unpacked in %1.1f ms"
+        % (name, len(bb), (t1 - t0) * 1000, (t2 - t1) * 1000)
+    )
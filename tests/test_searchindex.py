@@ -0,0 +1,60 @@
+import os
+import importlib.util
+
+import pyzo
+
+
+def loadSearchIndex():
+    # Load the module by itself, because pyzo.tools needs a running pyzo
+    filename = os.path.join(
+        os.path.dirname(pyzo.__file__), "tools", "pyzoFileBrowser", "searchindex.py"
+    )
+    spec = importlib.util.spec_from_file_location("searchindex", filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_regexp_literals():
+    getRegExpLiterals = loadSearchIndex().getRegExpLiterals
+
+    assert getRegExpLiterals("foo") == ["foo"]
+    assert getRegExpLiterals(r"foo\.bar") == ["foo.bar"]
+    assert getRegExpLiterals(r"foo\w+bar") == ["foo", "bar"]
+    assert getRegExpLiterals("colou?r") == ["colo", "r"]
+    assert getRegExpLiterals("a[bc]d") == ["a", "d"]
+    assert getRegExpLiterals("foo|bar") is None
+    assert getRegExpLiterals("(foo)") is None
+
+
+def test_regexp_literals_escapes():
+    getRegExpLiterals = loadSearchIndex().getRegExpLiterals
+
+    # The arguments of escapes are not literal text
+    assert getRegExpLiterals(r"\x41BC") == ["BC"]
+    assert getRegExpLiterals(r"\101bcd") == ["bcd"]
+    assert getRegExpLiterals(r"\0bcd") == ["bcd"]
+    assert getRegExpLiterals(r"caf\u00e9s") == ["caf", "s"]
+    assert getRegExpLiterals(r"caf\U000000e9s") == ["caf", "s"]
+    assert getRegExpLiterals(r"caf\N{LATIN SMALL LETTER E WITH ACUTE}s") == [
+        "caf",
+        "s",
+    ]
+    assert getRegExpLiterals(r"\N{LATIN") is None
+
+
+def test_query_matches_escapes():
+    searchindex = loadSearchIndex()
+
+    # Files that match the regular expression are not excluded
+    for pattern, text in [
+        (r"\x41BC", "xABC"),
+        (r"\101bcd", "Abcd"),
+        (r"cafés", "cafés"),
+        (r"caf\u00e9s", "cafés"),
+        (r"caf\N{LATIN SMALL LETTER E WITH ACUTE}s", "cafés"),
+    ]:
+        hashes = searchindex.getTrigramHashes(text)
+        entry = 0, 12, searchindex.makeBitSet(hashes, 12)
+        query = searchindex.SearchIndexQuery(pattern, regExp=True)
+        assert query.mayMatch(entry), pattern